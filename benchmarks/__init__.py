@@ -0,0 +1,9 @@
+"""
+Бенчмарки Maskara.
+
+- `python -m benchmarks.micro` — микробенчмарки чанкера, постобработки и лемматизации на синтетическом корпусе;
+- `python -m benchmarks.replay` — воспроизведение JSONL-лога запросов против приложения с заданной конкуренцией.
+
+По умолчанию оба скрипта используют офлайн-заглушку модели, `--model <имя>` подключает настоящую модель GLiNER
+(replay с `--url` обращается к уже запущенному сервису). Результат пишется в JSON для сравнения между коммитами.
+"""
@@ -0,0 +1,56 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter
+
+# Настройки приложения обязательны при импорте src — для бенчмарков хватит заглушек
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("CORS_ORIGINS", '["*"]')
+# Модель для бенчмарков создаётся явно (заглушка или --model), предзагрузка настроенной модели не нужна
+os.environ.setdefault("PRELOAD_MODEL", "false")
+# Фоновые задания бенчмаркам не нужны, а их хранилище создавалось бы в рабочем дереве
+os.environ.setdefault("JOB_WORKERS", "0")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Запускает fn `repeat` раз и возвращает min/median/mean в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        fn()
+        timings.append((perf_counter() - started) * 1000)
+    return {
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+    }
+
+
+def percentiles(values: list[float]) -> dict[str, float | None]:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    if len(values) == 1:
+        return {"p50_ms": values[0], "p95_ms": values[0], "p99_ms": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50_ms": round(cuts[49], 3), "p95_ms": round(cuts[94], 3), "p99_ms": round(cuts[98], 3)}
+
+
+def write_report(report: dict, output: Path | None) -> None:
+    payload = json.dumps({"revision": git_revision(), **report}, ensure_ascii=False, indent=2)
+    if output is None:
+        sys.stdout.write(payload + "\n")
+    else:
+        output.write_text(payload + "\n", encoding="utf-8")
@@ -0,0 +1,76 @@
+import random
+
+_NAMES = ["Иван", "Мария", "Алексей", "Ольга", "Сергей", "Наталья", "Дмитрий", "Елена"]
+_SURNAMES = ["Иванов", "Петрова", "Смирнов", "Кузнецова", "Попов", "Соколова", "Лебедев", "Новикова"]
+_CITIES = ["Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Самара"]
+_WORDS = [
+    "договор",
+    "сторона",
+    "обязуется",
+    "оплатить",
+    "услуги",
+    "в",
+    "срок",
+    "согласно",
+    "условиям",
+    "настоящего",
+    "соглашения",
+    "арендатор",
+    "арендодатель",
+    "помещение",
+    "передаётся",
+    "по",
+    "акту",
+    "приёма",
+    "передачи",
+    "стоимость",
+    "составляет",
+    "рублей",
+    "претензии",
+    "направляются",
+    "письменно",
+    "по",
+    "адресу",
+    "указанному",
+    "в",
+    "реквизитах",
+    "сторон",
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 24))]
+    kind = rng.random()
+    if kind < 0.3:
+        words.insert(rng.randrange(len(words)), f"{rng.choice(_NAMES)} {rng.choice(_SURNAMES)}")
+    elif kind < 0.45:
+        words.insert(
+            rng.randrange(len(words)),
+            f"+7 ({rng.randint(900, 999)}) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+        )
+    elif kind < 0.6:
+        words.insert(rng.randrange(len(words)), f"г. {rng.choice(_CITIES)}, ул. Ленина, д. {rng.randint(1, 200)}")
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(1, len(words)), ",")
+    sentence = " ".join(words).replace(" ,", ",")
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def make_document(size: int, seed: int = 0) -> str:
+    """Синтетический «договор» на русском длиной около `size` символов: абзацы, предложения, ПДн."""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(1, 8)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size]
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    multipliers = {"k": 1024, "m": 1024 * 1024}
+    if value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
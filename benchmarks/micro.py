@@ -0,0 +1,71 @@
+"""
+Микробенчмарки горячих участков анонимизатора на синтетическом русском корпусе.
+
+Пример:
+    python -m benchmarks.micro --sizes 1k 10k 100k 1m --output bench.json
+"""
+
+import argparse
+from pathlib import Path
+
+from .common import measure, write_report
+from .corpus import make_document, parse_size
+from .stub import create_anonymizer
+from src.core.services.anonymizer.gliner.gliner import GlinerAnonymizer
+from src.core.services.anonymizer.lemmas import Lemmatizer, words
+from src.core.services.anonymizer.postprocessing import resolve_spans, to_document_offsets
+
+LABELS = ["person", "phone", "address"]
+
+
+def bench_document(anonymizer: GlinerAnonymizer, size: int, repeat: int) -> dict:
+    text = make_document(size)
+    budget = anonymizer.chunker.text_budget([LABELS])
+    chunks = anonymizer.chunker._chunk(text, budget)
+    results = anonymizer._predict_batch([chunk_text for chunk_text, _, _ in chunks], LABELS, 0.5)
+
+    # Сущности в координатах документа — вход для разрешения пересечений и лемматизации
+    entities = []
+    for chunk_entities, (_, chunk_start, _) in zip(results, chunks):
+        entities.extend(to_document_offsets(text, chunk_start, [dict(e) for e in chunk_entities]))
+
+    def assemble() -> None:
+        anonymizer._assemble(text, chunks, [[dict(e) for e in chunk] for chunk in results], None)
+
+    forms = [word for entity in entities for word in words(entity["text"])]
+    lemmatizer = Lemmatizer()
+
+    def lemmatize_cold() -> None:
+        Lemmatizer().lemmatize_many(forms)
+
+    def lemmatize_warm() -> None:
+        lemmatizer.lemmatize_many(forms)
+
+    return {
+        "size_bytes": len(text.encode()),
+        "chars": len(text),
+        "chunks": len(chunks),
+        "entities": len(entities),
+        "chunk": measure(lambda: anonymizer.chunker._chunk(text, budget), repeat),
+        "resolve_overlapping": measure(lambda: resolve_spans(entities), repeat),
+        "assemble": measure(assemble, repeat),
+        "lemma_cold": measure(lemmatize_cold, repeat),
+        "lemma_warm": measure(lemmatize_warm, repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарки чанкера и постобработки")
+    parser.add_argument("--sizes", nargs="+", default=["1k", "10k", "100k", "1m"], help="Размеры документов")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--model", default=None, help="Модель GLiNER; по умолчанию — офлайн-заглушка")
+    parser.add_argument("--output", type=Path, default=None, help="Файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    anonymizer = create_anonymizer(args.model)
+    results = [bench_document(anonymizer, parse_size(size), args.repeat) for size in args.sizes]
+    write_report({"benchmark": "micro", "model": args.model or "stub", "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
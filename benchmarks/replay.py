@@ -0,0 +1,116 @@
+"""
+Воспроизведение JSONL-лога запросов против приложения.
+
+Каждая строка лога — тело запроса к API ({"text", "labels", "threshold", "excludeLemmas"})
+или объект {"path": ..., "body": ...}. Без --url запросы идут в приложение в том же процессе.
+
+Пример:
+    python -m benchmarks.replay requests.log.jsonl --concurrency 16 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+from .common import percentiles, write_report
+from .stub import create_anonymizer
+
+DEFAULT_PATH = "/api/v1/anonymization/"
+
+
+def load_requests(path: Path) -> list[tuple[str, dict]]:
+    requests = []
+    with path.open(encoding="utf-8") as log:
+        for line in log:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "body" in record:
+                requests.append((record.get("path", DEFAULT_PATH), record["body"]))
+            else:
+                requests.append((DEFAULT_PATH, record))
+    return requests
+
+
+async def replay(client: httpx.AsyncClient, requests: list[tuple[str, dict]], concurrency: int, api_key: str) -> dict:
+    queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    headers = {"Authorization": f"Bearer {api_key}"}
+
+    async def worker() -> None:
+        while not queue.empty():
+            path, body = queue.get_nowait()
+            started = perf_counter()
+            try:
+                response = await client.post(path, json=body, headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append((perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(requests) / duration, 2) if duration else None,
+        "statuses": statuses,
+        **percentiles(latencies),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    requests = load_requests(args.log) * args.loops
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            return await replay(client, requests, args.concurrency, args.api_key)
+
+    from src.apps.anonymization.depends import get_anonymize_use_case
+    from src.apps.anonymization.use_cases.anonymize import AnonymizeUseCaseImpl
+    from src.core.services.anonymizer.registry import SingleAnonymizerResolver
+    from src.main import app
+    from src.settings import settings
+
+    anonymizer = create_anonymizer(args.model)
+    app.dependency_overrides[get_anonymize_use_case] = lambda: AnonymizeUseCaseImpl(
+        SingleAnonymizerResolver(anonymizer)
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client,
+    ):
+        return await replay(client, requests, args.concurrency, settings.API_KEY)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Воспроизведение лога запросов")
+    parser.add_argument("log", type=Path, help="JSONL-файл с телами запросов")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--loops", type=int, default=1, help="Сколько раз прогнать лог")
+    parser.add_argument("--url", default=None, help="Адрес запущенного сервиса; по умолчанию — приложение в процессе")
+    parser.add_argument("--api-key", default="benchmark", help="Токен для --url")
+    parser.add_argument("--model", default=None, help="Модель GLiNER для режима в процессе; по умолчанию — заглушка")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    write_report({"benchmark": "replay", "model": args.model or "stub", "log": str(args.log), **report}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Заглушка модели GLiNER для офлайн-бенчмарков.
+
+Повторяет интерфейс, которым пользуется сервис: data_processor (words_splitter + transformer_tokenizer)
+и batch_predict_entities. Сущности находятся регулярными выражениями, токены оцениваются как ~4 символа.
+"""
+
+import re
+from math import ceil
+
+from src.core.services.anonymizer.gliner.gliner import GlinerAnonymizer
+
+_WORD_PATTERN = re.compile(r"\w+(?:[-_]\w+)*|\S")
+_ENTITY_PATTERNS = (
+    (re.compile(r"\+7 \(\d{3}\) \d{3}-\d{2}-\d{2}"), "phone"),
+    (re.compile(r"г\. [А-Я][\w-]+, ул\. [А-Я]\w+, д\. \d+"), "address"),
+    (re.compile(r"\b[А-Я][а-я]+ [А-Я][а-я]+(?:ов|ова|ев|ева|ин|ина)\b"), "person"),
+)
+
+
+class _Encoding(dict):
+    is_fast = True
+
+    def __init__(self, data: dict, word_ids: list[int | None]) -> None:
+        super().__init__(data)
+        self._word_ids = word_ids
+
+    def word_ids(self) -> list[int | None]:
+        return self._word_ids
+
+
+class StubTokenizer:
+    @staticmethod
+    def _word_tokens(word: str) -> int:
+        return max(1, ceil(len(word) / 4))
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 2
+
+    def __call__(self, words, is_split_into_words=False, add_special_tokens=True, return_length=False, **kwargs):
+        if not is_split_into_words:
+            return {"length": [self._word_tokens(word) for word in words]}
+        word_ids: list[int | None] = []
+        for i, word in enumerate(words):
+            word_ids.extend([i] * self._word_tokens(word))
+        if add_special_tokens:
+            word_ids = [None, *word_ids, None]
+        return _Encoding({"length": [len(word_ids)]}, word_ids)
+
+
+class StubDataProcessor:
+    transformer_tokenizer = StubTokenizer()
+
+    @staticmethod
+    def words_splitter(text: str):
+        for match in _WORD_PATTERN.finditer(text):
+            yield match.group(), match.start(), match.end()
+
+
+class StubModel:
+    data_processor = StubDataProcessor()
+
+    def predict_entities(self, text: str, labels: list[str], threshold: float = 0.5, **kwargs) -> list[dict]:
+        entities = []
+        for pattern, label in _ENTITY_PATTERNS:
+            if label not in labels:
+                continue
+            for match in pattern.finditer(text):
+                entities.append(
+                    {"start": match.start(), "end": match.end(), "text": match.group(), "label": label, "score": 0.9}
+                )
+        return [entity for entity in entities if entity["score"] >= threshold]
+
+    def batch_predict_entities(self, texts: list[str], labels: list[str], threshold: float = 0.5, **kwargs):
+        return [self.predict_entities(text, labels, threshold) for text in texts]
+
+
+class StubGlinerAnonymizer(GlinerAnonymizer):
+    def _load_model(self, model: str) -> StubModel:
+        return StubModel()
+
+    def model_id(self, model: str) -> str:
+        return f"{model}:stub"
+
+
+def create_anonymizer(model: str | None) -> GlinerAnonymizer:
+    """Заглушка, если модель не указана, иначе настоящий GLiNER (например, небольшой urchade/gliner_small-v2.1)."""
+    if model is None:
+        return StubGlinerAnonymizer("stub")
+    return GlinerAnonymizer(model)
@@ -1,13 +1,36 @@
+from functools import lru_cache
 from fastapi import Depends
 from typing import Annotated
 
 from src.apps.anonymization.use_cases.anonymize import AnonymizeUseCaseProtocol, AnonymizeUseCaseImpl
-from src.core.services.anonymizer.depends import get_anonymizer, AnonymizerType
+from src.apps.anonymization.use_cases.deanonymize import DeanonymizeUseCaseImpl, DeanonymizeUseCaseProtocol
+from src.apps.anonymization.use_cases.session import SessionUseCaseImpl, SessionUseCaseProtocol
+from src.core.services.anonymizer.depends import get_model_router
+from src.core.services.anonymizer.sessions import SessionStore
+from src.settings import settings
 
 
 def get_anonymize_use_case() -> AnonymizeUseCaseProtocol:
-    anonymizer = get_anonymizer(AnonymizerType.gliner)
-    return AnonymizeUseCaseImpl(anonymizer)
+    return AnonymizeUseCaseImpl(get_model_router())
 
 
 AnonymizeUseCase = Annotated[AnonymizeUseCaseProtocol, Depends(get_anonymize_use_case)]
+
+
+def get_deanonymize_use_case() -> DeanonymizeUseCaseProtocol:
+    return DeanonymizeUseCaseImpl()
+
+
+DeanonymizeUseCase = Annotated[DeanonymizeUseCaseProtocol, Depends(get_deanonymize_use_case)]
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> SessionStore:
+    return SessionStore(settings.SESSION_MEMORY_BUDGET_MB * 2**20, settings.SESSION_IDLE_SECONDS)
+
+
+def get_session_use_case() -> SessionUseCaseProtocol:
+    return SessionUseCaseImpl(get_model_router(), get_session_store())
+
+
+SessionUseCase = Annotated[SessionUseCaseProtocol, Depends(get_session_use_case)]
@@ -1,8 +1,33 @@
-from fastapi import APIRouter
+import codecs
+from collections.abc import AsyncIterator
 
-from .depends import AnonymizeUseCase
-from .schemas.data import AnonymizationData, AnonymizedData
-from src.apps.auth.depends import VerifiedToken
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from .depends import AnonymizeUseCase, DeanonymizeUseCase, SessionUseCase
+from .schemas.data import (
+    AnonymizationData,
+    AnonymizedData,
+    AnonymizedSegment,
+    BulkAnonymizationData,
+    BulkAnonymizedData,
+    DeanonymizationData,
+    DeanonymizationStreamChunk,
+    DeanonymizationStreamHeader,
+    DeanonymizedData,
+    DocumentAnonymizationOptions,
+    SessionError,
+    SessionMessage,
+    SessionStart,
+    SessionStarted,
+)
+from src.apps.auth.depends import VerifiedToken, VerifiedWebSocketToken
+from src.core.admission import AdmissionRejectedError, Priority, RequestBudget, set_request_budget
+from src.core.services.anonymizer.registry import UnknownModelError
+from src.core.services.anonymizer.sessions import SessionNotFoundError
+from src.core.services.documents import DocumentError, UnsupportedDocumentError
+from src.settings import settings
 
 router = APIRouter(prefix="/api/v1/anonymization", tags=["anonymization"])
 
@@ -10,3 +35,173 @@ router = APIRouter(prefix="/api/v1/anonymization", tags=["anonymization"])
 @router.post("/")
 async def anonymize(data: AnonymizationData, use_case: AnonymizeUseCase, auth: VerifiedToken) -> AnonymizedData:
     return await use_case(data)
+
+
+@router.post("/bulk")
+async def anonymize_bulk(
+    data: BulkAnonymizationData, use_case: AnonymizeUseCase, auth: VerifiedToken
+) -> BulkAnonymizedData:
+    """
+    Анонимизация набора документов с общими labels, threshold и exclude_lemmas за один вызов.
+
+    Результаты возвращаются в порядке документов; ошибка обработки документа указывается в его элементе.
+    """
+    return await use_case.bulk(data)
+
+
+async def _prepend(
+    first: AnonymizedSegment | None, rest: AsyncIterator[AnonymizedSegment]
+) -> AsyncIterator[AnonymizedSegment]:
+    if first is not None:
+        yield first
+    async for segment in rest:
+        yield segment
+
+
+async def _ndjson(segments: AsyncIterator[AnonymizedSegment]) -> AsyncIterator[str]:
+    async for segment in segments:
+        yield segment.model_dump_json(by_alias=True) + "\n"
+
+
+@router.post("/stream", response_class=StreamingResponse)
+async def anonymize_stream(data: AnonymizationData, use_case: AnonymizeUseCase, auth: VerifiedToken):
+    """
+    Потоковая анонимизация в формате NDJSON.
+
+    Каждая строка — {"text": ..., "anonymizationMap": ...}: очередной анонимизированный фрагмент документа
+    и плейсхолдеры, впервые появившиеся в нём. Склейка всех "text" даёт полный анонимизированный текст.
+    """
+    segments = use_case.stream(data)
+    # Первый сегмент ждём до отправки заголовков: отказ в допуске должен вернуться статусом 429/503
+    first = await anext(segments, None)
+    return StreamingResponse(_ndjson(_prepend(first, segments)), media_type="application/x-ndjson")
+
+
+@router.post("/document", response_class=StreamingResponse)
+async def anonymize_document(
+    use_case: AnonymizeUseCase,
+    auth: VerifiedToken,
+    file: UploadFile = File(...),
+    options: str = Form(...),
+):
+    """
+    Анонимизация загружаемого файла (TXT в UTF-8, DOCX, PDF) в формате NDJSON.
+
+    Multipart-запрос: file — документ, options — JSON с параметрами (labels, threshold, excludeLemmas, useFake, model).
+    Файл сохраняется на диск и разбирается по разделам (страница PDF, группа абзацев), каждый раздел уходит
+    в инференс, пока извлекаются следующие. Ответ — по строке {"text": ..., "anonymizationMap": ...} на раздел
+    с общей для всего документа картой: в строке только новые записи.
+    """
+    try:
+        parsed_options = DocumentAnonymizationOptions.model_validate_json(options)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False)) from None
+    size = file.size or 0
+    if size > settings.DOCUMENT_MAX_UPLOAD_MB * 2**20:
+        raise HTTPException(status_code=413, detail=f"File is larger than {settings.DOCUMENT_MAX_UPLOAD_MB} MB")
+
+    segments = use_case.document(file.file, file.filename, size, parsed_options)
+    # Как и в /stream, первый раздел ждём до отправки заголовков: ошибки формата и допуска возвращаются статусом
+    try:
+        first = await anext(segments, None)
+    except UnsupportedDocumentError as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from None
+    except DocumentError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from None
+    return StreamingResponse(_ndjson(_prepend(first, segments)), media_type="application/x-ndjson")
+
+
+@router.websocket("/session")
+async def anonymize_session(websocket: WebSocket, use_case: SessionUseCase, auth: VerifiedWebSocketToken):
+    """
+    Инкрементальная анонимизация потокового текста (чат, ответ LLM по токенам).
+
+    Первое сообщение — параметры новой сессии (labels, threshold, excludeLemmas, useFake, model) или {"sessionId": ...}
+    для продолжения прерванной; ответ — {"sessionId", "resumed", "committedChars", "pendingChars"}.
+    Далее на каждое сообщение {"text": ..., "final": false} приходит ответ {"text": ..., "anonymizationMap": ...}:
+    финализированный анонимизированный фрагмент (может быть пустым — конец текста ещё может измениться) и новые
+    записи общей карты сессии. final: true финализирует весь накопленный текст. Ошибка — {"error", "retryAfter"}.
+    """
+    await websocket.accept()
+    set_request_budget(RequestBudget(priority=Priority.parse(websocket.headers.get("x-priority"))))
+    try:
+        session, resumed = use_case.open(SessionStart.model_validate_json(await websocket.receive_text()))
+    except WebSocketDisconnect:
+        return
+    except (ValueError, SessionNotFoundError) as exc:
+        await websocket.send_text(SessionError(error=str(exc)).model_dump_json(by_alias=True))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    try:
+        started = SessionStarted(
+            session_id=session.id,
+            resumed=resumed,
+            committed_chars=session.committed_chars,
+            pending_chars=len(session.pending),
+        )
+        await websocket.send_text(started.model_dump_json(by_alias=True))
+        while True:
+            message = await websocket.receive_text()
+            try:
+                reply = await use_case.send(session, SessionMessage.model_validate_json(message))
+            except AdmissionRejectedError as exc:
+                # Текст сообщения остаётся в сессии и будет обработан со следующим сообщением
+                reply = SessionError(error=str(exc), retry_after=exc.retry_after)
+            except (ValueError, UnknownModelError) as exc:
+                reply = SessionError(error=str(exc))
+            await websocket.send_text(reply.model_dump_json(by_alias=True))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        use_case.detach(session)
+
+
+@router.post("/deanonymize")
+async def deanonymize(data: DeanonymizationData, use_case: DeanonymizeUseCase, auth: VerifiedToken) -> DeanonymizedData:
+    """Восстанавливает исходные значения в тексте (например, в ответе LLM) по карте анонимизации."""
+    return await use_case(data)
+
+
+async def _request_lines(request: Request) -> AsyncIterator[str]:
+    # Многобайтовый символ UTF-8 может оказаться разрезан между частями тела
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for body in request.stream():
+        buffer += decoder.decode(body)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _restored_ndjson(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    async for text in chunks:
+        yield DeanonymizedData(text=text).model_dump_json(by_alias=True) + "\n"
+
+
+@router.post("/deanonymize/stream", response_class=StreamingResponse)
+async def deanonymize_stream(request: Request, use_case: DeanonymizeUseCase, auth: VerifiedToken):
+    """
+    Потоковое восстановление в формате NDJSON, для ответа LLM, приходящего частями.
+
+    Первая строка запроса — {"anonymizationMap": ...}, далее строки {"text": ...} с очередными частями текста.
+    Ответ — строки {"text": ...} с восстановленным текстом; плейсхолдер, разрезанный между частями,
+    восстанавливается целиком.
+    """
+    lines = _request_lines(request)
+    try:
+        header = DeanonymizationStreamHeader.model_validate_json(await anext(lines))
+    except StopAsyncIteration:
+        raise HTTPException(status_code=422, detail="Empty stream: anonymizationMap line expected") from None
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False)) from None
+
+    async def chunks() -> AsyncIterator[str]:
+        async for line in lines:
+            yield DeanonymizationStreamChunk.model_validate_json(line).text
+
+    restored = use_case.stream(header.anonymization_map, chunks())
+    return StreamingResponse(_restored_ndjson(restored), media_type="application/x-ndjson")
@@ -2,14 +2,101 @@ from pydantic import Field
 
 from src.core.schemas import InputApiSchema, OutputApiSchema
 
+MAX_BULK_DOCUMENTS = 1000
+
 
 class AnonymizationData(InputApiSchema):
     text: str
     labels: list[str]
     threshold: float = Field(..., gt=0, le=1)
     exclude_lemmas: list[str]
+    use_fake: bool = False
+    model: str | None = None
+
+
+class DocumentAnonymizationOptions(InputApiSchema):
+    """Параметры анонимизации загружаемого файла (поле options multipart-запроса, JSON)."""
+
+    labels: list[str]
+    threshold: float = Field(..., gt=0, le=1)
+    exclude_lemmas: list[str] = Field(default_factory=list)
+    use_fake: bool = False
+    model: str | None = None
 
 
 class AnonymizedData(OutputApiSchema):
     text: str
     anonymization_map: dict[str, dict[str, str]]
+
+
+class AnonymizedSegment(OutputApiSchema):
+    text: str
+    anonymization_map: dict[str, dict[str, str]]
+
+
+class BulkAnonymizationData(InputApiSchema):
+    texts: list[str] = Field(..., min_length=1, max_length=MAX_BULK_DOCUMENTS)
+    labels: list[str]
+    threshold: float = Field(..., gt=0, le=1)
+    exclude_lemmas: list[str]
+    use_fake: bool = False
+    model: str | None = None
+
+
+class BulkAnonymizedItem(OutputApiSchema):
+    text: str | None = None
+    anonymization_map: dict[str, dict[str, str]] | None = None
+    error: str | None = None
+
+
+class BulkAnonymizedData(OutputApiSchema):
+    items: list[BulkAnonymizedItem]
+
+
+class DeanonymizationData(InputApiSchema):
+    text: str
+    anonymization_map: dict[str, dict[str, str]]
+
+
+class DeanonymizedData(OutputApiSchema):
+    text: str
+
+
+class DeanonymizationStreamHeader(InputApiSchema):
+    """Первая строка NDJSON-потока на восстановление: карта, по которой восстанавливаются следующие части."""
+
+    anonymization_map: dict[str, dict[str, str]]
+
+
+class DeanonymizationStreamChunk(InputApiSchema):
+    text: str
+
+
+class SessionStart(InputApiSchema):
+    """Первое сообщение WebSocket-сессии: параметры новой сессии или sessionId сессии, к которой клиент возвращается."""
+
+    session_id: str | None = None
+    labels: list[str] = Field(default_factory=list)
+    threshold: float = Field(0.5, gt=0, le=1)
+    exclude_lemmas: list[str] = Field(default_factory=list)
+    use_fake: bool = False
+    model: str | None = None
+
+
+class SessionStarted(OutputApiSchema):
+    session_id: str
+    resumed: bool
+    committed_chars: int  # сколько символов сессии уже финализировано
+    pending_chars: int  # сколько символов ждёт финализации
+
+
+class SessionMessage(InputApiSchema):
+    """Очередная часть текста сессии; final — финализировать весь накопленный хвост (конец реплики)."""
+
+    text: str = ""
+    final: bool = False
+
+
+class SessionError(OutputApiSchema):
+    error: str
+    retry_after: float | None = None
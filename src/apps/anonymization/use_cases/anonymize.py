@@ -1,21 +1,112 @@
-from typing import Protocol
+from collections.abc import AsyncIterator
+from typing import BinaryIO, Protocol
 
-from src.apps.anonymization.schemas.data import AnonymizationData, AnonymizedData
-from src.core.services.anonymizer.base import Anonymizer
+from src.apps.anonymization.schemas.data import (
+    AnonymizationData,
+    AnonymizedData,
+    AnonymizedSegment,
+    BulkAnonymizationData,
+    BulkAnonymizedData,
+    BulkAnonymizedItem,
+    DocumentAnonymizationOptions,
+)
+from src.core.services.anonymizer.registry import AnonymizerResolver
+from src.core.services.documents import DocumentFormat, extract_sections
+from src.settings import settings
+
+
+async def _skip(sections: AsyncIterator[str], count: int) -> AsyncIterator[str]:
+    async for section in sections:
+        if count:
+            count -= 1
+            continue
+        yield section
 
 
 class AnonymizeUseCaseProtocol(Protocol):
     async def __call__(self, data: AnonymizationData) -> AnonymizedData: ...
 
+    def stream(self, data: AnonymizationData) -> AsyncIterator[AnonymizedSegment]: ...
+
+    async def bulk(self, data: BulkAnonymizationData) -> BulkAnonymizedData: ...
+
+    def document(
+        self,
+        file: BinaryIO,
+        filename: str | None,
+        size: int,
+        options: DocumentAnonymizationOptions,
+        skip_sections: int = 0,
+        anonymization_map: dict[str, dict[str, str]] | None = None,
+    ) -> AsyncIterator[AnonymizedSegment]: ...
+
 
 class AnonymizeUseCaseImpl:
-    def __init__(self, anonymizer: Anonymizer) -> None:
-        self.anonymizer = anonymizer
+    def __init__(self, anonymizers: AnonymizerResolver) -> None:
+        self.anonymizers = anonymizers
 
     async def __call__(self, data: AnonymizationData) -> AnonymizedData:
         exclude = {word.lower() for word in data.exclude_lemmas}
-        result = await self.anonymizer.anonymize(data.text, data.labels, data.threshold, set(exclude))
+        anonymizer = await self.anonymizers.resolve(data.model, len(data.text), data.labels)
+        result = await anonymizer.anonymize(data.text, data.labels, data.threshold, set(exclude), data.use_fake)
         return AnonymizedData(
             text=result.text,
             anonymization_map=result.map,
         )
+
+    async def stream(self, data: AnonymizationData) -> AsyncIterator[AnonymizedSegment]:
+        exclude = {word.lower() for word in data.exclude_lemmas}
+        anonymizer = await self.anonymizers.resolve(data.model, len(data.text), data.labels)
+        segments = anonymizer.anonymize_stream(data.text, data.labels, data.threshold, exclude, data.use_fake)
+        async for segment in segments:
+            yield AnonymizedSegment(
+                text=segment.text,
+                anonymization_map=segment.map,
+            )
+
+    async def bulk(self, data: BulkAnonymizationData) -> BulkAnonymizedData:
+        exclude = {word.lower() for word in data.exclude_lemmas}
+        anonymizer = await self.anonymizers.resolve(data.model, max(map(len, data.texts)), data.labels)
+        results = await anonymizer.anonymize_many(data.texts, data.labels, data.threshold, exclude, data.use_fake)
+        items = []
+        for result in results:
+            if isinstance(result, Exception):
+                items.append(BulkAnonymizedItem(error=str(result) or type(result).__name__))
+            else:
+                items.append(BulkAnonymizedItem(text=result.text, anonymization_map=result.map))
+        return BulkAnonymizedData(items=items)
+
+    async def document(
+        self,
+        file: BinaryIO,
+        filename: str | None,
+        size: int,
+        options: DocumentAnonymizationOptions,
+        skip_sections: int = 0,
+        anonymization_map: dict[str, dict[str, str]] | None = None,
+    ) -> AsyncIterator[AnonymizedSegment]:
+        """
+        Анонимизация файла по разделам.
+
+        skip_sections и anonymization_map продолжают прерванную обработку: первые разделы извлекаются,
+        но в модель не отправляются, а плейсхолдеры продолжают уже выданную карту.
+        """
+        document_format = DocumentFormat.detect(file, filename)
+        exclude = {word.lower() for word in options.exclude_lemmas}
+        # Длина текста до извлечения неизвестна — для маршрутизации берётся размер файла
+        anonymizer = await self.anonymizers.resolve(options.model, size, options.labels)
+        sections = extract_sections(file, document_format, settings.DOCUMENT_SECTION_CHARS)
+        segments = anonymizer.anonymize_sections(
+            _skip(sections, skip_sections) if skip_sections else sections,
+            options.labels,
+            options.threshold,
+            exclude,
+            options.use_fake,
+            settings.DOCUMENT_SECTIONS_IN_FLIGHT,
+            anonymization_map,
+        )
+        async for segment in segments:
+            yield AnonymizedSegment(
+                text=segment.text,
+                anonymization_map=segment.map,
+            )
@@ -0,0 +1,23 @@
+from collections.abc import AsyncIterator
+from typing import Protocol
+
+from src.apps.anonymization.schemas.data import DeanonymizationData, DeanonymizedData
+from src.core.services.anonymizer.deanonymizer import Deanonymizer
+
+
+class DeanonymizeUseCaseProtocol(Protocol):
+    async def __call__(self, data: DeanonymizationData) -> DeanonymizedData: ...
+
+    def stream(
+        self, anonymization_map: dict[str, dict[str, str]], chunks: AsyncIterator[str]
+    ) -> AsyncIterator[str]: ...
+
+
+class DeanonymizeUseCaseImpl:
+    """Восстановление исходных значений. Модель не нужна, поэтому зависимостей у сценария нет."""
+
+    async def __call__(self, data: DeanonymizationData) -> DeanonymizedData:
+        return DeanonymizedData(text=Deanonymizer(data.anonymization_map).restore(data.text))
+
+    def stream(self, anonymization_map: dict[str, dict[str, str]], chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        return Deanonymizer(anonymization_map).stream().restore_async(chunks)
@@ -0,0 +1,64 @@
+from typing import Protocol
+
+from src.apps.anonymization.schemas.data import AnonymizedSegment, SessionMessage, SessionStart
+from src.core.services.anonymizer.registry import AnonymizerResolver
+from src.core.services.anonymizer.sessions import IncrementalSession, SessionStore
+from src.settings import settings
+
+
+class SessionUseCaseProtocol(Protocol):
+    def open(self, options: SessionStart) -> tuple[IncrementalSession, bool]: ...
+
+    async def send(self, session: IncrementalSession, message: SessionMessage) -> AnonymizedSegment: ...
+
+    def detach(self, session: IncrementalSession) -> None: ...
+
+
+class SessionUseCaseImpl:
+    """Инкрементальная анонимизация потокового текста с состоянием сессии между сообщениями и подключениями."""
+
+    def __init__(self, anonymizers: AnonymizerResolver, store: SessionStore) -> None:
+        self.anonymizers = anonymizers
+        self.store = store
+
+    def open(self, options: SessionStart) -> tuple[IncrementalSession, bool]:
+        """
+        Создаёт сессию или возвращает существующую по sessionId (параметры анонимизации берутся из неё).
+
+        :return: Сессия и признак того, что она продолжена.
+        """
+        if options.session_id is not None:
+            session, resumed = self.store.get(options.session_id), True
+        elif not options.labels:
+            raise ValueError("labels are required to start a session")
+        else:
+            session = self.store.create(
+                options.labels,
+                options.threshold,
+                {word.lower() for word in options.exclude_lemmas},
+                options.use_fake,
+                options.model,
+            )
+            resumed = False
+        session.connections += 1
+        return session, resumed
+
+    async def send(self, session: IncrementalSession, message: SessionMessage) -> AnonymizedSegment:
+        # Окно модели ограничено, поэтому для маршрутизации берётся его размер, а не длина всей сессии
+        window_chars = settings.SESSION_CONTEXT_CHARS + 2 * settings.SESSION_HOLDBACK_CHARS
+        anonymizer = await self.anonymizers.resolve(session.model, window_chars, session.labels)
+        try:
+            segment = await anonymizer.anonymize_increment(
+                session, message.text, message.final, settings.SESSION_HOLDBACK_CHARS, settings.SESSION_CONTEXT_CHARS
+            )
+        finally:
+            self.store.touch(session)
+        return AnonymizedSegment(
+            text=segment.text,
+            anonymization_map=segment.map,
+        )
+
+    def detach(self, session: IncrementalSession) -> None:
+        """Клиент отключился: сессия остаётся в хранилище до истечения срока простоя или вытеснения."""
+        session.connections -= 1
+        self.store.touch(session)
@@ -1,4 +1,4 @@
-from fastapi import HTTPException, Security
+from fastapi import HTTPException, Security, WebSocket, WebSocketException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from src.settings import settings
@@ -9,3 +9,10 @@ security = HTTPBearer()
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> None:
     if credentials.credentials != settings.API_KEY:
         raise HTTPException(status_code=401, detail="Invalid or missing token")
+
+
+def verify_websocket_token(websocket: WebSocket) -> None:
+    """HTTPBearer работает только с HTTP-запросами — для WebSocket заголовок Authorization проверяется вручную."""
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or token != settings.API_KEY:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid or missing token")
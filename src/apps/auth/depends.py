@@ -1,5 +1,6 @@
 from typing import Annotated
 from fastapi import Depends
-from .auth import verify_token
+from .auth import verify_token, verify_websocket_token
 
 VerifiedToken = Annotated[None, Depends(verify_token)]
+VerifiedWebSocketToken = Annotated[None, Depends(verify_websocket_token)]
@@ -0,0 +1,35 @@
+from functools import lru_cache
+from typing import Annotated
+
+from fastapi import Depends
+
+from src.apps.anonymization.depends import get_anonymize_use_case
+from src.apps.jobs.use_cases.jobs import JobsUseCaseImpl, JobsUseCaseProtocol
+from src.apps.jobs.worker import JobWorker
+from src.core.services.jobs import JobStore
+from src.settings import settings
+
+
+@lru_cache(maxsize=1)
+def get_job_store() -> JobStore:
+    return JobStore(settings.JOB_STORE_DIR)
+
+
+@lru_cache(maxsize=1)
+def get_job_worker() -> JobWorker:
+    return JobWorker(
+        get_job_store(),
+        get_anonymize_use_case,
+        concurrency=settings.JOB_WORKERS,
+        poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        result_ttl=settings.JOB_RESULT_TTL_SECONDS,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def get_jobs_use_case() -> JobsUseCaseProtocol:
+    return JobsUseCaseImpl(get_job_store())
+
+
+JobsUseCase = Annotated[JobsUseCaseProtocol, Depends(get_jobs_use_case)]
@@ -0,0 +1,81 @@
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from .depends import JobsUseCase, get_job_worker
+from .schemas.data import JobInfo
+from .use_cases.jobs import JobNotFinishedError, JobNotFoundError
+from src.apps.anonymization.schemas.data import AnonymizedSegment, DocumentAnonymizationOptions
+from src.apps.auth.depends import VerifiedToken
+from src.core.services.documents import DocumentFormat, UnsupportedDocumentError
+from src.settings import settings
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["jobs"])
+
+
+@router.post("/", status_code=202)
+async def submit_job(
+    use_case: JobsUseCase,
+    auth: VerifiedToken,
+    file: UploadFile = File(...),
+    options: str = Form(...),
+) -> JobInfo:
+    """
+    Ставит документ (TXT, DOCX, PDF) в очередь на анонимизацию. Поля запроса — как у /anonymization/document.
+
+    Статус и прогресс — GET /api/v1/jobs/{job_id}, результат после завершения — GET /api/v1/jobs/{job_id}/result.
+    """
+    try:
+        parsed_options = DocumentAnonymizationOptions.model_validate_json(options)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False)) from None
+    if (file.size or 0) > settings.DOCUMENT_MAX_UPLOAD_MB * 2**20:
+        raise HTTPException(status_code=413, detail=f"File is larger than {settings.DOCUMENT_MAX_UPLOAD_MB} MB")
+    try:
+        # Неподдерживаемый формат отклоняется сразу, а не после ожидания в очереди
+        DocumentFormat.detect(file.file, file.filename)
+    except UnsupportedDocumentError as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from None
+
+    info = await use_case.submit(file.file, file.filename, parsed_options)
+    get_job_worker().notify()
+    return info
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, use_case: JobsUseCase, auth: VerifiedToken) -> JobInfo:
+    try:
+        return await use_case.get(job_id)
+    except JobNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from None
+
+
+async def _ndjson(first: AnonymizedSegment | None, rest: AsyncIterator[AnonymizedSegment]) -> AsyncIterator[str]:
+    if first is not None:
+        yield first.model_dump_json(by_alias=True) + "\n"
+    async for segment in rest:
+        yield segment.model_dump_json(by_alias=True) + "\n"
+
+
+@router.get("/{job_id}/result", response_class=StreamingResponse)
+async def get_job_result(job_id: str, use_case: JobsUseCase, auth: VerifiedToken):
+    """Результат в формате NDJSON, как у /anonymization/document: строка на раздел, карта общая для документа."""
+    segments = use_case.result(job_id)
+    try:
+        first = await anext(segments, None)
+    except JobNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from None
+    except JobNotFinishedError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from None
+    return StreamingResponse(_ndjson(first, segments), media_type="application/x-ndjson")
+
+
+@router.delete("/{job_id}", status_code=204)
+async def delete_job(job_id: str, use_case: JobsUseCase, auth: VerifiedToken) -> None:
+    """Удаляет задание и его результат; выполняющееся задание прекращается после текущего раздела."""
+    try:
+        await use_case.delete(job_id)
+    except JobNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from None
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from src.core.schemas import OutputApiSchema
+from src.core.services.jobs import JobStatus
+
+
+class JobInfo(OutputApiSchema):
+    job_id: str
+    status: JobStatus
+    filename: str | None = None
+    sections_done: int
+    attempts: int
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    expires_at: datetime | None = None
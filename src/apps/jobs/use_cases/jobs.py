@@ -0,0 +1,84 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import BinaryIO, Protocol
+
+from pydantic.alias_generators import to_camel
+
+from src.apps.anonymization.schemas.data import AnonymizedSegment, DocumentAnonymizationOptions
+from src.apps.jobs.schemas.data import JobInfo
+from src.core.services.jobs import JobRecord, JobStatus, JobStore
+
+_RESULT_PAGE_SIZE = 100
+
+
+class JobNotFoundError(LookupError):
+    """Задания нет или срок хранения его результата истёк."""
+
+
+class JobNotFinishedError(Exception):
+    """Результат запрошен до завершения задания."""
+
+
+class JobsUseCaseProtocol(Protocol):
+    async def submit(self, file: BinaryIO, filename: str | None, options: DocumentAnonymizationOptions) -> JobInfo: ...
+
+    async def get(self, job_id: str) -> JobInfo: ...
+
+    async def result(self, job_id: str) -> AsyncIterator[AnonymizedSegment]: ...
+
+    async def delete(self, job_id: str) -> None: ...
+
+
+class JobsUseCaseImpl:
+    def __init__(self, store: JobStore) -> None:
+        self.store = store
+
+    async def submit(self, file: BinaryIO, filename: str | None, options: DocumentAnonymizationOptions) -> JobInfo:
+        # Входные схемы принимают только camelCase-имена — в том же виде параметры и сохраняются
+        serialized = json.dumps({to_camel(name): value for name, value in options.model_dump(mode="json").items()})
+        job_id = await asyncio.to_thread(self.store.create, file, filename, serialized)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> JobInfo:
+        return self._info(await self._record(job_id))
+
+    async def result(self, job_id: str) -> AsyncIterator[AnonymizedSegment]:
+        """
+        Результат задания по разделам, как в потоковой анонимизации.
+
+        Ошибки (нет задания, не завершено) выбрасываются при получении первого элемента.
+        """
+        record = await self._record(job_id)
+        if record.status != JobStatus.done:
+            raise JobNotFinishedError(f"Job {job_id} is {record.status}")
+        start = 0
+        while page := await asyncio.to_thread(self.store.segments, job_id, start, _RESULT_PAGE_SIZE):
+            for text, anonymization_map in page:
+                yield AnonymizedSegment(text=text, anonymization_map=anonymization_map)
+            start += len(page)
+
+    async def delete(self, job_id: str) -> None:
+        if not await asyncio.to_thread(self.store.delete, job_id):
+            raise JobNotFoundError(f"Job {job_id} not found")
+
+    async def _record(self, job_id: str) -> JobRecord:
+        record = await asyncio.to_thread(self.store.get, job_id)
+        if record is None:
+            raise JobNotFoundError(f"Job {job_id} not found")
+        return record
+
+    @staticmethod
+    def _info(record: JobRecord) -> JobInfo:
+        return JobInfo(
+            job_id=record.id,
+            status=record.status,
+            filename=record.filename,
+            sections_done=record.sections_done,
+            attempts=record.attempts,
+            error=record.error,
+            created_at=datetime.fromtimestamp(record.created).astimezone(),
+            updated_at=datetime.fromtimestamp(record.updated).astimezone(),
+            expires_at=datetime.fromtimestamp(record.expires).astimezone() if record.expires else None,
+        )
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from contextlib import suppress
+
+from src.apps.anonymization.schemas.data import DocumentAnonymizationOptions
+from src.apps.anonymization.use_cases.anonymize import AnonymizeUseCaseProtocol
+from src.core.admission import AdmissionRejectedError, Priority, RequestBudget, set_request_budget
+from src.core.metrics import JOBS_FINISHED
+from src.core.services.jobs import JobRecord, JobStore
+
+logger = logging.getLogger(__name__)
+
+# Как часто удалять задания с истёкшим сроком хранения результата
+_PURGE_INTERVAL_SECONDS = 60.0
+
+
+class JobWorker:
+    """
+    Фоновая обработка заданий из JobStore в процессе приложения.
+
+    Задание выполняется тем же сценарием, что и загрузка документа (AnonymizeUseCaseProtocol.document),
+    но с низким приоритетом и без дедлайна: его чанки уступают очередь инференса интерактивным запросам.
+    Результат каждого раздела сохраняется сразу, поэтому прерванное задание продолжается с места остановки.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        use_case_factory: Callable[[], AnonymizeUseCaseProtocol],
+        concurrency: int = 1,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 300.0,
+        result_ttl: float = 86400.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self.store = store
+        self.use_case_factory = use_case_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run(), name=f"job-worker-{i}") for i in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._purge(), name="job-purge"))
+
+    def notify(self) -> None:
+        """Новое задание в очереди — не ждать следующего опроса."""
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        # Незавершённые задания остаются в статусе running и будут подхвачены после истечения аренды
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    async def _run(self) -> None:
+        # Все чанки заданий — с низким приоритетом и без дедлайна
+        set_request_budget(RequestBudget(priority=Priority.LOW))
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, self.lease_seconds)
+            except Exception:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                continue
+            await self._process(job)
+
+    async def _process(self, job: JobRecord) -> None:
+        if job.attempts > self.max_attempts:
+            await self._fail(job, f"Job was interrupted {job.attempts - 1} times")
+            return
+        logger.info("Processing job %s (attempt %d, from section %d)", job.id, job.attempts, job.sections_done)
+        try:
+            seq, anonymization_map = await asyncio.to_thread(self.store.progress, job.id)
+            options = DocumentAnonymizationOptions.model_validate_json(job.options)
+            file = await asyncio.to_thread(open, self.store.input_path(job.id), "rb")
+            with file:
+                segments = self.use_case_factory().document(
+                    file, job.filename, job.size, options, skip_sections=seq, anonymization_map=anonymization_map
+                )
+                async for segment in segments:
+                    saved = await asyncio.to_thread(
+                        self.store.append_segment,
+                        job,
+                        seq,
+                        segment.text,
+                        segment.anonymization_map,
+                        self.lease_seconds,
+                    )
+                    if not saved:
+                        logger.info("Job %s was deleted or taken over, stopping", job.id)
+                        return
+                    seq += 1
+        except asyncio.CancelledError:
+            # Остановка приложения: задание сразу возвращается в очередь, не дожидаясь истечения аренды
+            await asyncio.to_thread(self.store.release, job)
+            raise
+        except AdmissionRejectedError as exc:
+            # Очередь инференса занята интерактивными запросами — задание подождёт
+            await asyncio.to_thread(self.store.release, job)
+            await asyncio.sleep(max(exc.retry_after, self.poll_interval))
+            return
+        except Exception as exc:
+            logger.exception("Job %s failed", job.id)
+            await self._fail(job, str(exc) or type(exc).__name__)
+            return
+        await asyncio.to_thread(self.store.complete, job, self.result_ttl)
+        JOBS_FINISHED.labels("done").inc()
+        logger.info("Job %s is done: %d sections", job.id, seq)
+
+    async def _fail(self, job: JobRecord, error: str) -> None:
+        await asyncio.to_thread(self.store.fail, job, error, self.result_ttl)
+        JOBS_FINISHED.labels("failed").inc()
+
+    async def _purge(self) -> None:
+        while True:
+            try:
+                if purged := await asyncio.to_thread(self.store.purge_expired):
+                    logger.info("Purged %d expired jobs", purged)
+            except Exception:
+                logger.exception("Failed to purge expired jobs")
+            await asyncio.sleep(_PURGE_INTERVAL_SECONDS)
@@ -1,10 +1,39 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
+from .apps.jobs.depends import get_job_worker
+from .core.admission import AdmissionRejectedError, admission_rejected_handler
+from .core.services.anonymizer.depends import get_model_router
+from .core.services.anonymizer.lemmas import get_lemmatizer
+from .core.services.anonymizer.registry import UnknownModelError
 from .logging import set_logging
 from .middlware import apply_middleware
 from .router import apply_routes
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def prepare_models(app: FastAPI) -> None:
+    """Загружает и прогревает модели, нужные с первого запроса. По завершении приложение считается готовым."""
+    try:
+        router = get_model_router()
+        for alias in router.preload_aliases():
+            anonymizer = await asyncio.to_thread(router.get, alias)
+            await anonymizer.warmup(settings.WARMUP_LABELS, settings.WARMUP_TOKEN_LENGTHS)
+    except Exception:
+        logger.exception("Model preload failed, the application stays not ready")
+        return
+    app.state.ready = True
+    logger.info("Models %s are loaded and warmed up", ", ".join(get_model_router().preload_aliases()))
+
+
+async def unknown_model_handler(request: Request, exc: UnknownModelError) -> JSONResponse:
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
 
 
 @asynccontextmanager
@@ -15,12 +44,29 @@ async def lifespan(app: FastAPI):
     """
     # Инициализация ресурсов
     set_logging()
+    app.state.ready = not settings.PRELOAD_MODEL
+    # Модель грузится в фоне: /health/live отвечает сразу, /health/ready — после прогрева
+    preload = asyncio.create_task(prepare_models(app)) if settings.PRELOAD_MODEL else None
+    if settings.JOB_WORKERS:
+        get_job_worker().start()
     yield
+    if settings.JOB_WORKERS:
+        await get_job_worker().stop()
     # Освобождение ресурсов
+    if preload is not None:
+        preload.cancel()
+        with suppress(asyncio.CancelledError):
+            await preload
+    if settings.LEMMA_INDEX_SAVE and settings.LEMMA_INDEX_PATH:
+        # Прогретый словарь лемм переживает перезапуск
+        saved = await asyncio.to_thread(get_lemmatizer().save, settings.LEMMA_INDEX_PATH)
+        logger.info("Saved %d lemma forms to %s", saved, settings.LEMMA_INDEX_PATH)
 
 
 def create_app() -> FastAPI:
     app = FastAPI(lifespan=lifespan)
+    app.add_exception_handler(AdmissionRejectedError, admission_rejected_handler)  # type: ignore
+    app.add_exception_handler(UnknownModelError, unknown_model_handler)  # type: ignore
 
     app = apply_routes(apply_middleware(app))
     return app
@@ -0,0 +1,290 @@
+"""
+Офлайн-анонимизация корпусов JSONL/Parquet пулом процессов.
+
+Модель загружается один раз в главном процессе, воркеры создаются через fork и разделяют веса (как в pre-fork
+режиме сервера). Вход читается потоково пачками документов; каждая пачка целиком уходит в anonymize_many воркера,
+поэтому чанки её документов попадают в общие батчи модели. Результаты пишутся в выходной JSONL строго в порядке
+входа, по мере готовности; одновременно в работе не больше 2 × workers пачек.
+
+Прогресс сохраняется в файл контрольной точки (<output>.checkpoint) после каждой записанной пачки:
+повторный запуск с теми же аргументами продолжает с первого незаписанного документа.
+
+Каждая выходная строка — исходная запись, в которой текст заменён анонимизированным, плюс поле anonymizationMap
+(или error, если документ обработать не удалось).
+
+Запуск:
+    python -m src.bulk corpus.jsonl corpus.anon.jsonl --labels person address --workers 4
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from pathlib import Path
+
+from src.core.services.anonymizer.base import Anonymizer
+from src.core.services.anonymizer.depends import AnonymizerType, get_anonymizer
+from src.core.services.anonymizer.lemmas import get_lemmatizer
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_REPORT_INTERVAL_SECONDS = 10.0
+
+# Состояние воркера пула: анонимизатор унаследован от главного процесса, event loop — свой на весь процесс,
+# так как очередь инференса и полосы исполнителя привязаны к циклу, в котором впервые использованы
+_anonymizer: Anonymizer | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class BulkOptions:
+    labels: list[str]
+    threshold: float
+    exclude_lemmas: set[str]
+    use_fake: bool
+
+
+@dataclass
+class Checkpoint:
+    input: str
+    documents: int = 0  # сколько документов входа уже записано
+    output_bytes: int = 0  # длина выходного файла после последней записанной пачки
+
+    @classmethod
+    def load(cls, path: Path, input_path: str) -> "Checkpoint":
+        if not path.exists():
+            return cls(input_path)
+        checkpoint = cls(**json.loads(path.read_text()))
+        if checkpoint.input != input_path:
+            raise SystemExit(f"Checkpoint {path} belongs to another input: {checkpoint.input}")
+        return checkpoint
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self)))
+        os.replace(tmp, path)
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    """Записи входа по порядку: JSONL или Parquet (по расширению файла)."""
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet input requires pyarrow") from None
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+
+    with path.open(encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                # Битая строка не должна сдвигать нумерацию документов — она попадёт в выход с ошибкой
+                yield {"error": f"Line {number}: {exc}"}
+
+
+def batched(records: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _init_worker(torch_threads: int) -> None:
+    global _loop
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    _loop = asyncio.new_event_loop()
+
+
+def _anonymize_batch(texts: list[str], options: BulkOptions) -> list[tuple[str, dict] | str]:
+    """Выполняется в воркере: (текст, карта) для каждого документа или сообщение об ошибке."""
+    results = _loop.run_until_complete(
+        _anonymizer.anonymize_many(texts, options.labels, options.threshold, options.exclude_lemmas, options.use_fake)
+    )
+    return [
+        (str(result) or type(result).__name__) if isinstance(result, Exception) else (result.text, result.map)
+        for result in results
+    ]
+
+
+class BulkAnonymizer:
+    def __init__(
+        self,
+        input_path: Path,
+        output_path: Path,
+        options: BulkOptions,
+        workers: int,
+        batch_size: int = 32,
+        text_field: str = "text",
+        torch_threads: int = 0,
+    ) -> None:
+        self.input_path = input_path
+        self.output_path = output_path
+        self.checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+        self.options = options
+        self.workers = workers
+        self.batch_size = batch_size
+        self.text_field = text_field
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.documents = 0
+        self.errors = 0
+        self.characters = 0
+
+    def run(self, model: str) -> None:
+        checkpoint = Checkpoint.load(self.checkpoint_path, str(self.input_path.resolve()))
+        if checkpoint.documents:
+            logger.info("Resuming after %d documents", checkpoint.documents)
+        self._load_model(model)
+
+        records = read_records(self.input_path)
+        for _ in range(checkpoint.documents):
+            next(records, None)
+
+        with self.output_path.open("ab") as output:
+            # Хвост, дописанный после последней контрольной точки, выбрасывается — эти документы будут обработаны снова
+            output.truncate(checkpoint.output_bytes)
+            output.seek(checkpoint.output_bytes)
+            self._process(batched(records, self.batch_size), output, checkpoint)
+        self._report(final=True)
+
+    def _load_model(self, model: str) -> None:
+        """Загружает модель в главном процессе, чтобы воркеры получили её через fork без копирования весов."""
+        global _anonymizer
+        import torch
+
+        _anonymizer = get_anonymizer(AnonymizerType(settings.ANONYMIZER), model)
+        batcher = getattr(_anonymizer, "batcher", None)
+        if batcher is not None:
+            # Контроль допуска нужен серверу: офлайн-прогон не должен падать на пачке больше лимита очереди
+            batcher.max_queue_depth = 0
+        weights = getattr(_anonymizer, "model", None)
+        if isinstance(weights, torch.nn.Module):
+            weights.share_memory()
+        get_lemmatizer()
+        gc.freeze()
+
+    def _process(self, batches: Iterator[list[dict]], output, checkpoint: Checkpoint) -> None:
+        # Окно пачек в работе: результаты пишутся по порядку, вход не читается дальше, чем нужно
+        window: deque[tuple[list[dict], Future]] = deque()
+        self._started = self._reported_at = time.perf_counter()
+        self._reported_documents = 0
+        with ProcessPoolExecutor(
+            self.workers, mp_context=get_context("fork"), initializer=_init_worker, initargs=(self.torch_threads,)
+        ) as pool:
+            for batch in batches:
+                texts = [self._text(record) or "" for record in batch]
+                window.append((batch, pool.submit(_anonymize_batch, texts, self.options)))
+                if len(window) >= 2 * self.workers:
+                    self._write(*window.popleft(), output, checkpoint)
+            while window:
+                self._write(*window.popleft(), output, checkpoint)
+
+    def _text(self, record: dict) -> str | None:
+        text = record.get(self.text_field)
+        return text if isinstance(text, str) else None
+
+    def _write(self, batch: list[dict], future: Future, output, checkpoint: Checkpoint) -> None:
+        results = future.result()
+        lines = []
+        for record, result in zip(batch, results):
+            text = self._text(record)
+            if text is None:
+                record.setdefault("error", f"Field {self.text_field!r} is missing or not a string")
+                self.errors += 1
+            elif isinstance(result, str):
+                record["error"] = result
+                self.errors += 1
+            else:
+                self.characters += len(text)
+                record[self.text_field], record["anonymizationMap"] = result
+            lines.append(json.dumps(record, ensure_ascii=False))
+        output.write(("\n".join(lines) + "\n").encode())
+        output.flush()
+        os.fsync(output.fileno())
+
+        self.documents += len(batch)
+        checkpoint.documents += len(batch)
+        checkpoint.output_bytes = output.tell()
+        checkpoint.save(self.checkpoint_path)
+        if time.perf_counter() - self._reported_at >= _REPORT_INTERVAL_SECONDS:
+            self._report()
+
+    def _report(self, final: bool = False) -> None:
+        now = time.perf_counter()
+        elapsed = max(now - self._started, 1e-9) if self.documents else 0.0
+        if final:
+            logger.info(
+                "Done: %d documents (%d errors) in %.1f s, %.1f docs/s",
+                self.documents,
+                self.errors,
+                elapsed,
+                self.documents / elapsed if elapsed else 0.0,
+            )
+            return
+        recent = (self.documents - self._reported_documents) / max(now - self._reported_at, 1e-9)
+        logger.info(
+            "%d documents (%d errors): %.1f docs/s now, %.1f docs/s average, %.0f chars/s",
+            self.documents,
+            self.errors,
+            recent,
+            self.documents / elapsed,
+            self.characters / elapsed,
+        )
+        self._reported_at = now
+        self._reported_documents = self.documents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Офлайн-анонимизация корпуса JSONL/Parquet")
+    parser.add_argument("input", type=Path, help="Входной файл: .jsonl или .parquet")
+    parser.add_argument("output", type=Path, help="Выходной JSONL; рядом сохраняется <output>.checkpoint")
+    parser.add_argument("--labels", nargs="+", required=True)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--exclude-lemmas", nargs="*", default=[])
+    parser.add_argument("--use-fake", action="store_true")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--model", default=settings.GLINER_MODEL)
+    parser.add_argument("--workers", type=int, default=max(1, settings.WORKERS))
+    parser.add_argument("--batch-size", type=int, default=32, help="Документов в одной пачке воркера")
+    parser.add_argument("--torch-threads", type=int, default=settings.WORKER_TORCH_THREADS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    options = BulkOptions(
+        labels=args.labels,
+        threshold=args.threshold,
+        exclude_lemmas={word.lower() for word in args.exclude_lemmas},
+        use_fake=args.use_fake,
+    )
+    BulkAnonymizer(
+        args.input,
+        args.output,
+        options,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        text_field=args.text_field,
+        torch_threads=args.torch_threads,
+    ).run(args.model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Контроль допуска запросов к инференсу.
+
+Приоритет и дедлайн запроса задаются заголовками (см. AdmissionMiddleware) и хранятся в ContextVar,
+откуда их читает очередь инференса. Запрос, который не поместится в очередь или заведомо
+не успеет к дедлайну, отклоняется сразу — до того, как модель потратит на него время.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from math import ceil
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from src.core.metrics import ADMISSION_REJECTED
+
+
+class Priority(IntEnum):
+    """Класс приоритета запроса. Меньшее значение обслуживается раньше."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+    @classmethod
+    def parse(cls, value: str | None) -> "Priority":
+        try:
+            return cls[value.strip().upper()] if value else cls.NORMAL
+        except KeyError:
+            return cls.NORMAL
+
+
+@dataclass(frozen=True, slots=True)
+class RequestBudget:
+    priority: Priority = Priority.NORMAL
+    deadline: float | None = None  # момент по perf_counter(), после которого результат уже не нужен
+
+
+_request_budget: ContextVar[RequestBudget] = ContextVar("request_budget")
+
+
+def set_request_budget(budget: RequestBudget) -> None:
+    _request_budget.set(budget)
+
+
+def current_budget() -> RequestBudget:
+    """Бюджет текущего запроса; вне запроса (прогрев, фоновые задания) — без дедлайна и с обычным приоритетом."""
+    return _request_budget.get(None) or RequestBudget()
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Запрос не допущен к инференсу. retry_after — оценка, через сколько секунд стоит повторить.
+
+    count=False — ошибка возникла уже после допуска и не учитывается в метрике отказов допуска.
+    """
+
+    status_code = 503
+    reason = "rejected"
+
+    def __init__(self, message: str, retry_after: float, count: bool = True) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        if count:
+            ADMISSION_REJECTED.labels(self.reason).inc()
+
+
+class QueueFullError(AdmissionRejectedError):
+    status_code = 429
+    reason = "queue_full"
+
+
+class DeadlineExceededError(AdmissionRejectedError):
+    status_code = 503
+    reason = "deadline"
+
+
+async def admission_rejected_handler(request: Request, exc: AdmissionRejectedError) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, ceil(exc.retry_after)))},
+    )
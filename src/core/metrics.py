@@ -0,0 +1,141 @@
+"""
+Метрики Prometheus и замеры стадий обработки запроса.
+
+Длительность стадий пишется в гистограммы и, если для запроса включён сбор (см. ServerTimingMiddleware),
+в заголовок Server-Timing.
+"""
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+
+_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CHUNKING_SECONDS = Histogram("maskara_chunking_seconds", "Время разбиения документа на чанки", buckets=_SECONDS_BUCKETS)
+CHUNK_TOKENS = Histogram(
+    "maskara_chunk_tokens", "Количество токенов в чанке", buckets=(16, 32, 64, 128, 256, 384, 512, 640, 768, 1024)
+)
+CHUNKS_PER_REQUEST = Histogram(
+    "maskara_chunks_per_document", "Количество чанков в документе", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024)
+)
+INFERENCE_SECONDS = Histogram(
+    "maskara_inference_seconds", "Время ожидания всех чанков документа (очередь + модель)", buckets=_SECONDS_BUCKETS
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "maskara_inference_queue_seconds", "Время ожидания чанка в очереди инференса", buckets=_SECONDS_BUCKETS
+)
+MODEL_FORWARD_SECONDS = Histogram(
+    "maskara_model_forward_seconds", "Время прямого прохода модели по батчу", buckets=_SECONDS_BUCKETS
+)
+BATCH_SIZE = Histogram("maskara_inference_batch_size", "Размер батча инференса", buckets=(1, 2, 4, 8, 16, 32, 64))
+LABEL_GROUPS_PER_REQUEST = Histogram(
+    "maskara_label_groups_per_request",
+    "Количество групп меток (прогонов модели по одним и тем же чанкам) в запросе",
+    buckets=(1, 2, 3, 4, 6, 8),
+)
+CHUNKS_PER_SEQUENCE = Histogram(
+    "maskara_chunks_per_sequence",
+    "Количество чанков, упакованных в одну последовательность модели",
+    buckets=(1, 2, 4, 8, 16),
+)
+LEMMA_FILTER_SECONDS = Histogram(
+    "maskara_lemma_filter_seconds", "Время фильтрации сущностей по леммам", buckets=_SECONDS_BUCKETS
+)
+RECONSTRUCTION_SECONDS = Histogram(
+    "maskara_reconstruction_seconds",
+    "Время постобработки сущностей и сборки анонимизированного текста",
+    buckets=_SECONDS_BUCKETS,
+)
+QUEUE_DEPTH = Gauge("maskara_inference_queue_depth", "Количество чанков в очереди инференса")
+INFERENCE_ERRORS = Counter("maskara_inference_errors", "Количество батчей, завершившихся ошибкой")
+ADMISSION_REJECTED = Counter(
+    "maskara_admission_rejected", "Запросы, отклонённые контролем допуска", labelnames=["reason"]
+)
+QUEUE_EXPIRED = Counter("maskara_inference_queue_expired", "Допущенные запросы, дедлайн которых истёк в очереди")
+MODEL_ROUTED = Counter(
+    "maskara_model_routed", "Решения маршрутизации запросов по моделям", labelnames=["model", "reason"]
+)
+MODEL_EVICTIONS = Counter("maskara_model_evictions", "Выгрузки моделей из реестра", labelnames=["backend", "model"])
+LOADED_MODEL_BYTES = Gauge(
+    "maskara_loaded_model_bytes", "Память, занимаемая загруженными моделями", labelnames=["backend", "model"]
+)
+JOBS_FINISHED = Counter("maskara_jobs_finished", "Завершённые асинхронные задания", labelnames=["status"])
+RULE_HITS = Counter("maskara_rule_hits", "Сущности, найденные детекторами на правилах", labelnames=["rule"])
+SESSIONS = Gauge("maskara_sessions", "Сессии инкрементальной анонимизации в памяти процесса")
+SESSION_BYTES = Gauge("maskara_session_bytes", "Оценка памяти, занимаемой сессиями инкрементальной анонимизации")
+SESSION_EVICTIONS = Counter(
+    "maskara_session_evictions", "Сессии, удалённые по сроку простоя или бюджету памяти", labelnames=["reason"]
+)
+
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> dict[str, float]:
+    timings: dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+class StageClock:
+    """Накапливает время стадии по нескольким участкам кода и публикует сумму одним наблюдением."""
+
+    def __init__(self, name: str, histogram: Histogram) -> None:
+        self.name = name
+        self.histogram = histogram
+        self.total = 0.0
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.total += perf_counter() - started
+
+    def publish(self) -> None:
+        self.histogram.observe(self.total)
+        record_timing(self.name, self.total)
+
+
+@contextmanager
+def stage(name: str, histogram: Histogram) -> Iterator[None]:
+    clock = StageClock(name, histogram)
+    with clock.measure():
+        yield
+    clock.publish()
+
+
+class _CacheCollector:
+    """Отдаёт счётчики попаданий/промахов кэшей, которые ведут собственную статистику."""
+
+    def __init__(self) -> None:
+        self.sources: dict[str, Callable[[], tuple[int, int]]] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("maskara_cache_hits", "Попадания в кэш", labels=["cache"])
+        misses = CounterMetricFamily("maskara_cache_misses", "Промахи кэша", labels=["cache"])
+        for name, source in self.sources.items():
+            cache_hits, cache_misses = source()
+            hits.add_metric([name], cache_hits)
+            misses.add_metric([name], cache_misses)
+        yield hits
+        yield misses
+
+
+_cache_collector = _CacheCollector()
+REGISTRY.register(_cache_collector)
+
+
+def register_cache(name: str, source: Callable[[], tuple[int, int]]) -> None:
+    """Регистрирует источник статистики кэша: функцию, возвращающую (hits, misses)."""
+    _cache_collector.sources[name] = source
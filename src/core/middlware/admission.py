@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import suppress
+from time import perf_counter
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.admission import Priority, RequestBudget, set_request_budget
+
+
+class AdmissionMiddleware:
+    """
+    Задаёт приоритет и дедлайн запроса и отменяет его обработку, если клиент отключился.
+
+    Заголовки:
+    - X-Priority: high / normal / low — класс приоритета в очереди инференса;
+    - X-Request-Timeout: сколько секунд клиент готов ждать ответ (по умолчанию — default_timeout).
+
+    После того как тело запроса прочитано, middleware слушает http.disconnect; при отключении клиента
+    обработчик отменяется, и его чанки, ещё стоящие в очереди инференса, в модель не попадают.
+    """
+
+    def __init__(self, app: ASGIApp, default_timeout: float | None = None) -> None:
+        self.app = app
+        self.default_timeout = default_timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        timeout = self.default_timeout
+        if "x-request-timeout" in headers:
+            with suppress(ValueError):
+                timeout = float(headers["x-request-timeout"])
+        set_request_budget(
+            RequestBudget(
+                priority=Priority.parse(headers.get("x-priority")),
+                deadline=perf_counter() + timeout if timeout and timeout > 0 else None,
+            )
+        )
+
+        body_received = asyncio.Event()
+        disconnected = asyncio.Event()
+
+        async def receive_until_disconnect() -> Message:
+            if body_received.is_set():
+                # Тело уже прочитано, дальше receive слушает наблюдатель — обработчику отдаём только отключение
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_received.set()
+            return message
+
+        handler = asyncio.create_task(self.app(scope, receive_until_disconnect, send))
+
+        async def watch_disconnect() -> None:
+            await body_received.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+            handler.cancel()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected.is_set():
+                raise
+        finally:
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
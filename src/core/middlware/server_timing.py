@@ -0,0 +1,30 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import start_request_timings
+
+
+class ServerTimingMiddleware:
+    """
+    Добавляет к ответу заголовок Server-Timing с длительностью стадий обработки запроса.
+
+    Сделан чистым ASGI middleware, чтобы стадии, замеренные внутри обработчика, были видны
+    в том же контексте и не ломалась потоковая отдача.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request_timings()
+
+        async def send_with_timings(message: Message) -> None:
+            if message["type"] == "http.response.start" and timings:
+                value = ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", value.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_timings)
@@ -1,8 +1,55 @@
+from collections.abc import AsyncIterator
 from typing import Protocol
-from .schemas import AnonymizationResult
+from .schemas import AnonymizationResult, AnonymizationSegment
+from .sessions import IncrementalSession
 
 
 class Anonymizer(Protocol):
+    async def warmup(self, labels: list[str], token_lengths: list[int]) -> None: ...
+
     async def anonymize(
-        self, text: str, labels: list[str], threshold: float, exclude_lemmas: set[str] | None = None
+        self,
+        text: str,
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
     ) -> AnonymizationResult: ...
+
+    async def anonymize_many(
+        self,
+        texts: list[str],
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
+    ) -> list[AnonymizationResult | Exception]: ...
+
+    def anonymize_stream(
+        self,
+        text: str,
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
+    ) -> AsyncIterator[AnonymizationSegment]: ...
+
+    def anonymize_sections(
+        self,
+        sections: AsyncIterator[str],
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
+        sections_in_flight: int = 4,
+        anonymization_map: dict[str, dict[str, str]] | None = None,
+    ) -> AsyncIterator[AnonymizationSegment]: ...
+
+    async def anonymize_increment(
+        self,
+        session: IncrementalSession,
+        text: str,
+        final: bool = False,
+        holdback_chars: int = 300,
+        context_chars: int = 300,
+    ) -> AnonymizationSegment: ...
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+from src.settings import settings
+
+
+class ChunkCacheStore(Protocol):
+    def get(self, key: str) -> list[dict] | None: ...
+
+    def set(self, key: str, spans: list[dict]) -> None: ...
+
+
+class LRUChunkCacheStore:
+    """Ограниченный по количеству записей LRU-кэш в памяти процесса."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, list[dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            spans = self._data.get(key)
+            if spans is not None:
+                self._data.move_to_end(key)
+            return spans
+
+    def set(self, key: str, spans: list[dict]) -> None:
+        with self._lock:
+            self._data[key] = spans
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class SqliteChunkCacheStore:
+    """
+    Кэш на диске (sqlite в режиме WAL), общий для всех воркеров на одной машине.
+
+    Размер ограничен `max_entries`: при переполнении удаляются самые старые записи.
+    """
+
+    _EVICT_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._pid: int | None = None
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Соединение sqlite нельзя наследовать через fork — каждый процесс открывает своё
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_spans ("
+            "key TEXT PRIMARY KEY, spans TEXT NOT NULL, created REAL NOT NULL DEFAULT (julianday('now')))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS chunk_spans_created ON chunk_spans (created)")
+        conn.commit()
+        return conn
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            row = self.conn.execute("SELECT spans FROM chunk_spans WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, spans: list[dict]) -> None:
+        payload = json.dumps(spans, ensure_ascii=False)
+        with self._lock:
+            conn = self.conn
+            conn.execute("INSERT OR REPLACE INTO chunk_spans (key, spans) VALUES (?, ?)", (key, payload))
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM chunk_spans WHERE key IN "
+                    "(SELECT key FROM chunk_spans ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+@dataclass
+class ChunkCacheStats:
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    bypassed: int = 0
+
+
+class ChunkInferenceCache:
+    """
+    Контентно-адресуемый кэш результатов инференса по чанкам.
+
+    Ключ — хэш (модель, отсортированные метки, текст чанка). Значение — сырые спаны, полученные
+    при пороге `floor_threshold`. Запрос с любым порогом >= floor обслуживается фильтрацией по score:
+    GLiNER выбирает непересекающиеся спаны жадно по убыванию score, поэтому выборка при пороге t
+    совпадает с выборкой при пороге floor, отфильтрованной по t.
+
+    Запросы с порогом ниже floor кэш не обслуживает (bypassed).
+    """
+
+    def __init__(
+        self, model: str, floor_threshold: float, memory: LRUChunkCacheStore, disk: ChunkCacheStore | None = None
+    ) -> None:
+        self.model = model
+        self.floor_threshold = floor_threshold
+        self.memory = memory
+        self.disk = disk
+        self.stats = ChunkCacheStats()
+
+    def key(self, text: str, labels: list[str]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.model.encode())
+        for label in sorted(set(labels)):
+            digest.update(b"\x00")
+            digest.update(label.encode())
+        digest.update(b"\x01")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def covers(self, threshold: float) -> bool:
+        return threshold >= self.floor_threshold
+
+    def get(self, text: str, labels: list[str], threshold: float) -> list[dict] | None:
+        """Возвращает копии закэшированных спанов со score >= threshold или None при промахе."""
+        if not self.covers(threshold):
+            self.stats.bypassed += 1
+            return None
+
+        key = self.key(text, labels)
+        spans = self.memory.get(key)
+        if spans is not None:
+            self.stats.memory_hits += 1
+        elif self.disk is not None and (spans := self.disk.get(key)) is not None:
+            self.stats.disk_hits += 1
+            self.memory.set(key, spans)
+
+        if spans is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return [dict(span) for span in spans if span.get("score", 0.0) >= threshold]
+
+    def set(self, text: str, labels: list[str], spans: list[dict]) -> None:
+        """Сохраняет сырые спаны, полученные при пороге floor_threshold."""
+        key = self.key(text, labels)
+        spans = [dict(span) for span in spans]
+        self.memory.set(key, spans)
+        if self.disk is not None:
+            self.disk.set(key, spans)
+
+
+def create_chunk_cache(model: str) -> ChunkInferenceCache | None:
+    """Собирает кэш чанков по настройкам. Возвращает None, если кэш отключён (CHUNK_CACHE_SIZE=0)."""
+    if settings.CHUNK_CACHE_SIZE <= 0:
+        return None
+    disk = None
+    if settings.CHUNK_CACHE_PATH:
+        disk = SqliteChunkCacheStore(settings.CHUNK_CACHE_PATH, settings.CHUNK_CACHE_DISK_MAX_ENTRIES)
+    return ChunkInferenceCache(
+        model,
+        floor_threshold=settings.CHUNK_CACHE_FLOOR_THRESHOLD,
+        memory=LRUChunkCacheStore(settings.CHUNK_CACHE_SIZE),
+        disk=disk,
+    )
@@ -0,0 +1,107 @@
+"""
+Восстановление исходного текста по карте анонимизации.
+
+Все замены ищутся одним скомпилированным регулярным выражением за один проход по тексту,
+а не циклом str.replace по каждому плейсхолдеру (O(текст × плейсхолдеры)).
+"""
+
+import re
+from collections.abc import AsyncIterator, Iterable
+
+# Плейсхолдеры [LABEL_n] ищутся общим шаблоном и проверяются по словарю — компилировать
+# альтернативу из тысяч строк не нужно
+_PLACEHOLDER_PATTERN = re.compile(r"\[[^\[\]\n]+?_\d+\]")
+
+
+def invert_map(anonymization_map: dict[str, dict[str, str]]) -> dict[str, str]:
+    """Переводит карту dict[label, dict[original_text, replacement]] в dict[replacement, original_text]."""
+    return {
+        replacement: original_text
+        for originals in anonymization_map.values()
+        for original_text, replacement in originals.items()
+    }
+
+
+class Deanonymizer:
+    """Подставляет исходные значения вместо плейсхолдеров (или фейковых значений) за один проход."""
+
+    def __init__(self, anonymization_map: dict[str, dict[str, str]]) -> None:
+        self.replacements = invert_map(anonymization_map)
+        self.max_length = max(map(len, self.replacements), default=0)
+        if all(_PLACEHOLDER_PATTERN.fullmatch(replacement) for replacement in self.replacements):
+            self.pattern = _PLACEHOLDER_PATTERN
+        else:
+            # Произвольные замены: длинные раньше коротких, чтобы «Иванов» не разрезался на «Иван» + «ов»
+            alternatives = sorted(self.replacements, key=len, reverse=True)
+            self.pattern = re.compile("|".join(map(re.escape, alternatives))) if alternatives else None
+
+    def _substitute(self, match: re.Match) -> str:
+        value = match.group()
+        return self.replacements.get(value, value)
+
+    def restore(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._substitute, text)
+
+    def stream(self) -> "StreamingDeanonymizer":
+        return StreamingDeanonymizer(self)
+
+
+class StreamingDeanonymizer:
+    """
+    Восстановление текста, приходящего частями (например, потоковый ответ LLM).
+
+    Плейсхолдер может быть разрезан между частями, поэтому хвост буфера короче самой длинной замены
+    придерживается до следующей части. Склейка всех результатов `feed` и `flush` совпадает с `restore`
+    по склеенному тексту.
+    """
+
+    def __init__(self, deanonymizer: Deanonymizer) -> None:
+        self.deanonymizer = deanonymizer
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        """Принимает очередную часть текста и возвращает восстановленный текст, который уже можно отдать."""
+        buffer = self._buffer + chunk
+        pattern = self.deanonymizer.pattern
+        if pattern is None:
+            return buffer
+        # Совпадение, начавшееся до safe, целиком лежит в буфере и не может удлиниться следующей частью
+        safe = len(buffer) - self.deanonymizer.max_length + 1
+        pieces = []
+        cursor = 0
+        for match in pattern.finditer(buffer):
+            if match.start() >= safe:
+                break
+            pieces.append(buffer[cursor : match.start()])
+            pieces.append(self.deanonymizer._substitute(match))
+            cursor = match.end()
+        emit_until = max(cursor, safe)
+        pieces.append(buffer[cursor:emit_until])
+        self._buffer = buffer[emit_until:]
+        return "".join(pieces)
+
+    def flush(self) -> str:
+        """Восстанавливает придержанный хвост в конце потока."""
+        tail, self._buffer = self._buffer, ""
+        return self.deanonymizer.restore(tail)
+
+    def restore_all(self, chunks: Iterable[str]) -> Iterable[str]:
+        for chunk in chunks:
+            if restored := self.feed(chunk):
+                yield restored
+        if tail := self.flush():
+            yield tail
+
+    async def restore_async(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        async for chunk in chunks:
+            if restored := self.feed(chunk):
+                yield restored
+        if tail := self.flush():
+            yield tail
+
+
+def deanonymize(text: str, anonymization_map: dict[str, dict[str, str]]) -> str:
+    """Восстанавливает текст по карте, возвращённой `GlinerAnonymizer.anonymize`."""
+    return Deanonymizer(anonymization_map).restore(text)
@@ -1,15 +1,49 @@
 from enum import StrEnum
+from functools import lru_cache
 
 from src.settings import settings
 from .base import Anonymizer
 from .gliner.gliner import get_gliner
+from .gliner.gliner_onnx import get_gliner_onnx
+from .registry import DEFAULT_ALIAS, ModelRegistry, ModelRouter
 
 
 class AnonymizerType(StrEnum):
     gliner = "gliner"
+    gliner_onnx = "gliner_onnx"
 
 
-def get_anonymizer(anonymizer_type: AnonymizerType) -> Anonymizer:
+def _load_anonymizer(backend: str, model: str) -> Anonymizer:
+    anonymizer_type = AnonymizerType(backend)
     if anonymizer_type == AnonymizerType.gliner:
-        return get_gliner(settings.GLINER_MODEL)
+        return get_gliner(model)
+    if anonymizer_type == AnonymizerType.gliner_onnx:
+        return get_gliner_onnx(model, quantize=settings.ONNX_QUANTIZE)
     raise ValueError("Unexpected anonymizer type")
+
+
+@lru_cache(maxsize=1)
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry(_load_anonymizer, budget_bytes=settings.MODEL_MEMORY_BUDGET_MB * 2**20)
+
+
+@lru_cache(maxsize=1)
+def get_model_router() -> ModelRouter:
+    return ModelRouter(
+        get_model_registry(),
+        backend=settings.ANONYMIZER,
+        models={**settings.MODELS, DEFAULT_ALIAS: settings.GLINER_MODEL},
+        short_model=settings.MODEL_ROUTING_SHORT_MODEL,
+        short_text_chars=settings.MODEL_ROUTING_SHORT_TEXT_CHARS,
+        sensitive_labels=settings.MODEL_ROUTING_SENSITIVE_LABELS,
+    )
+
+
+def get_anonymizer(anonymizer_type: AnonymizerType, model: str | None = None) -> Anonymizer:
+    """Анонимизатор из реестра; модель загружается при первом обращении (параллельные вызовы её дожидаются)."""
+    return get_model_registry().get(anonymizer_type, model or settings.GLINER_MODEL)
+
+
+def clear_anonymizers() -> None:
+    """Выгружает все модели, чтобы следующий get_anonymizer загрузил модель заново."""
+    get_model_registry().clear()
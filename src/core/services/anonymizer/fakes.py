@@ -0,0 +1,195 @@
+"""
+Подстановка реалистичных фейковых значений вместо плейсхолдеров.
+
+Значения не генерируются на каждую сущность: для каждого вида данных заранее создаётся пул
+(Faker с фиксированным seed, поэтому пул одинаков между перезапусками и воркерами).
+Значение выбирается по хэшу исходного текста, так что одна и та же сущность всегда получает
+одну и ту же подстановку. Если пул заполняется слишком плотно, он дополняется в фоне.
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from hashlib import blake2b
+from typing import TYPE_CHECKING
+
+from src.core.services.anonymizer.placeholders import PlaceholderMap
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from faker import Faker
+
+logger = logging.getLogger(__name__)
+
+# Вид данных (метод Faker) → имена меток запроса
+DEFAULT_ALIASES: dict[str, list[str]] = {
+    "name": ["person", "name", "full name", "имя", "фио", "человек", "персона"],
+    "first_name": ["first name", "имя человека"],
+    "last_name": ["last name", "surname", "фамилия"],
+    "phone_number": ["phone", "phone number", "telephone", "mobile phone number", "телефон", "номер телефона"],
+    "free_email": ["email", "e-mail", "email address", "электронная почта"],
+    "address": ["address", "адрес"],
+    "street_address": ["street", "street address", "улица"],
+    "city": ["city", "location", "город"],
+    "company": ["organization", "company", "организация", "компания"],
+    "individuals_inn": ["inn", "инн", "taxpayer identification number"],
+    "snils": ["snils", "снилс"],
+    "passport_number": ["passport", "passport number", "паспорт", "номер паспорта", "паспортные данные"],
+    "credit_card_number": ["bank card", "credit card", "credit card number", "card number", "номер карты"],
+    "iban": ["iban"],
+    "date": ["date", "date of birth", "дата", "дата рождения"],
+}
+
+# Доля занятых значений пула в одном документе, после которой пул дополняется в фоне
+_GROW_LOAD_FACTOR = 0.5
+
+
+@lru_cache(maxsize=1)
+def get_fake_pools() -> "FakeValuePools":
+    return FakeValuePools(
+        locale=settings.FAKE_LOCALE,
+        pool_size=settings.FAKE_POOL_SIZE,
+        seed=settings.FAKE_SEED,
+        aliases=settings.FAKE_LABEL_ALIASES,
+    )
+
+
+class FakeValuePools:
+    """Пулы заранее сгенерированных фейковых значений по видам данных."""
+
+    def __init__(self, locale: str, pool_size: int, seed: int, aliases: dict[str, list[str]] | None = None) -> None:
+        self.locale = locale
+        self.pool_size = pool_size
+        self.seed = seed
+        self._label_to_kind: dict[str, str] = {}
+        for kind, names in {**DEFAULT_ALIASES, **(aliases or {})}.items():
+            for name in names:
+                self._label_to_kind[name.strip().lower()] = kind
+        self._pools: dict[str, list[str]] = {}
+        self._generators: dict[str, Faker] = {}
+        self._lock = threading.Lock()
+        self._growing: set[str] = set()
+
+    def kind(self, label: str) -> str | None:
+        """Вид данных для метки запроса; None — для метки нет генератора, используется плейсхолдер."""
+        return self._label_to_kind.get(label.strip().lower())
+
+    def prefill(self) -> None:
+        """
+        Заполняет пулы всех видов данных заранее (при старте), чтобы генерация не попадала на путь запроса:
+        запрос может прийти с любой меткой, а не только с метками прогрева.
+        """
+        for kind in dict.fromkeys(self._label_to_kind.values()):
+            self.pool(kind)
+
+    def pool(self, kind: str) -> list[str]:
+        """
+        Пул значений вида. Пул только дополняется, поэтому первые pool_size значений
+        (по которым выбирается основная подстановка) неизменны.
+        """
+        pool = self._pools.get(kind)
+        if pool is not None:
+            return pool
+        with self._lock:
+            if kind not in self._pools:
+                logger.info("Generating fake value pool %r (%d values)", kind, self.pool_size)
+                self._pools[kind] = self._generate(kind, [], self.pool_size)
+            return self._pools[kind]
+
+    def grow_in_background(self, kind: str) -> None:
+        """Удваивает пул в фоновом потоке; запросы продолжают работать с текущим пулом."""
+        with self._lock:
+            if kind in self._growing:
+                return
+            self._growing.add(kind)
+
+        def grow() -> None:
+            try:
+                current = self.pool(kind)
+                grown = self._generate(kind, current, len(current) * 2)
+                with self._lock:
+                    # Новый список подменяется целиком — читатели без блокировки видят либо старый, либо новый
+                    self._pools[kind] = grown
+            except Exception:
+                logger.exception("Failed to grow fake value pool %r", kind)
+            finally:
+                with self._lock:
+                    self._growing.discard(kind)
+
+        threading.Thread(target=grow, name=f"fake-pool-{kind}", daemon=True).start()
+
+    def _generate(self, kind: str, existing: list[str], size: int) -> list[str]:
+        faker = self._generators.get(kind)
+        if faker is None:
+            from faker import Faker
+
+            faker = Faker(self.locale)
+            faker.seed_instance(f"{self.seed}:{kind}")
+            self._generators[kind] = faker
+        method = getattr(faker, kind)
+
+        values = list(existing)
+        seen = set(values)
+        attempts = 0
+        while len(values) < size and attempts < size * 3:
+            attempts += 1
+            value = str(method()).replace("\n", ", ")
+            if value not in seen:
+                seen.add(value)
+                values.append(value)
+        return values
+
+
+class FakeValueMap(PlaceholderMap):
+    """
+    Назначает сущностям фейковые значения из пулов с тем же интерфейсом, что и PlaceholderMap.
+
+    Основное значение определяется хэшем (label, исходный текст). Если оно уже занято другой сущностью
+    документа или совпадает с исходным текстом, берётся следующее значение пула — так подстановки
+    в пределах документа остаются взаимно однозначными и обратимыми. Для меток без генератора
+    и при исчерпании пула используются обычные плейсхолдеры [LABEL_n].
+    """
+
+    def __init__(self, pools: FakeValuePools) -> None:
+        super().__init__()
+        self.pools = pools
+        self._used: set[str] = set()
+        self._used_by_kind: dict[str, int] = {}
+
+    def get(self, label: str, original_text: str) -> tuple[str, bool]:
+        key = (label, original_text)
+        replacement = self._placeholders.get(key)
+        if replacement is not None:
+            return replacement, False
+
+        kind = self.pools.kind(label)
+        replacement = self._pick(kind, label, original_text) if kind is not None else None
+        if replacement is None:
+            return super().get(label, original_text)
+        self._placeholders[key] = replacement
+        self._used.add(replacement)
+        return replacement, True
+
+    def _remember(self, label: str, original_text: str, placeholder: str) -> None:
+        super()._remember(label, original_text, placeholder)
+        self._used.add(placeholder)
+        kind = self.pools.kind(label)
+        if kind is not None:
+            self._used_by_kind[kind] = self._used_by_kind.get(kind, 0) + 1
+
+    def _pick(self, kind: str, label: str, original_text: str) -> str | None:
+        pool = self.pools.pool(kind)
+        if not pool:
+            return None
+        used = self._used_by_kind.get(kind, 0) + 1
+        self._used_by_kind[kind] = used
+        if used > len(pool) * _GROW_LOAD_FACTOR:
+            self.pools.grow_in_background(kind)
+
+        digest = blake2b(f"{label}\0{original_text}".encode(), digest_size=8).digest()
+        start = int.from_bytes(digest) % min(len(pool), self.pools.pool_size)
+        for offset in range(len(pool)):
+            candidate = pool[(start + offset) % len(pool)]
+            if candidate not in self._used and candidate != original_text:
+                return candidate
+        return None
@@ -0,0 +1,341 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from src.core.admission import (
+    AdmissionRejectedError,
+    DeadlineExceededError,
+    Priority,
+    QueueFullError,
+    RequestBudget,
+    current_budget,
+)
+from src.core.metrics import (
+    BATCH_SIZE,
+    INFERENCE_ERRORS,
+    MODEL_FORWARD_SECONDS,
+    QUEUE_DEPTH,
+    QUEUE_EXPIRED,
+    QUEUE_WAIT_SECONDS,
+)
+from src.core.services.anonymizer.gliner.executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+PredictBatch = Callable[[list[str], list[str], float], list[list[dict]]]
+# То же с длиной каждого текста в токенах, если она известна из нарезки (None — не известна)
+CountedPredictBatch = Callable[[list[str], list[str], float, list[int | None]], list[list[dict]]]
+
+# Начальная оценка времени модели на один чанк — до первых замеров
+_INITIAL_SECONDS_PER_CHUNK = 0.05
+_EWMA_ALPHA = 0.2
+
+
+class ModelUnloadedError(AdmissionRejectedError):
+    """Модель выгружена из реестра, пока запрос её получал; повторный запрос загрузит её заново."""
+
+    status_code = 503
+    reason = "model_unloaded"
+
+
+@dataclass
+class _InferenceItem:
+    text: str
+    labels: tuple[str, ...]
+    threshold: float
+    future: asyncio.Future = field(repr=False)
+    priority: Priority = Priority.NORMAL
+    deadline: float | None = None
+    tokens: int | None = None
+    enqueued_at: float = field(default_factory=perf_counter)
+
+    @property
+    def group_key(self) -> tuple[tuple[str, ...], float]:
+        return self.labels, self.threshold
+
+
+class InferenceBatcher:
+    """
+    Планировщик инференса с динамическим микро-батчингом.
+
+    Собирает чанки всех запросов, находящихся в обработке, в одну очередь и отправляет их в модель
+    батчами. Батч закрывается, когда набрано `max_batch_size` чанков или истекло `max_wait` секунд
+    с момента прихода первого чанка. Внутри батча чанки группируются по (labels, threshold),
+    так как модель принимает один набор меток на вызов.
+
+    Батчи выполняются в полосах InferenceExecutor: одновременно выполняется не больше батчей,
+    чем полос (это заменяет прежний глобальный семафор).
+
+    Очередь ограничена: запрос допускается, только если все его чанки помещаются в `max_queue_depth`
+    (с учётом доли своего класса приоритета) или очередь пуста, и по оценке успевают к дедлайну запроса. Чанки более
+    высокого приоритета забираются из очереди первыми; чанки с истёкшим дедлайном и чанки
+    отменённых запросов (клиент отключился) в модель не попадают.
+    """
+
+    def __init__(
+        self,
+        predict_batch: CountedPredictBatch,
+        max_batch_size: int = 8,
+        max_wait: float = 0.01,
+        max_queue_depth: int = 0,
+        priority_shares: dict[Priority, float] | None = None,
+        executor: InferenceExecutor | None = None,
+    ):
+        """
+        :param predict_batch: Синхронная функция (texts, labels, threshold, tokens) → сущности для каждого текста.
+        :param max_batch_size: Максимальное количество чанков в одном вызове модели.
+        :param max_wait: Максимальное время ожидания добора батча (в секундах).
+        :param max_queue_depth: Максимальное количество ожидающих чанков; 0 — без ограничения.
+        :param priority_shares: Доля max_queue_depth, доступная каждому классу приоритета.
+        :param executor: Полосы для вызовов модели; по умолчанию — одна полоса.
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue_depth = max_queue_depth
+        self.priority_shares = priority_shares or {}
+        self.executor = executor or InferenceExecutor()
+        self.seconds_per_chunk = _INITIAL_SECONDS_PER_CHUNK
+        self._pending = 0
+        self._closed = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._sequence = itertools.count()
+        self._queue: asyncio.PriorityQueue[tuple[int, int, _InferenceItem]] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def predict(self, text: str, labels: list[str], threshold: float) -> list[dict]:
+        """Ставит один чанк в очередь и ждёт его результат."""
+        (entities,) = await self.predict_many([text], labels, threshold)
+        return entities
+
+    async def predict_many(
+        self, texts: list[str], labels: list[str], threshold: float, tokens: list[int] | None = None
+    ) -> list[list[dict]]:
+        """
+        Ставит в очередь все чанки документа разом, результаты возвращаются в исходном порядке.
+
+        :param tokens: Длина каждого чанка в токенах из нарезки — упаковке не нужно токенизировать чанки заново.
+
+        :raises QueueFullError: Чанки не помещаются в очередь.
+        :raises DeadlineExceededError: Дедлайн запроса истёк или по оценке не будет выдержан.
+        :raises ModelUnloadedError: Батчер остановлен выгрузкой модели.
+        """
+        budget = current_budget()
+        self._admit(len(texts), budget)
+        self._ensure_worker()
+        counts = tokens if tokens is not None else [None] * len(texts)
+        futures = [self._submit(text, labels, threshold, budget, count) for text, count in zip(texts, counts)]
+        try:
+            return list(await asyncio.gather(*futures))
+        except BaseException:
+            # Ошибка одного чанка или отмена запроса — остальные чанки документа модели больше не нужны
+            for future in futures:
+                future.cancel()
+            raise
+
+    def estimated_wait(self, chunks: int = 0) -> float:
+        """Оценка времени, за которое модель разберёт текущую очередь и ещё `chunks` чанков."""
+        return (self._pending + chunks) * self.seconds_per_chunk / self.executor.lanes
+
+    def _admit(self, chunks: int, budget: RequestBudget) -> None:
+        if self.max_queue_depth:
+            limit = int(self.max_queue_depth * self.priority_shares.get(budget.priority, 1.0))
+            # В пустую очередь допускается запрос любого размера, иначе документ больше лимита не пройдёт никогда
+            if self._pending and self._pending + chunks > limit:
+                raise QueueFullError(
+                    f"Inference queue is full ({self._pending} chunks pending)", retry_after=self.estimated_wait()
+                )
+        if budget.deadline is not None:
+            remaining = budget.deadline - perf_counter()
+            if remaining <= 0 or self.estimated_wait(chunks) > remaining:
+                raise DeadlineExceededError(
+                    f"Request cannot be completed within its deadline ({self._pending} chunks pending)",
+                    retry_after=self.estimated_wait(),
+                )
+
+    def _submit(
+        self, text: str, labels: list[str], threshold: float, budget: RequestBudget, tokens: int | None = None
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        item = _InferenceItem(text, tuple(labels), threshold, future, budget.priority, budget.deadline, tokens)
+        self._queue.put_nowait((budget.priority, next(self._sequence), item))
+        self._pending += 1
+        self._idle.clear()
+        future.add_done_callback(self._on_done)
+        QUEUE_DEPTH.inc()
+        return future
+
+    def _on_done(self, future: asyncio.Future) -> None:
+        self._pending -= 1
+        if not self._pending:
+            self._idle.set()
+
+    async def close(self) -> None:
+        """Останавливает воркер. Чанки, оставшиеся в очереди, получают CancelledError."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, _, item = self._queue.get_nowait()
+            QUEUE_DEPTH.dec()
+            if not item.future.done():
+                item.future.cancel()
+        self._worker = None
+        self._queue = None
+
+    def close_threadsafe(self, on_closed: Callable[[], None] | None = None) -> None:
+        """
+        Останавливает воркер из любого потока (выгрузка модели из реестра), когда все принятые чанки обработаны:
+        запросы, уже поставившие чанки в очередь, дорабатывают. `on_closed` вызывается после остановки.
+        После этого батчер больше не запускается: запросы к выгруженной модели получают ModelUnloadedError.
+        """
+        self._closed = True
+        worker = self._worker
+        if worker is None or worker.done():
+            if on_closed is not None:
+                on_closed()
+            return
+
+        async def drain() -> None:
+            await self._idle.wait()
+            await self.close()
+            if on_closed is not None:
+                on_closed()
+
+        asyncio.run_coroutine_threadsafe(drain(), worker.get_loop())
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            if self._closed:
+                # Иначе полосы выгруженной модели создались бы заново и больше никогда не освободились
+                raise ModelUnloadedError("Model was unloaded, retry the request", retry_after=0)
+            # Очередь сохраняется: чанки, поставленные до падения воркера, достанутся новому
+            if self._queue is None:
+                self._queue = asyncio.PriorityQueue()
+            # Пустой контекст: воркер не должен писать замеры стадий в запрос, который его случайно запустил
+            self._worker = asyncio.create_task(
+                self._run(), name="gliner-inference-batcher", context=contextvars.Context()
+            )
+
+    async def _get(self) -> _InferenceItem:
+        _, _, item = await self._queue.get()
+        QUEUE_DEPTH.dec()
+        return item
+
+    async def _collect_batch(self) -> list[_InferenceItem]:
+        batch = [await self._get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._get(), timeout))
+            except TimeoutError:
+                break
+
+        now = perf_counter()
+        alive = []
+        # Одна ошибка на запрос (у чанков запроса общий дедлайн): получив её, predict_many отменяет остальные чанки
+        expired: dict[float, DeadlineExceededError] = {}
+        for item in batch:
+            # Вызывающая сторона могла отменить ожидание (например, клиент отключился) — такие чанки пропускаем
+            if item.future.done():
+                continue
+            if item.deadline is not None and item.deadline <= now:
+                exc = expired.get(item.deadline)
+                if exc is None:
+                    # Запрос уже был допущен — это не отказ допуска, а истечение дедлайна в очереди
+                    exc = DeadlineExceededError("Request deadline expired in the inference queue", 0, count=False)
+                    expired[item.deadline] = exc
+                    QUEUE_EXPIRED.inc()
+                item.future.set_exception(exc)
+                continue
+            alive.append(item)
+        return alive
+
+    async def _run(self) -> None:
+        running: set[asyncio.Task] = set()
+        try:
+            while True:
+                # Полоса занимается до сбора батча: пока все полосы заняты, чанки копятся в очереди
+                executor = self.executor
+                lane = await executor.acquire()
+                try:
+                    batch = await self._collect_batch()
+                except BaseException:
+                    executor.release(lane)
+                    raise
+
+                groups: dict[tuple[tuple[str, ...], float], list[_InferenceItem]] = {}
+                for item in batch:
+                    groups.setdefault(item.group_key, []).append(item)
+                if not groups:
+                    executor.release(lane)
+                    continue
+
+                for i, ((labels, threshold), items) in enumerate(groups.items()):
+                    if i:
+                        lane = await executor.acquire()
+                    task = asyncio.create_task(self._execute(executor, lane, labels, threshold, items))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _execute(
+        self,
+        executor: InferenceExecutor,
+        lane: int,
+        labels: tuple[str, ...],
+        threshold: float,
+        items: list[_InferenceItem],
+    ) -> None:
+        started = perf_counter()
+        for item in items:
+            QUEUE_WAIT_SECONDS.observe(started - item.enqueued_at)
+        BATCH_SIZE.observe(len(items))
+        try:
+            results = await executor.run_on(
+                lane,
+                self.predict_batch,
+                [item.text for item in items],
+                list(labels),
+                threshold,
+                [item.tokens for item in items],
+            )
+        except asyncio.CancelledError:
+            # Воркер остановлен — ожидающие запросы не должны зависнуть
+            for item in items:
+                item.future.cancel()
+            raise
+        except Exception as exc:
+            INFERENCE_ERRORS.inc()
+            logger.exception("Batched inference failed for %d chunks", len(items))
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        finally:
+            executor.release(lane)
+            elapsed = perf_counter() - started
+            MODEL_FORWARD_SECONDS.observe(elapsed)
+            self.seconds_per_chunk += _EWMA_ALPHA * (elapsed / len(items) - self.seconds_per_chunk)
+
+        for item, entities in zip(items, results):
+            if not item.future.done():
+                item.future.set_result(entities)
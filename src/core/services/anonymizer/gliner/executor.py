@@ -0,0 +1,163 @@
+"""
+Выделенный исполнитель инференса с учётом топологии CPU.
+
+Вместо общего пула asyncio.to_thread модель вызывается в «полосах» (lanes): каждая полоса — отдельный поток
+со своим числом потоков torch и, при необходимости, привязкой к набору физических ядер. Полосы делят одни
+и те же веса модели, поэтому несколько батчей выполняются параллельно без перерасхода памяти,
+а суммарное число потоков не превышает число ядер.
+"""
+
+import asyncio
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_CPU_TOPOLOGY = Path("/sys/devices/system/cpu")
+
+
+def physical_cpus() -> list[int]:
+    """
+    Доступные процессу логические CPU, по одному на физическое ядро, упорядоченные по сокету и ядру.
+
+    Гиперпотоки одного ядра конкурируют за одни и те же вычислительные блоки, поэтому для матричных
+    операций torch полезнее занимать только один из них.
+    """
+    available = (
+        sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    )
+    cores: dict[tuple[int, int], int] = {}
+    for cpu in available:
+        topology = _CPU_TOPOLOGY / f"cpu{cpu}" / "topology"
+        try:
+            key = (int((topology / "physical_package_id").read_text()), int((topology / "core_id").read_text()))
+        except (OSError, ValueError):
+            key = (0, cpu)
+        cores.setdefault(key, cpu)
+    return [cores[key] for key in sorted(cores)]
+
+
+class InferenceExecutor:
+    """
+    Набор полос для вызовов модели. Каждая полоса выполняет не больше одного батча одновременно.
+
+    Потоки полос создаются лениво в каждом процессе: после fork (pre-fork режим) потоки родителя
+    недоступны, а бюджет потоков воркера известен только в нём самом.
+    """
+
+    def __init__(self, lanes: int = 1, threads_per_lane: int = 0, interop_threads: int = 0, pin_cpus: bool = False):
+        """
+        :param lanes: Количество полос (одновременно выполняемых батчей).
+        :param threads_per_lane: Потоков torch на полосу; 0 — текущий бюджет потоков процесса поровну между полосами.
+        :param interop_threads: Потоков межоперационного пула torch (общий на процесс); 0 — не менять.
+        :param pin_cpus: Привязать каждую полосу к своему набору физических ядер.
+        """
+        self.lanes = max(1, lanes)
+        self.requested_threads = threads_per_lane
+        self.interop_threads = interop_threads
+        self.pin_cpus = pin_cpus
+        self.threads_per_lane = threads_per_lane
+        self.lane_cpus: list[list[int] | None] = [None] * self.lanes
+        self._pid: int | None = None
+        self._pools: list[ThreadPoolExecutor] = []
+        self._free: asyncio.Queue[int] | None = None
+
+    def __repr__(self) -> str:
+        return f"InferenceExecutor(lanes={self.lanes}, threads_per_lane={self.threads_per_lane}, pin={self.pin_cpus})"
+
+    def _ensure_pools(self) -> list[ThreadPoolExecutor]:
+        if self._pid == os.getpid():
+            return self._pools
+        cpus = physical_cpus()
+        self.threads_per_lane = self.requested_threads or max(1, self._thread_budget(cpus) // self.lanes)
+        self.lane_cpus = [
+            (cpus[i * self.threads_per_lane : (i + 1) * self.threads_per_lane] or None) if self.pin_cpus else None
+            for i in range(self.lanes)
+        ]
+        self._set_interop_threads()
+        self._pools = [
+            ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"inference-lane-{i}", initializer=self._init_lane, initargs=(i,)
+            )
+            for i in range(self.lanes)
+        ]
+        self._free = None
+        self._pid = os.getpid()
+        return self._pools
+
+    @staticmethod
+    def _thread_budget(cpus: list[int]) -> int:
+        try:
+            import torch
+        except ImportError:
+            return len(cpus)
+        # Учитывает torch.set_num_threads, сделанный pre-fork воркером для своей доли ядер
+        return min(torch.get_num_threads(), len(cpus))
+
+    def _set_interop_threads(self) -> None:
+        if not self.interop_threads:
+            return
+        try:
+            import torch
+
+            torch.set_num_interop_threads(self.interop_threads)
+        except ImportError:
+            pass
+        except RuntimeError:
+            # Межоперационный пул уже запущен — настройка возможна только до первого вызова модели
+            logger.debug("torch interop threads are already initialized")
+
+    def _init_lane(self, lane: int) -> None:
+        cpus = self.lane_cpus[lane]
+        if cpus and hasattr(os, "sched_setaffinity"):
+            # В Linux pid 0 — текущий поток; потоки OpenMP, созданные из него, наследуют привязку
+            os.sched_setaffinity(0, cpus)
+        try:
+            import torch
+
+            torch.set_num_threads(self.threads_per_lane)
+        except ImportError:
+            pass
+        logger.info("Inference lane %d: %d threads, cpus %s", lane, self.threads_per_lane, cpus or "any")
+
+    def _ensure_free(self) -> asyncio.Queue[int]:
+        self._ensure_pools()
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for lane in range(self.lanes):
+                self._free.put_nowait(lane)
+        return self._free
+
+    async def acquire(self) -> int:
+        """Ждёт свободную полосу и занимает её."""
+        return await self._ensure_free().get()
+
+    def release(self, lane: int) -> None:
+        self._ensure_free().put_nowait(lane)
+
+    async def run_on(self, lane: int, fn: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет fn в занятой ранее полосе."""
+        return await asyncio.get_running_loop().run_in_executor(self._ensure_pools()[lane], fn, *args)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет fn в первой освободившейся полосе."""
+        lane = await self.acquire()
+        try:
+            return await self.run_on(lane, fn, *args)
+        finally:
+            self.release(lane)
+
+    async def run_all(self, fn: Callable[..., Any], *args: Any) -> list[Any]:
+        """Выполняет fn по разу в каждой полосе одновременно (прогрев, замеры)."""
+        return list(await asyncio.gather(*(self.run(fn, *args) for _ in range(self.lanes))))
+
+    def shutdown(self) -> None:
+        if self._pid == os.getpid():
+            for pool in self._pools:
+                pool.shutdown(wait=False)
+        self._pools = []
+        self._pid = None
@@ -1,133 +1,745 @@
 import asyncio
-import pymorphy3
-from functools import lru_cache
+import logging
+from bisect import bisect_right
+from collections.abc import AsyncIterator
+from itertools import cycle, islice
+from time import perf_counter
+from typing import TYPE_CHECKING
 
-from gliner import GLiNER
+from ..gliner.batcher import InferenceBatcher
+from ..gliner.executor import InferenceExecutor, physical_cpus
 from ..gliner.gliner_text_chunker import GlinerTextChunker
-from src.core.services.anonymizer.schemas import AnonymizationResult
+from ..gliner.label_embeddings import LabelEmbeddingCache
+from ..gliner.label_groups import LabelGroupPlanner, LabelPlan, SequenceCost
+from ..gliner.packing import SequencePacker
+from src.core.admission import AdmissionRejectedError, Priority, QueueFullError
+from src.core.metrics import (
+    CHUNKING_SECONDS,
+    CHUNKS_PER_REQUEST,
+    INFERENCE_SECONDS,
+    LABEL_GROUPS_PER_REQUEST,
+    LEMMA_FILTER_SECONDS,
+    RECONSTRUCTION_SECONDS,
+    StageClock,
+    register_cache,
+    stage,
+)
+from src.core.services.anonymizer.cache import create_chunk_cache
+from src.core.services.anonymizer.fakes import FakeValueMap, get_fake_pools
+from src.core.services.anonymizer.lemmas import LemmaMatcher, get_lemmatizer
+from src.core.services.anonymizer.placeholders import PlaceholderMap
+from src.core.services.anonymizer.postprocessing import (
+    merge_chunk_spans,
+    render,
+    resolve_spans,
+    to_document_offsets,
+)
+from src.core.services.anonymizer.rules import RuleDetector
+from src.core.services.anonymizer.schemas import AnonymizationResult, AnonymizationSegment
+from src.core.services.anonymizer.sessions import IncrementalSession, commit_boundary
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from gliner import GLiNER
+
+logger = logging.getLogger(__name__)
 
 CACHE_DIR = "./models"
 DEFAULT_MODEL = "knowledgator/gliner-pii-large-v1.0"
-SEMAPHORE = asyncio.Semaphore(1)
-CHUNK_SIZE = 740
-_morph = pymorphy3.MorphAnalyzer(lang="ru")
+# Лимит последовательности модели: промпт меток, текст чанка и специальные токены
+MAX_SEQUENCE_TOKENS = 768
+_AUTOTUNE_ROUNDS = 3
+_WARMUP_WORDS = [
+    "Арендатор",
+    "Иван",
+    "Петров",
+    ",",
+    "проживающий",
+    "по",
+    "адресу",
+    "г.",
+    "Москва",
+    ",",
+    "ул.",
+    "Ленина",
+    ",",
+    "д.",
+    "5",
+    ",",
+    "тел.",
+    "+7",
+    "999",
+    "123-45-67",
+    ".",
+]
 
 
-@lru_cache
 def get_gliner(model: str = DEFAULT_MODEL) -> "GlinerAnonymizer":
     return GlinerAnonymizer(model)
 
 
-@lru_cache(maxsize=10000)
-def _get_lemma_cached(word: str) -> str:
-    """Кэшированная лемматизация для производительности."""
-    parsed = _morph.parse(word)
-    if parsed:
-        return parsed[0].normal_form.lower()
-    return word.lower()
-
-
 class GlinerAnonymizer:
     def __init__(self, model: str = DEFAULT_MODEL) -> None:
-        self.model = GLiNER.from_pretrained(model, cache_dir=CACHE_DIR)
-        self.chunker = GlinerTextChunker(self.model.data_processor, max_tokens=CHUNK_SIZE)
+        self.model = self._load_model(model)
+        self.chunker = GlinerTextChunker(self.model.data_processor, max_tokens=MAX_SEQUENCE_TOKENS)
+        special_tokens = self.model.data_processor.transformer_tokenizer.num_special_tokens_to_add()
+        self.packer: SequencePacker | None = None
+        if settings.INFERENCE_PACKING:
+            self.packer = SequencePacker(
+                self.chunker._count_tokens,
+                self.chunker.prompt_tokens,
+                special_tokens=special_tokens,
+                max_tokens=MAX_SEQUENCE_TOKENS,
+                buckets=settings.INFERENCE_LENGTH_BUCKETS,
+            )
+        self.sequence_cost = SequenceCost()
+        self.label_planner = LabelGroupPlanner(
+            self.chunker.prompt_tokens,
+            max_tokens=MAX_SEQUENCE_TOKENS,
+            special_tokens=special_tokens,
+            cost=self.sequence_cost,
+            max_groups=settings.LABEL_GROUPS_MAX,
+            min_text_tokens=settings.LABEL_MIN_CHUNK_TOKENS,
+        )
+        self.batcher = InferenceBatcher(
+            self._predict_batch,
+            max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+            max_wait=settings.INFERENCE_MAX_WAIT_MS / 1000,
+            max_queue_depth=settings.ADMISSION_MAX_QUEUE_DEPTH,
+            priority_shares={Priority.parse(name): share for name, share in settings.ADMISSION_PRIORITY_SHARES.items()},
+            executor=self._create_executor(settings.INFERENCE_LANES, settings.INFERENCE_THREADS_PER_LANE),
+        )
+        self.cache = create_chunk_cache(self.model_id(model))
+        if self.cache is not None:
+            stats = self.cache.stats
+            register_cache(f"chunk:{self.model_id(model)}", lambda: (stats.hits, stats.misses))
+        self.label_embeddings: LabelEmbeddingCache | None = None
+        if LabelEmbeddingCache.supports(self.model):
+            label_embeddings = LabelEmbeddingCache(self.model, maxsize=settings.LABEL_EMBEDDING_CACHE_SIZE)
+            self.label_embeddings = label_embeddings
+            register_cache(f"labels:{self.model_id(model)}", lambda: (label_embeddings.hits, label_embeddings.misses))
+        self.rules = RuleDetector(settings.RULE_LABEL_ALIASES) if settings.RULE_DETECTORS else None
+
+    def _load_model(self, model: str) -> "GLiNER":
+        from gliner import GLiNER
+
+        return GLiNER.from_pretrained(model, cache_dir=CACHE_DIR)
+
+    def model_id(self, model: str) -> str:
+        """Идентификатор модели вместе с бэкендом — разные бэкенды не должны делить кэш результатов."""
+        return model
+
+    def _predict_batch(
+        self, texts: list[str], labels: list[str], threshold: float, tokens: list[int | None] | None = None
+    ) -> list[list[dict]]:
+        """
+        Батч чанков с общим набором меток: с упаковкой коротких чанков, если она включена.
+
+        tokens — длины чанков из нарезки, чтобы упаковка не токенизировала их заново.
+        """
+        if self.packer is not None and len(texts) > 1:
+            return self.packer.predict(texts, labels, threshold, self._forward, tokens)
+        return self._forward(texts, labels, threshold)
+
+    def _forward(self, texts: list[str], labels: list[str], threshold: float) -> list[list[dict]]:
+        """Один прямой проход модели по батчу последовательностей с общим набором меток."""
+        if self.label_embeddings is not None:
+            # Bi-encoder: метки уже закодированы, модель кодирует только текст
+            embeddings = self.label_embeddings.get(labels)
+            return self.model.batch_predict_with_embeds(
+                texts, embeddings, labels, threshold=threshold, batch_size=len(texts)
+            )
+        return self.model.batch_predict_entities(texts, labels, threshold=threshold, batch_size=len(texts))
+
+    async def warmup(self, labels: list[str], token_lengths: list[int]) -> None:
+        """
+        Прогревочные проходы модели на текстах разной длины, чтобы первый пользовательский запрос
+        не платил за холодный старт. Кэш результатов и очередь батчера не задействуются.
+        """
+        await asyncio.to_thread(get_lemmatizer().lemmatize, "прогрев")
+        await asyncio.to_thread(self._prefill_fake_pools)
+        if self.label_embeddings is not None:
+            await asyncio.to_thread(self.label_embeddings.prewarm, [labels, *settings.LABEL_EMBEDDING_PREWARM])
+        texts = await asyncio.to_thread(self._warmup_texts, token_lengths, self.chunker.text_budget([labels]))
+        executor = self.batcher.executor
+        # Каждая полоса прогревается отдельно: настройки потоков применяются при первом вызове в полосе
+        for text in texts:
+            await executor.run_all(self._predict_batch, [text], labels, 0.5)
+        # Отдельно — батч из текстов разной длины, как в рабочем режиме
+        await executor.run_all(self._predict_batch, texts, labels, 0.5)
+        if settings.INFERENCE_AUTOTUNE:
+            await self._autotune(texts, labels)
+        if settings.LABEL_GROUPS_MAX > 1 and self.chunker.prompt_in_sequence:
+            await self._measure_sequence_cost(texts, labels)
+
+    def _warmup_texts(self, token_lengths: list[int], budget: int) -> list[str]:
+        """
+        Прогревочные тексты заданной длины в токенах (со специальными), не длиннее бюджета чанка:
+        иначе модель обрежет последовательность и длинные варианты не прогреются.
+        """
+        lengths = [min(length, budget) for length in token_lengths]
+        # Каждое слово — хотя бы один токен, поэтому слов не меньше нужного числа токенов
+        text = " ".join(islice(cycle(_WARMUP_WORDS), max(lengths, default=0)))
+        index = self.chunker._build_index(text)
+        texts = []
+        for length in lengths:
+            # Хотя бы одно слово: пустой текст модель не прогревает
+            words = max(1, bisect_right(index.prefix, length - index.special_tokens) - 1)
+            texts.append(text[: index.word_ends[words - 1]])
+        return texts
+
+    async def _measure_sequence_cost(self, texts: list[str], labels: list[str]) -> None:
+        """
+        Время прохода по последовательностям разной длины — для выбора числа групп меток.
+
+        Полосы к этому моменту прогреты, поэтому замеряется установившееся время, а не холодный старт.
+        Длина записывается не больше лимита последовательности: более длинный вход модель обрезает,
+        и время прохода соответствует лимиту, а не полной длине.
+        """
+        prompt_tokens = self.chunker.prompt_tokens(labels)
+        for text in texts:
+            tokens = min(self.chunker._count_tokens(text) + prompt_tokens, self.chunker.max_tokens)
+            started = perf_counter()
+            await self.batcher.executor.run_all(self._predict_batch, [text], labels, 0.5)
+            self.sequence_cost.observe(tokens, perf_counter() - started)
+        logger.info("Sequence cost measured for %d lengths", len(texts))
+
+    @staticmethod
+    def _create_executor(lanes: int, threads_per_lane: int = 0) -> InferenceExecutor:
+        return InferenceExecutor(
+            lanes=lanes,
+            threads_per_lane=threads_per_lane,
+            interop_threads=settings.INFERENCE_INTEROP_THREADS,
+            pin_cpus=settings.INFERENCE_PIN_CPUS,
+        )
+
+    async def _autotune(self, texts: list[str], labels: list[str]) -> None:
+        """
+        Подбирает число полос по пропускной способности, измеренной на прогревочных текстах.
+
+        Для каждого варианта из INFERENCE_AUTOTUNE_LANES потоки делятся между полосами поровну;
+        побеждает вариант с наибольшим числом чанков в секунду.
+        """
+        batch = list(islice(cycle(texts), self.batcher.max_batch_size))
+        cores = len(physical_cpus())
+        measured: list[tuple[float, InferenceExecutor]] = []
+        for lanes in sorted(set(settings.INFERENCE_AUTOTUNE_LANES)):
+            if lanes > cores:
+                continue
+            executor = self._create_executor(lanes)
+            await executor.run_all(self._predict_batch, batch, labels, 0.5)
+            started = perf_counter()
+            for _ in range(_AUTOTUNE_ROUNDS):
+                await executor.run_all(self._predict_batch, batch, labels, 0.5)
+            throughput = _AUTOTUNE_ROUNDS * lanes * len(batch) / (perf_counter() - started)
+            logger.info("Autotune: %r — %.1f chunks/s", executor, throughput)
+            measured.append((throughput, executor))
+        if not measured:
+            return
+
+        _, best = max(measured, key=lambda pair: pair[0])
+        for _, executor in measured:
+            if executor is not best:
+                executor.shutdown()
+        previous, self.batcher.executor = self.batcher.executor, best
+        previous.shutdown()
+        logger.info("Autotune selected %r", best)
+
+    @staticmethod
+    def _prefill_fake_pools() -> None:
+        try:
+            get_fake_pools().prefill()
+        except ImportError:
+            # faker не установлен — режим use_fake недоступен, но сервис работает
+            logger.warning("Faker is not installed, fake value pools are not prefilled")
+
+    def _model_labels(self, labels: list[str]) -> list[str]:
+        """Метки, которые ищет модель: метки правил с контрольной суммой в промпт не попадают."""
+        return self.rules.split_labels(labels)[1] if self.rules is not None else labels
+
+    def _chunk_documents(
+        self, texts: list[str], labels: list[str]
+    ) -> tuple[LabelPlan, list[list[tuple[str, int, int]] | Exception], list[list[int]]]:
+        """
+        Нарезает документы запроса на чанки под общий план меток.
+
+        Каждый документ токенизируется один раз: по длинам документов выбирается разбиение меток модели на группы,
+        а бюджет чанка — лимит последовательности за вычетом самого длинного промпта группы. Длины чанков в токенах
+        берутся из того же индекса и возвращаются третьим элементом (для документа с ошибкой — пустой список).
+        Ошибка нарезки документа возвращается на его месте.
+        """
+        indexes = []
+        for text in texts:
+            try:
+                indexes.append(self.chunker._build_index(text))
+            except Exception as exc:  # noqa: BLE001 — ошибка токенизатора относится к документу и вернётся на его месте
+                indexes.append(exc)
+        plan = self.label_planner.plan(
+            self._model_labels(labels), [index.total for index in indexes if not isinstance(index, Exception)]
+        )
+        LABEL_GROUPS_PER_REQUEST.observe(len(plan.groups))
+
+        chunked: list[list[tuple[str, int, int]] | Exception] = []
+        tokens: list[list[int]] = []
+        for text, index in zip(texts, indexes):
+            if isinstance(index, Exception):
+                chunked.append(index)
+                tokens.append([])
+                continue
+            try:
+                chunks = self.chunker._chunk(text, plan.budget, index)
+            except Exception as exc:  # noqa: BLE001 — ошибка нарезки относится к документу и вернётся на его месте
+                chunked.append(exc)
+                tokens.append([])
+                continue
+            chunked.append(chunks)
+            tokens.append([index.count(start, end) for _, start, end in chunks])
+        return plan, chunked, tokens
+
+    async def _chunk(
+        self, text: str, labels: list[str]
+    ) -> tuple[list[list[str]], list[tuple[str, int, int]], list[int]]:
+        """Группы меток модели, чанки одного документа и их длины в токенах."""
+        plan, (chunks,), (tokens,) = await asyncio.to_thread(self._chunk_documents, [text], labels)
+        if isinstance(chunks, Exception):
+            raise chunks
+        return plan.groups, chunks, tokens
+
+    async def _predict_chunks(
+        self, texts: list[str], labels: list[str], threshold: float, tokens: list[int] | None = None
+    ) -> list[list[dict]]:
+        """
+        Сущности для каждого чанка: из кэша, если есть, иначе через батчер.
+
+        Промахи кэша считаются при пороге floor_threshold, сохраняются и фильтруются по запрошенному порогу.
+        """
+        cache = self.cache
+        if cache is None:
+            return await self.batcher.predict_many(texts, labels, threshold, tokens)
+        if not cache.covers(threshold):
+            cache.stats.bypassed += len(texts)
+            return await self.batcher.predict_many(texts, labels, threshold, tokens)
+
+        def lookup() -> list[list[dict] | None]:
+            return [cache.get(chunk_text, labels, threshold) for chunk_text in texts]
+
+        def store(pairs: list[tuple[str, list[dict]]]) -> None:
+            for chunk_text, spans in pairs:
+                cache.set(chunk_text, labels, spans)
+
+        # Дисковое хранилище блокирует — уводим его в поток
+        results = await asyncio.to_thread(lookup) if cache.disk is not None else lookup()
+        missing = [i for i, spans in enumerate(results) if spans is None]
+        if not missing:
+            return results
+
+        raw = await self.batcher.predict_many(
+            [texts[i] for i in missing],
+            labels,
+            cache.floor_threshold,
+            [tokens[i] for i in missing] if tokens is not None else None,
+        )
+        pairs = [(texts[i], spans) for i, spans in zip(missing, raw)]
+        if cache.disk is not None:
+            await asyncio.to_thread(store, pairs)
+        else:
+            store(pairs)
+
+        for i, spans in zip(missing, raw):
+            results[i] = [span for span in spans if span.get("score", 0.0) >= threshold]
+        return results
+
+    async def _predict_groups(
+        self, texts: list[str], label_groups: list[list[str]], threshold: float, tokens: list[int] | None = None
+    ) -> list[list[dict]]:
+        """
+        Сущности для каждого чанка по всем группам меток: каждая группа — отдельный прогон по тем же чанкам.
+
+        Одна и та же сущность, найденная разными группами, и пересечения между группами разрешаются общей
+        дедупликацией при сборке текста.
+        """
+        if len(label_groups) == 1:
+            return await self._predict_chunks(texts, label_groups[0], threshold, tokens)
+        per_group = await asyncio.gather(
+            *(self._predict_chunks(texts, group, threshold, tokens) for group in label_groups)
+        )
+        return [[ent for group_results in chunk_results for ent in group_results] for chunk_results in zip(*per_group)]
+
+    async def _detect_chunks(
+        self,
+        texts: list[str],
+        labels: list[str],
+        threshold: float,
+        label_groups: list[list[str]] | None = None,
+        tokens: list[int] | None = None,
+    ) -> list[list[dict]]:
+        """
+        Сущности для каждого чанка: метки, покрытые правилами, ищутся регулярными выражениями, метки без
+        исчерпывающего правила — ещё и моделью. Если модели не осталось меток, она не вызывается вовсе.
+
+        label_groups — разбиение меток модели на группы из плана нарезки; по умолчанию все метки модели в одной группе.
+        tokens — длины чанков в токенах из нарезки.
+        """
+        rule_labels, model_labels = self.rules.split_labels(labels) if self.rules is not None else ({}, labels)
+        label_groups = [group for group in (label_groups or [model_labels]) if group]
+        if not rule_labels:
+            if not label_groups:
+                return [[] for _ in texts]
+            return await self._predict_groups(texts, label_groups, threshold, tokens)
+
+        rules = self.rules
+
+        def detect_all() -> list[list[dict]]:
+            return [rules.detect(chunk_text, rule_labels) for chunk_text in texts]
+
+        if not label_groups:
+            return await asyncio.to_thread(detect_all)
+        model_results, rule_results = await asyncio.gather(
+            self._predict_groups(texts, label_groups, threshold, tokens), asyncio.to_thread(detect_all)
+        )
+        # Пересечения с предсказаниями модели разрешаются общей дедупликацией
+        return [predicted + detected for predicted, detected in zip(model_results, rule_results)]
 
     async def anonymize(
-        self, text: str, labels: list[str], threshold: float, exclude_lemmas: set[str] | None = None
+        self,
+        text: str,
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
     ) -> AnonymizationResult:
         """
         Анонимизирует текст с возможностью исключения слов по леммам.
 
         Exclude_lemmas: множество лемм (в нижнем регистре), которые НЕ должны анонимизироваться.
                                Пример: {"сторона", "договор"}
+        Use_fake: подставлять реалистичные фейковые значения вместо плейсхолдеров [LABEL_n].
+        """
+        with stage("chunking", CHUNKING_SECONDS):
+            label_groups, chunks, tokens = await self._chunk(text, labels)
+        CHUNKS_PER_REQUEST.observe(len(chunks))
+
+        with stage("inference", INFERENCE_SECONDS):
+            results = await self._detect_chunks(
+                [chunk_text for chunk_text, _, _ in chunks], labels, threshold, label_groups, tokens
+            )
+        return self._assemble(text, chunks, results, exclude_lemmas, use_fake)
+
+    async def anonymize_many(
+        self,
+        texts: list[str],
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
+    ) -> list[AnonymizationResult | Exception]:
+        """
+        Анонимизирует набор документов с общими метками и порогом.
+
+        Чанки всех документов разом уходят в кэш и батчер, поэтому короткие документы попадают
+        в общие батчи модели. Ошибка обработки одного документа возвращается на его месте, не ломая остальные.
+        """
+
+        with stage("chunking", CHUNKING_SECONDS):
+            plan, chunked, tokens = await asyncio.to_thread(self._chunk_documents, texts, labels)
+        flat_texts = [chunk_text for chunks in chunked if isinstance(chunks, list) for chunk_text, _, _ in chunks]
+        flat_tokens = [count for counts in tokens for count in counts]
+        try:
+            with stage("inference", INFERENCE_SECONDS):
+                flat_results = await self._detect_chunks(flat_texts, labels, threshold, plan.groups, flat_tokens)
+        except AdmissionRejectedError:
+            # Перегрузка — отклоняется весь запрос, а не отдельные документы
+            raise
+        except Exception as exc:  # noqa: BLE001 — ошибка инференса возвращается на месте каждого документа
+            return [chunks if isinstance(chunks, Exception) else exc for chunks in chunked]
+
+        results: list[AnonymizationResult | Exception] = []
+        offset = 0
+        for text, chunks in zip(texts, chunked):
+            if isinstance(chunks, Exception):
+                results.append(chunks)
+                continue
+            doc_results = flat_results[offset : offset + len(chunks)]
+            offset += len(chunks)
+            CHUNKS_PER_REQUEST.observe(len(chunks))
+            try:
+                results.append(self._assemble(text, chunks, doc_results, exclude_lemmas, use_fake))
+            except Exception as exc:  # noqa: BLE001 — ошибка сборки документа не должна ломать остальные
+                results.append(exc)
+        return results
+
+    def _assemble(
+        self,
+        text: str,
+        chunks: list[tuple[str, int, int]],
+        results: list[list[dict]],
+        exclude_lemmas: set[str] | None,
+        use_fake: bool = False,
+    ) -> AnonymizationResult:
+        """Постобработка сущностей всех чанков и сборка анонимизированного текста с картой."""
+        lemma_clock = StageClock("lemma", LEMMA_FILTER_SECONDS)
+        reconstruction_clock = StageClock("reconstruction", RECONSTRUCTION_SECONDS)
+        placeholders = self._replacement_map(use_fake)
+        anonymized = self._render_chunks(
+            text, chunks, results, exclude_lemmas, placeholders, {}, lemma_clock, reconstruction_clock
+        )
+        with reconstruction_clock.measure():
+            result = AnonymizationResult(text=anonymized, map=placeholders.nested())
+        lemma_clock.publish()
+        reconstruction_clock.publish()
+        return result
+
+    def _render_chunks(
+        self,
+        text: str,
+        chunks: list[tuple[str, int, int]],
+        results: list[list[dict]],
+        exclude_lemmas: set[str] | None,
+        placeholders: PlaceholderMap,
+        new_entries: dict[str, dict[str, str]],
+        lemma_clock: StageClock,
+        reconstruction_clock: StageClock,
+    ) -> str:
+        """
+        Анонимизированный text по сущностям его чанков; плейсхолдеры берутся из общей для документа карты.
+
+        Разрешённые сущности всех чанков сливаются в один массив, и текст собирается одним проходом.
+        """
+        with reconstruction_clock.measure():
+            spans = [
+                to_document_offsets(text, chunk_start, entities)
+                for entities, (_, chunk_start, _) in zip(results, chunks)
+            ]
+        with lemma_clock.measure():
+            spans = self._filter_excluded(spans, exclude_lemmas)
+        with reconstruction_clock.measure():
+            # Хвост после последнего чанка (пробелы; весь текст, если чанков нет) попадает в тот же join
+            return render(text, 0, len(text), merge_chunk_spans(spans), placeholders, new_entries)
+
+    async def anonymize_stream(
+        self,
+        text: str,
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
+    ) -> AsyncIterator[AnonymizationSegment]:
+        """
+        Потоковая анонимизация: сегменты отдаются в порядке документа, как только готов очередной чанк.
+
+        Все чанки сразу ставятся в очередь инференса. Каждый сегмент содержит только новые записи карты,
+        объединение всех сегментов совпадает с результатом `anonymize`.
+        """
+        with stage("chunking", CHUNKING_SECONDS):
+            label_groups, chunks, tokens = await self._chunk(text, labels)
+        CHUNKS_PER_REQUEST.observe(len(chunks))
+        tasks = [
+            asyncio.create_task(self._detect_chunks([chunk_text], labels, threshold, label_groups, [count]))
+            for (chunk_text, _, _), count in zip(chunks, tokens)
+        ]
+
+        inference_clock = StageClock("inference", INFERENCE_SECONDS)
+        lemma_clock = StageClock("lemma", LEMMA_FILTER_SECONDS)
+        reconstruction_clock = StageClock("reconstruction", RECONSTRUCTION_SECONDS)
+        placeholders = self._replacement_map(use_fake)
+        cursor = 0
+        try:
+            for i, (task, (_, chunk_start, chunk_end)) in enumerate(zip(tasks, chunks)):
+                with inference_clock.measure():
+                    (entities,) = await task
+                segment_end = chunk_end if i + 1 < len(chunks) else len(text)
+                with reconstruction_clock.measure():
+                    entities = to_document_offsets(text, chunk_start, entities)
+                with lemma_clock.measure():
+                    (entities,) = self._filter_excluded([entities], exclude_lemmas)
+                with reconstruction_clock.measure():
+                    entities = resolve_spans(entities)
+                    new_entries: dict[str, dict[str, str]] = {}
+                    segment = render(text, cursor, segment_end, entities, placeholders, new_entries)
+                cursor = segment_end
+                yield AnonymizationSegment(text=segment, map=new_entries)
+
+            inference_clock.publish()
+            lemma_clock.publish()
+            reconstruction_clock.publish()
+        finally:
+            # Клиент мог отключиться — недоделанные чанки больше не нужны
+            for task in tasks:
+                task.cancel()
+
+    async def anonymize_sections(
+        self,
+        sections: AsyncIterator[str],
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str] | None = None,
+        use_fake: bool = False,
+        sections_in_flight: int = 4,
+        anonymization_map: dict[str, dict[str, str]] | None = None,
+    ) -> AsyncIterator[AnonymizationSegment]:
+        """
+        Анонимизация документа, поступающего разделами (страницами, группами абзацев).
+
+        Раздел нарезается на чанки и уходит в инференс сразу, как только получен, пока следующие разделы
+        ещё извлекаются; одновременно в обработке не больше `sections_in_flight` разделов. Сегменты отдаются
+        в порядке документа, по одному на раздел, с общей для всего документа картой (в сегменте — только новые
+        записи). Сущности на границе разделов не ищутся, поэтому разделы стоит резать по абзацам.
+
+        Отказ в допуске возвращается только для первого раздела; чанки следующих разделов ждут места в очереди.
+        `anonymization_map` — карта уже обработанной части документа, если обработка продолжается после перерыва.
+        """
+        # Разделы в обработке; None — конец документа, исключение — ошибка извлечения или нарезки
+        queue: asyncio.Queue[tuple[str, list[tuple[str, int, int]], asyncio.Task] | Exception | None] = asyncio.Queue(
+            maxsize=max(1, sections_in_flight)
+        )
+
+        async def detect(
+            texts: list[str], label_groups: list[list[str]], tokens: list[int], first: bool
+        ) -> list[list[dict]]:
+            while True:
+                try:
+                    return await self._detect_chunks(texts, labels, threshold, label_groups, tokens)
+                except QueueFullError as exc:
+                    if first:
+                        raise
+                    await asyncio.sleep(max(exc.retry_after, self.batcher.max_wait))
+
+        async def produce() -> None:
+            first = True
+            try:
+                async for section in sections:
+                    with chunking_clock.measure():
+                        label_groups, chunks, tokens = await self._chunk(section, labels)
+                    CHUNKS_PER_REQUEST.observe(len(chunks))
+                    task = asyncio.create_task(
+                        detect([chunk_text for chunk_text, _, _ in chunks], label_groups, tokens, first)
+                    )
+                    first = False
+                    await queue.put((section, chunks, task))
+            except Exception as exc:  # noqa: BLE001 — ошибка передаётся через очередь и поднимается у потребителя
+                await queue.put(exc)
+            else:
+                await queue.put(None)
+
+        chunking_clock = StageClock("chunking", CHUNKING_SECONDS)
+        inference_clock = StageClock("inference", INFERENCE_SECONDS)
+        lemma_clock = StageClock("lemma", LEMMA_FILTER_SECONDS)
+        reconstruction_clock = StageClock("reconstruction", RECONSTRUCTION_SECONDS)
+        placeholders = self._replacement_map(use_fake)
+        if anonymization_map:
+            placeholders.restore(anonymization_map)
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                section, chunks, task = item
+                with inference_clock.measure():
+                    results = await task
+                new_entries: dict[str, dict[str, str]] = {}
+                segment = self._render_chunks(
+                    section,
+                    chunks,
+                    results,
+                    exclude_lemmas,
+                    placeholders,
+                    new_entries,
+                    lemma_clock,
+                    reconstruction_clock,
+                )
+                yield AnonymizationSegment(text=segment, map=new_entries)
+
+            chunking_clock.publish()
+            inference_clock.publish()
+            lemma_clock.publish()
+            reconstruction_clock.publish()
+        finally:
+            producer.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, tuple):
+                    item[2].cancel()
+
+    async def anonymize_increment(
+        self,
+        session: IncrementalSession,
+        text: str,
+        final: bool = False,
+        holdback_chars: int = 300,
+        context_chars: int = 300,
+    ) -> AnonymizationSegment:
+        """
+        Инкрементальная анонимизация: text дописывается к хвосту сессии, в ответе — только финализированный фрагмент
+        и новые записи карты сессии.
+
+        Модель запускается, когда в хвосте набралось не меньше 2 × holdback_chars символов (или при final), и видит
+        только context_chars символов финализированного текста и хвост — работа на сообщение не зависит от длины
+        сессии. Финализируется текст до границы предложения, за которой остаётся не меньше holdback_chars символов:
+        сущность в них может продолжиться в следующем сообщении. final — финализировать весь хвост.
+
+        Если обработка прервалась ошибкой, текст остаётся в хвосте и будет обработан со следующим сообщением.
         """
-        chunks: list[tuple[str, int, int]] = await self.chunker.chunk(text)
-
-        all_entities = []
-        async with SEMAPHORE:
-            tasks = []
-            for chunk_text, global_start, _ in chunks:
-                task = asyncio.to_thread(self.model.predict_entities, chunk_text, labels, threshold=threshold)
-                tasks.append((task, global_start))
-
-            results = await asyncio.gather(*(t[0] for t in tasks))
-
-            for entities, (task, global_start) in zip(results, tasks):
-                for ent in entities:
-                    ent["start"] += global_start
-                    ent["end"] += global_start
-                    ent["text"] = text[ent["start"] : ent["end"]]
-                all_entities.extend(entities)
-
-        if exclude_lemmas:
-            filtered_entities = []
-            for ent in all_entities:
-                word = ent["text"]
-                lemma = _get_lemma_cached(word)
-                if lemma not in exclude_lemmas:
-                    filtered_entities.append(ent)
-            all_entities = filtered_entities
-
-        # Умная дедупликация на основе score.
-        # Оставляем сущность с наибольшей уверенностью для каждого диапазона (start, end).
-        unique_entities_by_pos = {}
-        for ent in all_entities:
-            key = (ent["start"], ent["end"])
-            # GLiNER возвращает 'score'
-            current_score = ent.get("score", 0.0)
-
-            if key not in unique_entities_by_pos or current_score > unique_entities_by_pos[key].get("score", 0.0):
-                unique_entities_by_pos[key] = ent
-
-        all_entities = list(unique_entities_by_pos.values())
-
-        # Разрешение пересечений
-        all_entities = self._resolve_overlapping_entities(all_entities)
-
-        # Сортируем по start для корректной замены с конца
-        all_entities.sort(key=lambda x: x["start"])
-
-        # Шаг 5: строим глобальный anon_map и заменяем по позициям
-        anon_map: dict[tuple, str] = {}
-        placeholder_counters: dict[str, int] = {}
-        result_chars = list(text)
-
-        # Заменяем с КОНЦА, чтобы не сбивать индексы
-        for ent in reversed(all_entities):
-            label = ent["label"]
-            original_text = ent["text"]
-
-            key = (label, original_text)
-            if key not in anon_map:
-                counter = placeholder_counters.get(label, 1)
-                placeholder = f"[{label}_{counter}]"
-                anon_map[key] = placeholder
-                placeholder_counters[label] = counter + 1
-
-            placeholder = anon_map[key]
-            result_chars[ent["start"] : ent["end"]] = list(placeholder)
-
-        anonymized_text = "".join(result_chars)
-
-        # Строим nested_map: dict[label, dict[placeholder, original_text]]
-        nested_anon_map: dict[str, dict[str, str]] = {}
-        for (label, original_text), placeholder in anon_map.items():
-            if label not in nested_anon_map:
-                nested_anon_map[label] = {}
-            nested_anon_map[label][original_text] = placeholder
-
-        return AnonymizationResult(text=anonymized_text, map=nested_anon_map)
+        async with session.lock:
+            session.pending += text
+            pending = session.pending
+            if not pending or (not final and len(pending) < 2 * holdback_chars):
+                return AnonymizationSegment(text="", map={})
+
+            window = session.context + pending
+            offset = len(session.context)
+            with stage("chunking", CHUNKING_SECONDS):
+                label_groups, chunks, tokens = await self._chunk(window, session.labels)
+            CHUNKS_PER_REQUEST.observe(len(chunks))
+            with stage("inference", INFERENCE_SECONDS):
+                results = await self._detect_chunks(
+                    [chunk_text for chunk_text, _, _ in chunks],
+                    session.labels,
+                    session.threshold,
+                    label_groups,
+                    tokens,
+                )
+
+            lemma_clock = StageClock("lemma", LEMMA_FILTER_SECONDS)
+            reconstruction_clock = StageClock("reconstruction", RECONSTRUCTION_SECONDS)
+            with reconstruction_clock.measure():
+                spans = [
+                    to_document_offsets(window, chunk_start, chunk_entities)
+                    for chunk_entities, (_, chunk_start, _) in zip(results, chunks)
+                ]
+            with lemma_clock.measure():
+                spans = self._filter_excluded(spans, session.exclude_lemmas)
+            with reconstruction_clock.measure():
+                entities = []
+                # Сущности контекста уже выданы в предыдущих фрагментах
+                for ent in merge_chunk_spans(spans):
+                    if ent["start"] >= offset:
+                        ent["start"] -= offset
+                        ent["end"] -= offset
+                        entities.append(ent)
+
+            with reconstruction_clock.measure():
+                boundary = len(pending) if final else commit_boundary(pending, len(pending) - holdback_chars, entities)
+                new_entries: dict[str, dict[str, str]] = {}
+                segment = render(
+                    pending,
+                    0,
+                    boundary,
+                    [ent for ent in entities if ent["end"] <= boundary],
+                    session.placeholders,
+                    new_entries,
+                )
+                session.commit(boundary, new_entries, context_chars)
+            lemma_clock.publish()
+            reconstruction_clock.publish()
+            return AnonymizationSegment(text=segment, map=new_entries)
+
+    @staticmethod
+    def _replacement_map(use_fake: bool) -> PlaceholderMap:
+        return FakeValueMap(get_fake_pools()) if use_fake else PlaceholderMap()
 
     @staticmethod
-    def _resolve_overlapping_entities(entities: list[dict]) -> list[dict]:
-        if not entities:
-            return entities
-        # Сортируем по start, затем по длине (длиннее — приоритетнее)
-        entities = sorted(entities, key=lambda x: (x["start"], -(x["end"] - x["start"])))
-        resolved = []
-        last_end = -1
-        for ent in entities:
-            if ent["start"] >= last_end:
-                resolved.append(ent)
-                last_end = ent["end"]
-        return resolved
+    def _filter_excluded(chunk_entities: list[list[dict]], exclude_lemmas: set[str] | None) -> list[list[dict]]:
+        """Убирает сущности, исключённые по леммам; слова всех переданных сущностей лемматизируются одним пакетом."""
+        if not exclude_lemmas:
+            return chunk_entities
+        return LemmaMatcher(get_lemmatizer(), exclude_lemmas, settings.LEMMA_MATCH).filter(chunk_entities)
@@ -0,0 +1,113 @@
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ..gliner.gliner import CACHE_DIR, DEFAULT_MODEL, GlinerAnonymizer
+
+if TYPE_CHECKING:
+    from gliner import GLiNER
+
+logger = logging.getLogger(__name__)
+
+ONNX_FILENAME = "model.onnx"
+QUANTIZED_FILENAME = "model_quantized.onnx"
+
+
+def get_gliner_onnx(model: str = DEFAULT_MODEL, quantize: bool = True) -> "GlinerOnnxAnonymizer":
+    return GlinerOnnxAnonymizer(model, quantize=quantize)
+
+
+def export_dir(model: str) -> Path:
+    return Path(CACHE_DIR) / "onnx" / model.replace("/", "--")
+
+
+def _export_with_torch(gliner_model: "GLiNER", onnx_path: Path) -> None:
+    """Экспорт по схеме convert_to_onnx.py из репозитория GLiNER — для версий без export_to_onnx."""
+    import torch
+
+    inputs, _ = gliner_model.prepare_model_inputs(["Иван Петров живёт в Москве."], ["person", "location"])
+    input_names = ["input_ids", "attention_mask", "words_mask", "text_lengths", "span_idx", "span_mask"]
+    dynamic_axes = {
+        "input_ids": {0: "batch_size", 1: "sequence_length"},
+        "attention_mask": {0: "batch_size", 1: "sequence_length"},
+        "words_mask": {0: "batch_size", 1: "sequence_length"},
+        "text_lengths": {0: "batch_size", 1: "value"},
+        "span_idx": {0: "batch_size", 1: "num_spans", 2: "idx"},
+        "span_mask": {0: "batch_size", 1: "num_spans"},
+        "logits": {0: "position", 1: "batch_size", 2: "sequence_length", 3: "num_classes"},
+    }
+    torch.onnx.export(
+        gliner_model.model,
+        tuple(inputs[name] for name in input_names),
+        f=str(onnx_path),
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=14,
+    )
+
+
+def export_onnx(model: str, quantize: bool) -> tuple[Path, str]:
+    """
+    Экспортирует GLiNER в ONNX (и при необходимости квантует веса в int8).
+
+    Артефакты кэшируются в ./models/onnx/<model>/ — повторный экспорт не выполняется.
+
+    :return: Директория модели и имя ONNX-файла внутри неё.
+    """
+    from gliner import GLiNER
+
+    target_dir = export_dir(model)
+    onnx_path = target_dir / ONNX_FILENAME
+    if not onnx_path.exists():
+        logger.info("Exporting %s to ONNX into %s", model, target_dir)
+        gliner_model = GLiNER.from_pretrained(model, cache_dir=CACHE_DIR)
+        gliner_model.eval()
+        target_dir.mkdir(parents=True, exist_ok=True)
+        # Конфиг и токенизатор нужны, чтобы потом загрузить модель из этой директории
+        gliner_model.save_pretrained(target_dir)
+        if hasattr(gliner_model, "export_to_onnx"):
+            gliner_model.export_to_onnx(save_dir=str(target_dir), onnx_filename=ONNX_FILENAME, quantize=False)
+        else:
+            _export_with_torch(gliner_model, onnx_path)
+
+    if not quantize:
+        return target_dir, ONNX_FILENAME
+
+    quantized_path = target_dir / QUANTIZED_FILENAME
+    if not quantized_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to int8", onnx_path)
+        quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+    return target_dir, QUANTIZED_FILENAME
+
+
+class GlinerOnnxAnonymizer(GlinerAnonymizer):
+    """
+    GLiNER на ONNX Runtime (CPU) с опциональной динамической int8-квантизацией.
+
+    Чанкинг, батчинг, кэш и постобработка — общие с GlinerAnonymizer, отличается только загрузка модели.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, quantize: bool = True) -> None:
+        self.quantize = quantize
+        super().__init__(model)
+
+    def _load_model(self, model: str) -> "GLiNER":
+        import onnxruntime as ort
+        from gliner import GLiNER
+
+        model_dir, onnx_filename = export_onnx(model, self.quantize)
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return GLiNER.from_pretrained(
+            str(model_dir),
+            load_onnx_model=True,
+            load_tokenizer=True,
+            onnx_model_file=onnx_filename,
+            session_options=session_options,
+        )
+
+    def model_id(self, model: str) -> str:
+        return f"{model}:onnx-int8" if self.quantize else f"{model}:onnx"
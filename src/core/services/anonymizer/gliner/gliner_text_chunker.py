@@ -1,25 +1,85 @@
 import asyncio
 import logging
 import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from dataclasses import dataclass
+from itertools import accumulate, pairwise
 from typing import Any
 
+from src.core.metrics import CHUNK_TOKENS
+
 logger = logging.getLogger(__name__)
 
+PARAGRAPH, SENTENCE, DELIMITER = 0, 1, 2
+
+# Одно регулярное выражение находит все границы разбиения за один проход по тексту.
+# Предложение заканчивается на .!? за которыми следует пробел и заглавная буква (чтобы не резать по "г.", "д.", "стр.").
+_BOUNDARY_PATTERN = re.compile(r'(?P<paragraph>\n{2,})|(?P<sentence>[.!?](?=\s+[А-ЯA-Z"«(]))|(?P<delimiter>[,;])')
+_BOUNDARY_LEVELS = {"paragraph": PARAGRAPH, "sentence": SENTENCE, "delimiter": DELIMITER}
+# Служебные слова промпта GLiNER, если процессор модели их не задаёт
+_ENT_TOKEN = "<<ENT>>"
+_SEP_TOKEN = "<<SEP>>"
+_PROMPT_CACHE_SIZE = 1024
+
+
+@dataclass(slots=True)
+class _TokenIndex:
+    """
+    Индекс документа: позиции слов, префиксные суммы их токенов и границы разбиения.
+
+    Строится один раз на документ, после чего количество токенов любого диапазона
+    считается за O(log n) без повторного вызова токенизатора.
+    """
+
+    word_starts: list[int]
+    word_ends: list[int]
+    prefix: list[int]
+    special_tokens: int
+    cuts: tuple[list[int], list[int], list[int]]
+
+    def word_range(self, start: int, end: int) -> tuple[int, int]:
+        """
+        Индексы [lo, hi) слов, пересекающихся с диапазоном символов [start, end).
+
+        Слово, разрезанное границей диапазона, учитывается целиком — оценка сверху
+        не даст принудительно нарезанным кускам длинного слова слиться в чанк сверх лимита.
+        """
+        return bisect_right(self.word_ends, start), bisect_left(self.word_starts, end)
+
+    def count(self, start: int, end: int) -> int:
+        lo, hi = self.word_range(start, end)
+        if hi <= lo:
+            return 0
+        return self.prefix[hi] - self.prefix[lo] + self.special_tokens
+
+    @property
+    def total(self) -> int:
+        return self.prefix[-1] + self.special_tokens if len(self.prefix) > 1 else 0
+
 
 class GlinerTextChunker:
     """
     Класс для иерархического разбиения текста на фрагменты,
-    подходящие для обработки GLiNER (максимум 768 токенов).
+    подходящие для обработки GLiNER (максимум 768 токенов вместе с промптом меток).
+
+    GLiNER ставит перед текстом каждого чанка промпт «<<ENT>> метка ... <<SEP>>», поэтому бюджет текста —
+    это лимит последовательности за вычетом токенов промпта запрошенных меток (`text_budget`).
+
+    Документ токенизируется один раз (с привязкой токенов к словам), а границы абзацев,
+    предложений и запятых/точек с запятой находятся за один проход регулярным выражением.
+    Дальше разрезы расставляются по префиксным суммам токенов.
 
     Алгоритм работает жадно и иерархически:
-    1. Весь текст → если укладывается в лимит — вернуть.
+    1. Весь текст → если укладывается в бюджет — вернуть.
     2. Иначе — разбить на абзацы и жадно объединять.
     3. Если абзац слишком длинный — разбить на предложения.
     4. Если предложение слишком длинное — разбить по запятым/точкам с запятой.
     5. Если и это не помогает — разбить на слова (с защитой от атак через сверхдлинные слова).
-    6. После разбиения короткие чанки (< 1/3 max_tokens) объединяются со следующими, если возможно.
+    6. После разбиения короткие чанки (< 1/3 бюджета) объединяются со следующими, если возможно.
 
     Поддерживает сохранение символьных позиций (start, end) для последующего восстановления контекста.
+    Текст каждого чанка всегда равен срезу исходного документа text[start:end].
     """
 
     def __init__(self, data_processor: Any, max_tokens: int = 768):
@@ -29,14 +89,38 @@ class GlinerTextChunker:
         :param data_processor: Объект, содержащий:
                                - words_splitter(text) → list[tuple[word, start, end]]
                                - transformer_tokenizer (HuggingFace tokenizer)
-        :param max_tokens: Максимальное количество токенов в одном чанке (по умолчанию 768).
+        :param max_tokens: Максимальное количество токенов в последовательности модели: промпт меток,
+                           текст чанка и специальные токены (по умолчанию 768).
         """
         self.data_processor = data_processor
         self.max_tokens = max_tokens
-        self.char_limit_per_chunk = max_tokens * 4
+        # Bi-encoder кодирует метки отдельным энкодером — промпт не занимает места в последовательности текста
+        self.prompt_in_sequence = getattr(data_processor, "labels_tokenizer", None) is None
+        self._prompt_tokens: dict[tuple[str, ...], int] = {}
 
-    async def chunk(self, text: str) -> list[tuple[str, int, int]]:
-        return await asyncio.to_thread(self._chunk, text)
+    async def chunk(self, text: str, budget: int | None = None) -> list[tuple[str, int, int]]:
+        return await asyncio.to_thread(self._chunk, text, budget)
+
+    def prompt_tokens(self, labels: Sequence[str]) -> int:
+        """Количество токенов, которое промпт меток займёт в последовательности модели."""
+        if not self.prompt_in_sequence:
+            return 0
+        key = tuple(labels)
+        tokens = self._prompt_tokens.get(key)
+        if tokens is None:
+            ent_token = getattr(self.data_processor, "ent_token", _ENT_TOKEN)
+            sep_token = getattr(self.data_processor, "sep_token", _SEP_TOKEN)
+            # Промпт собирается так же, как в GLiNER: отдельные «слова» <<ENT>> и метка на каждую метку и <<SEP>>
+            words = [word for label in labels for word in (ent_token, label)] + [sep_token]
+            tokens = sum(self._word_token_counts(words))
+            if len(self._prompt_tokens) >= _PROMPT_CACHE_SIZE:
+                self._prompt_tokens.clear()
+            self._prompt_tokens[key] = tokens
+        return tokens
+
+    def text_budget(self, label_groups: Sequence[Sequence[str]]) -> int:
+        """Бюджет чанка в токенах (со специальными), при котором каждая группа меток помещается в лимит."""
+        return self.max_tokens - max((self.prompt_tokens(labels) for labels in label_groups), default=0)
 
     def _count_tokens(self, text: str) -> int:
         """
@@ -55,238 +139,192 @@ class GlinerTextChunker:
         )
         return enc["length"][0]
 
-    @staticmethod
-    def _split_into_paragraphs(text: str, start_offset: int = 0) -> list[tuple[str, int, int]]:
-        """Разбивает текст на абзацы с сохранением символьных позиций."""
-        paragraphs = []
-        for match in re.finditer(r"\S(?:.|\n)*?(?=\n{2,}|$)", text, re.DOTALL):
-            paragraph_text = match.group(0).strip()
-            if paragraph_text:
-                paragraphs.append((paragraph_text, start_offset + match.start(), start_offset + match.end()))
-        return paragraphs
+    def _word_token_counts(self, words: list[str]) -> list[int]:
+        """
+        Количество токенов каждого слова за один вызов токенизатора.
 
-    @staticmethod
-    def _split_into_sentences(text: str, start_offset: int = 0) -> list[tuple[str, int, int]]:
-        """Разбивает текст на предложения, используя более надежный regex."""
-        sentences = []
-        # Этот regex пытается учесть сокращения (типа г., д., стр.) и не разбивать по ним.
-        # Он ищет конец предложения (.!?) за которым следует пробел и заглавная буква, или конец строки.
-        sentence_ends = [m.end() for m in re.finditer(r'[.!?]\s+(?=[А-ЯA-Z"«(])|(?<=[.!?])\s*$', text)]
-
-        last_idx = 0
-        for end_idx in sentence_ends:
-            sentence_text = text[last_idx:end_idx].strip()
-            if sentence_text:
-                sentences.append((sentence_text, start_offset + last_idx, start_offset + end_idx))
-            last_idx = end_idx
-
-        if last_idx < len(text):
-            sentence_text = text[last_idx:].strip()
-            if sentence_text:
-                sentences.append((sentence_text, start_offset + last_idx, start_offset + len(text)))
-
-        if not sentences and text.strip():
-            return [(text.strip(), start_offset, start_offset + len(text))]
-
-        return sentences
+        Слова токенизируются так же, как в `_count_tokens` (is_split_into_words), поэтому сумма
+        по диапазону слов совпадает с результатом `_count_tokens` для этого диапазона.
+        """
+        tokenizer = self.data_processor.transformer_tokenizer
+        enc = tokenizer(words, is_split_into_words=True, add_special_tokens=False)
+        if getattr(enc, "is_fast", False):
+            counts = [0] * len(words)
+            for word_id in enc.word_ids():
+                if word_id is not None:
+                    counts[word_id] += 1
+            return counts
+        # Медленный токенизатор не умеет word_ids — токенизируем слова батчем по одному
+        return list(tokenizer(words, add_special_tokens=False, return_length=True)["length"])
+
+    def _build_index(self, text: str) -> _TokenIndex:
+        words_with_pos = list(self.data_processor.words_splitter(text))
+        counts = self._word_token_counts([w for w, _, _ in words_with_pos]) if words_with_pos else []
+
+        cuts: tuple[list[int], list[int], list[int]] = ([], [], [])
+        for match in _BOUNDARY_PATTERN.finditer(text):
+            level = _BOUNDARY_LEVELS[match.lastgroup]
+            # Граница уровня L допустима и на всех более мелких уровнях
+            for finer in range(level, DELIMITER + 1):
+                cuts[finer].append(match.end())
+
+        return _TokenIndex(
+            word_starts=[start for _, start, _ in words_with_pos],
+            word_ends=[end for _, _, end in words_with_pos],
+            prefix=[0, *accumulate(counts)],
+            special_tokens=self.data_processor.transformer_tokenizer.num_special_tokens_to_add(),
+            cuts=cuts,
+        )
 
     @staticmethod
-    def _split_by_delimiters(text: str, start_offset: int = 0) -> list[tuple[str, int, int]]:
-        """
-        Резервная разбивка по запятым и точкам с запятой с сохранением позиций.
+    def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+        """Сужает диапазон, отбрасывая пробельные символы по краям."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
 
-        :param text: Текст для разбиения.
-        :param start_offset: Смещение начала текста в исходном документе.
-        :return: Список кортежей (фрагмент, start, end).
-        """
-        parts = []
-        last = 0
-        for i, c in enumerate(text):
-            if c in ",;":
-                part = text[last : i + 1].strip()
-                if part:
-                    parts.append((part, start_offset + last, start_offset + i + 1))
-                last = i + 1
-        # Добавляем остаток
-        if last < len(text):
-            part = text[last:].strip()
-            if part:
-                parts.append((part, start_offset + last, start_offset + len(text)))
-        return parts
-
-    def _force_split_oversized_chunk(self, chunk_text: str, start_offset: int) -> list[tuple[str, int, int]]:
+    @staticmethod
+    def _force_split_oversized_chunk(chunk_text: str, start_offset: int, budget: int) -> list[tuple[str, int, int]]:
         """
         Принудительно нарезает слишком длинный фрагмент текста, который не удалось разбить
         другими способами (например, одно очень длинное слово без пробелов).
         """
         sub_chunks = []
-        for i in range(0, len(chunk_text), self.char_limit_per_chunk):
-            sub_text = chunk_text[i : i + self.char_limit_per_chunk]
+        char_limit_per_chunk = budget * 4
+        for i in range(0, len(chunk_text), char_limit_per_chunk):
+            sub_text = chunk_text[i : i + char_limit_per_chunk]
             sub_start = start_offset + i
             sub_end = sub_start + len(sub_text)
             sub_chunks.append((sub_text, sub_start, sub_end))
         return sub_chunks
 
-    def _chunk_by_words(self, text: str, start_offset: int = 0) -> list[tuple[str, int, int]]:
+    def _split_and_merge(
+        self, text: str, index: _TokenIndex, spans: list[tuple[int, int]], level: int, budget: int
+    ) -> list[tuple[int, int]]:
         """
-        Крайний случай: разбивка по словам с учётом позиций.
-        Защищает от атак с использованием сверхдлинных слов.
+        Разрезает слишком длинные диапазоны по границам уровня `level`
+        и жадно объединяет соседние части, пока они укладываются в лимит.
+        """
+        cuts = index.cuts[level]
+        final_spans = []
+        for start, end in spans:
+            if index.count(start, end) <= budget:
+                final_spans.append((start, end))
+                continue
+
+            bounds = [start, *cuts[bisect_right(cuts, start) : bisect_left(cuts, end)], end]
+            sub_spans = []
+            for sub_start, sub_end in pairwise(bounds):
+                sub_start, sub_end = self._strip_span(text, sub_start, sub_end)
+                if sub_start < sub_end:
+                    sub_spans.append((sub_start, sub_end))
+
+            if not sub_spans:
+                final_spans.append((start, end))
+                continue
 
-        :param text: Текст для разбиения.
-        :param start_offset: Смещение начала текста в исходном документе.
-        :return: Список кортежей (фрагмент, start, end).
+            i = 0
+            n = len(sub_spans)
+            while i < n:
+                current_start, current_end = sub_spans[i]
+                j = i + 1
+                while j < n and index.count(current_start, sub_spans[j][1]) <= budget:
+                    current_end = sub_spans[j][1]
+                    j += 1
+                final_spans.append((current_start, current_end))
+                i = j
+
+        return final_spans
+
+    def _split_by_words(
+        self, text: str, index: _TokenIndex, spans: list[tuple[int, int]], budget: int
+    ) -> list[tuple[int, int]]:
         """
-        words_with_pos = list(self.data_processor.words_splitter(text))
-        if not words_with_pos:
-            return [(text, start_offset, start_offset + len(text))]
-
-        chunks = []
-        w = 0
-        total = len(words_with_pos)
-        base_char_start = words_with_pos[0][1]
-
-        while w < total:
-            word_chunk = []
-            word_start = start_offset + (words_with_pos[w][1] - base_char_start)
-            x = w
-
-            # Жадно набираем слова, пока укладываемся в лимит
-            while x < total:
-                test_words = [word for word, _, _ in words_with_pos[w : x + 1]]
-                test_str = " ".join(test_words)
-                if self._count_tokens(test_str) <= self.max_tokens:
-                    word_chunk = test_words
-                    x += 1
-                else:
-                    break
-
-            if word_chunk:
-                word_text = " ".join(word_chunk)
-                word_end = start_offset + (words_with_pos[x - 1][2] - base_char_start)
-                chunks.append((word_text, word_start, word_end))
-                w = x
-            else:
-                # НЕ удалось добавить даже одно слово (words_with_pos[w]).
-                # Это означает, что само слово слишком длинное для модели.
-                long_word, word_char_start, word_char_end = words_with_pos[w]
+        Крайний случай: разбивка по словам.
+        Защищает от атак с использованием сверхдлинных слов.
+        """
+        word_budget = budget - index.special_tokens
+        final_spans = []
+        for start, end in spans:
+            if index.count(start, end) <= budget:
+                final_spans.append((start, end))
+                continue
+
+            lo, hi = index.word_range(start, end)
+            w = lo
+            while w < hi:
+                # Последнее слово x, при котором слова [w, x) ещё укладываются в лимит
+                x = min(bisect_right(index.prefix, index.prefix[w] + word_budget) - 1, hi)
+                if x > w:
+                    final_spans.append((index.word_starts[w], index.word_ends[x - 1]))
+                    w = x
+                    continue
+
+                # НЕ удалось добавить даже одно слово — само слово слишком длинное для модели.
+                word_start, word_end = index.word_starts[w], index.word_ends[w]
                 logger.warning(
                     "Encountered a word too long for the model: '%.50s...' (length: %d chars). Splitting it.",
-                    long_word,
-                    len(long_word),
+                    text[word_start:word_end],
+                    word_end - word_start,
                 )
-                # Вычисляем глобальную позицию этого слова в исходном тексте
-                global_word_start = start_offset + (word_char_start - base_char_start)
-                # Принудительно разбиваем это одно слово на части
-                forced_chunks = self._force_split_oversized_chunk(long_word, global_word_start)
-                chunks.extend(forced_chunks)
-                w += 1  # переходим к следующему слову
+                forced_chunks = self._force_split_oversized_chunk(text[word_start:word_end], word_start, budget)
+                final_spans.extend((sub_start, sub_end) for _, sub_start, sub_end in forced_chunks)
+                w += 1
 
-        return chunks
+        return final_spans
 
-    def _merge_short_chunks(self, chunks: list[tuple[str, int, int]]) -> list[tuple[str, int, int]]:
+    @staticmethod
+    def _merge_short_spans(index: _TokenIndex, spans: list[tuple[int, int]], budget: int) -> list[tuple[int, int]]:
         """
-        Объединяет короткие чанки (< 1/3 max_tokens) со следующими, если это не нарушает лимит.
-
-        :param chunks: Список чанков до объединения.
-        :return: Список чанков после объединения.
+        Объединяет короткие чанки (< 1/3 бюджета) со следующими, если это не нарушает бюджет.
         """
-        if len(chunks) <= 1:
-            return chunks
+        if len(spans) <= 1:
+            return spans
 
         merged = []
         i = 0
-        threshold = self.max_tokens // 3
+        threshold = budget // 3
 
-        while i < len(chunks):
-            current_text, current_start, current_end = chunks[i]
-            current_token_count = self._count_tokens(current_text)
+        while i < len(spans):
+            current_start, _ = spans[i]
 
             # Пытаемся объединить с последующим чанком
-            if current_token_count < threshold and i + 1 < len(chunks):
-                next_text, _, next_end = chunks[i + 1]
-                combined = current_text + " " + next_text
-                if self._count_tokens(combined) <= self.max_tokens:
-                    merged.append((combined, current_start, next_end))
+            if i + 1 < len(spans) and index.count(*spans[i]) < threshold:
+                next_end = spans[i + 1][1]
+                if index.count(current_start, next_end) <= budget:
+                    merged.append((current_start, next_end))
                     i += 2
                     continue
 
-            merged.append(chunks[i])
+            merged.append(spans[i])
             i += 1
 
         return merged
 
-    def _chunk(self, text: str) -> list[tuple[str, int, int]]:
-        """Основной метод: разбивает текст на чанки, подходящие для GLiNER."""
-        if self._count_tokens(text) <= self.max_tokens:
-            return [(text, 0, len(text))]
-
-        # Иерархически применяем стратегии разбиения
-        chunks = self._split_and_process([(text, 0, len(text))], self._split_into_paragraphs)
-        chunks = self._split_and_process(chunks, self._split_into_sentences)
-        chunks = self._split_and_process(chunks, self._split_by_delimiters)
-        chunks = self._split_and_process(chunks, self._chunk_by_words)
-
-        return self._merge_short_chunks(chunks)
-
-    def _split_and_process(
-        self,
-        chunks_to_process: list[tuple[str, int, int]],
-        split_func: callable,
+    def _chunk(
+        self, text: str, budget: int | None = None, index: _TokenIndex | None = None
     ) -> list[tuple[str, int, int]]:
         """
-        Применяет функцию разбиения `split_func` к каждому чанку, который слишком длинный.
-        """
-        final_chunks = []
-        for text, start, _ in chunks_to_process:
-            if self._count_tokens(text) <= self.max_tokens:
-                # Убедимся, что end-позиция верна. start + len(text) - это правильный способ.
-                final_chunks.append((text, start, start + len(text)))
-                continue
-
-            # Чанк слишком длинный, разбиваем его дальше
-            sub_chunks = split_func(text, start)
+        Основной метод: разбивает текст на чанки, подходящие для GLiNER.
 
-            if not sub_chunks:  # Если сплиттер ничего не вернул
-                if text:
-                    final_chunks.append((text, start, start + len(text)))
-                continue
-
-            # --- НАЧАЛО ИСПРАВЛЕННОЙ ЛОГИКИ ЖАДНОГО ОБЪЕДИНЕНИЯ ---
-
-            i = 0
-            n = len(sub_chunks)
-            while i < n:
-                # Начинаем с первого под-чанка в новом объединенном блоке
-                # Его глобальные start и end позиции
-                current_start, current_end = sub_chunks[i][1], sub_chunks[i][2]
-
-                j = i + 1
-                while j < n:
-                    # Потенциальная конечная позиция после слияния со следующим под-чанком
-                    next_end = sub_chunks[j][2]
-
-                    # Получаем тестовый текст НЕ конкатенацией, а СРЕЗОМ из родительского чанка 'text'
-                    # Индексы для среза должны быть относительны 'text', поэтому вычитаем 'start'
-                    span_start_in_parent = current_start - start
-                    span_end_in_parent = next_end - start
-                    test_text = text[span_start_in_parent:span_end_in_parent]
-
-                    if self._count_tokens(test_text) <= self.max_tokens:
-                        # Если слияние возможно, мы просто расширяем наш 'end' и двигаемся дальше
-                        current_end = next_end
-                        j += 1
-                    else:
-                        # Если превысили лимит, прекращаем слияние
-                        break
-
-                # Создаем финальный чанк для объединенного блока
-                # Снова берем текст как срез из родительского чанка, чтобы гарантировать идентичность
-                final_text_for_chunk = text[current_start - start : current_end - start]
-                final_chunks.append((final_text_for_chunk, current_start, current_end))
-
-                # Переходим к следующему необработанному под-чанку
-                i = j
-
-            # --- КОНЕЦ ИСПРАВЛЕННОЙ ЛОГИКИ ---
+        :param budget: Бюджет чанка в токенах (см. `text_budget`); по умолчанию — вся последовательность.
+        :param index: Уже построенный индекс текста, если он понадобился раньше (например, для оценки длины).
+        """
+        budget = self.max_tokens if budget is None else budget
+        index = index or self._build_index(text)
+        if (total_tokens := index.total) <= budget:
+            CHUNK_TOKENS.observe(total_tokens)
+            return [(text, 0, len(text))]
 
-        return final_chunks
+        # Иерархически применяем стратегии разбиения
+        spans = [(0, len(text))]
+        for level in (PARAGRAPH, SENTENCE, DELIMITER):
+            spans = self._split_and_merge(text, index, spans, level, budget)
+        spans = self._split_by_words(text, index, spans, budget)
+        spans = self._merge_short_spans(index, spans, budget)
+
+        for start, end in spans:
+            CHUNK_TOKENS.observe(index.count(start, end))
+        return [(text[start:end], start, end) for start, end in spans]
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+
+class LabelEmbeddingCache:
+    """
+    LRU-кэш эмбеддингов меток для bi-encoder моделей GLiNER.
+
+    В bi-encoder метки кодируются отдельным энкодером независимо от текста, поэтому для фиксированного
+    набора меток эмбеддинги считаются один раз. Кэш привязан к экземпляру модели, ключ — кортеж меток
+    в порядке запроса (строки эмбеддингов соответствуют порядку меток).
+    """
+
+    def __init__(self, model: Any, maxsize: int = 128) -> None:
+        self.model = model
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[tuple[str, ...], Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supports(model: Any) -> bool:
+        """Модель — bi-encoder и умеет предсказывать по готовым эмбеддингам меток."""
+        config = getattr(model, "config", None)
+        return (
+            getattr(config, "labels_encoder", None) is not None
+            and hasattr(model, "encode_labels")
+            and hasattr(model, "batch_predict_with_embeds")
+        )
+
+    def get(self, labels: list[str]) -> Any:
+        key = tuple(labels)
+        with self._lock:
+            embeddings = self._data.get(key)
+            if embeddings is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return embeddings
+
+            self.misses += 1
+            embeddings = self.model.encode_labels(list(key), batch_size=len(key))
+            self._data[key] = embeddings
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return embeddings
+
+    def prewarm(self, label_sets: list[list[str]]) -> None:
+        for labels in label_sets:
+            self.get(labels)
@@ -0,0 +1,153 @@
+"""
+Выбор между «больше коротких чанков» и «больше групп меток» для больших наборов меток.
+
+Промпт GLiNER с N метками занимает место в каждой последовательности: чем больше меток, тем меньше текста
+в чанке и тем больше чанков. Набор меток можно разделить на k групп и прогнать каждую по тем же чанкам —
+промпт короче, чанки длиннее, но прогонов в k раз больше. Планировщик оценивает оба варианта по измеренной
+стоимости прохода модели и выбирает самый дешёвый; сущности групп потом сливаются общей дедупликацией.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from math import ceil
+
+logger = logging.getLogger(__name__)
+
+# Стоимость прохода до измерений: линейная часть (FFN) и квадратичная (внимание), в условных единицах
+_DEFAULT_ATTENTION_TOKENS = 1024
+
+
+class SequenceCost:
+    """
+    Оценка времени прямого прохода модели по длине последовательности в токенах.
+
+    Строится по измерениям прогрева (кусочно-линейная интерполяция, за пределами измерений — пропорционально
+    длине от ближайшей точки). Пока измерений нет, используется модель L + L² / 1024: для сравнения вариантов
+    важно только соотношение стоимостей, а не абсолютное время.
+    """
+
+    def __init__(self) -> None:
+        self._points: list[tuple[int, float]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def measured(self) -> bool:
+        return bool(self._points)
+
+    def observe(self, tokens: int, seconds: float) -> None:
+        """Добавляет измерение; повторное измерение той же длины заменяет прежнее."""
+        if tokens <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            points = dict(self._points)
+            points[tokens] = seconds
+            self._points = sorted(points.items())
+
+    def __call__(self, tokens: int) -> float:
+        points = self._points
+        if not points:
+            return tokens + tokens * tokens / _DEFAULT_ATTENTION_TOKENS
+        i = bisect_left(points, (tokens,))
+        if i == 0 or i == len(points):
+            base_tokens, base_seconds = points[min(i, len(points) - 1)]
+            return base_seconds * tokens / base_tokens
+        (lo_tokens, lo_seconds), (hi_tokens, hi_seconds) = points[i - 1], points[i]
+        return lo_seconds + (hi_seconds - lo_seconds) * (tokens - lo_tokens) / (hi_tokens - lo_tokens)
+
+
+@dataclass(frozen=True, slots=True)
+class LabelPlan:
+    groups: list[list[str]]  # группы меток для модели, каждая — отдельный прогон по всем чанкам
+    budget: int  # бюджет чанка в токенах, при котором промпт любой группы помещается в последовательность
+
+
+class LabelGroupPlanner:
+    """
+    Делит метки модели на группы и выбирает их число по оценке стоимости.
+
+    Для k = 1..max_groups метки раскладываются в k групп с примерно равными промптами; вариант оценивается как
+    сумма по документам и группам: число чанков × стоимость последовательности (промпт группы + текст чанка).
+    Варианты, оставляющие тексту меньше min_text_tokens, не рассматриваются, если есть другие.
+    """
+
+    def __init__(
+        self,
+        prompt_tokens: Callable[[Sequence[str]], int],
+        max_tokens: int,
+        special_tokens: int,
+        cost: SequenceCost,
+        max_groups: int = 1,
+        min_text_tokens: int = 128,
+    ) -> None:
+        """
+        :param prompt_tokens: Количество токенов промпта набора меток в последовательности.
+        :param max_tokens: Максимальная длина последовательности модели в токенах.
+        :param special_tokens: Количество специальных токенов последовательности.
+        :param cost: Оценка стоимости прохода по длине последовательности.
+        :param max_groups: Наибольшее число групп; 1 — метки не делятся.
+        :param min_text_tokens: Наименьший допустимый бюджет текста чанка.
+        """
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.special_tokens = special_tokens
+        self.cost = cost
+        self.max_groups = max(1, max_groups)
+        self.min_text_tokens = min_text_tokens
+
+    def plan(self, labels: list[str], document_tokens: Sequence[int]) -> LabelPlan:
+        """
+        План для запроса.
+
+        :param labels: Метки, которые ищет модель (без меток, покрытых правилами).
+        :param document_tokens: Длина каждого документа запроса в токенах (со специальными).
+        """
+        if not labels:
+            return LabelPlan(groups=[], budget=self.max_tokens - self.prompt_tokens([]))
+
+        candidates: list[tuple[float, int, LabelPlan]] = []
+        for count in range(1, min(self.max_groups, len(labels)) + 1):
+            groups = self._split(labels, count)
+            prompts = [self.prompt_tokens(group) for group in groups]
+            budget = self.max_tokens - max(prompts)
+            if budget <= self.special_tokens:
+                continue
+            estimate = self._estimate(prompts, budget, document_tokens)
+            candidates.append((estimate, count, LabelPlan(groups=groups, budget=budget)))
+        if not candidates:
+            # Промпт не оставляет места тексту даже при max_groups группах: последовательности будут обрезаны
+            # токенизатором, но чанки хотя бы не дробятся до отдельных слов
+            logger.warning("Label prompt leaves no room for text: %d labels in %d groups", len(labels), self.max_groups)
+            return LabelPlan(groups=self._split(labels, min(self.max_groups, len(labels))), budget=self.min_text_tokens)
+
+        feasible = [candidate for candidate in candidates if candidate[2].budget >= self.min_text_tokens]
+        # При равной оценке — меньше групп
+        _, _, plan = min(feasible or candidates, key=lambda candidate: candidate[:2])
+        return plan
+
+    def _estimate(self, prompts: list[int], budget: int, document_tokens: Sequence[int]) -> float:
+        text_budget = budget - self.special_tokens
+        total = 0.0
+        for tokens in document_tokens:
+            text = max(1, tokens - self.special_tokens)
+            chunks = ceil(text / text_budget)
+            sequence_text = ceil(text / chunks) + self.special_tokens
+            total += chunks * sum(self.cost(prompt + sequence_text) for prompt in prompts)
+        return total
+
+    def _split(self, labels: list[str], count: int) -> list[list[str]]:
+        """Раскладывает метки в count групп с примерно равными промптами; порядок меток в группе сохраняется."""
+        if count == 1:
+            return [list(labels)]
+        empty = self.prompt_tokens([])
+        weights = {label: self.prompt_tokens([label]) - empty for label in labels}
+        groups: list[list[int]] = [[] for _ in range(count)]
+        loads = [0] * count
+        # Самые длинные метки — первыми в наименее загруженную группу
+        for i in sorted(range(len(labels)), key=lambda i: weights[labels[i]], reverse=True):
+            lightest = loads.index(min(loads))
+            groups[lightest].append(i)
+            loads[lightest] += weights[labels[i]]
+        return [[labels[i] for i in sorted(group)] for group in groups if group]
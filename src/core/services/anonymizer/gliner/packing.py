@@ -0,0 +1,136 @@
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+
+from src.core.metrics import CHUNKS_PER_SEQUENCE
+from src.core.services.anonymizer.gliner.batcher import PredictBatch
+
+# Отдельное «слово» между упакованными чанками: модель не склеивает сущности соседних чанков в одну
+SEPARATOR = "\n.\n"
+
+
+@dataclass(slots=True)
+class _PackedSequence:
+    tokens: int
+    parts: list[str] = field(default_factory=list)
+    members: list[tuple[int, int, int]] = field(default_factory=list)  # (индекс чанка, offset, длина)
+    length: int = 0
+
+    def add(self, index: int, text: str, tokens: int) -> None:
+        if self.parts:
+            self.parts.append(SEPARATOR)
+            self.length += len(SEPARATOR)
+        self.members.append((index, self.length, len(text)))
+        self.parts.append(text)
+        self.length += len(text)
+        self.tokens += tokens
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class SequencePacker:
+    """
+    Упаковка коротких чанков в общие последовательности и группировка по длине.
+
+    Короткие чанки (от одного или разных документов) склеиваются через SEPARATOR в последовательности,
+    которые вместе с промптом меток не длиннее max_tokens (first-fit decreasing), длинные идут как есть.
+    Последовательности сортируются по длине и раскладываются по корзинам `buckets`: каждая корзина — отдельный
+    прямой проход модели, так что короткие последовательности не добиваются паддингом до длинных.
+    Предсказанные сущности переводятся обратно в координаты исходных чанков; сущности, задевшие
+    разделитель, отбрасываются.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        prompt_tokens: Callable[[list[str]], int],
+        special_tokens: int,
+        max_tokens: int,
+        buckets: list[int],
+    ) -> None:
+        """
+        :param count_tokens: Количество токенов текста вместе со специальными.
+        :param prompt_tokens: Количество токенов промпта меток в последовательности.
+        :param special_tokens: Количество специальных токенов, добавляемых токенизатором к последовательности.
+        :param max_tokens: Максимальная длина последовательности модели в токенах (с промптом меток).
+        :param buckets: Верхние границы корзин по длине в токенах.
+        """
+        self.count_tokens = count_tokens
+        self.prompt_tokens = prompt_tokens
+        self.special_tokens = special_tokens
+        self.max_tokens = max_tokens
+        self.buckets = sorted(buckets)
+        self.separator_tokens = max(1, count_tokens(SEPARATOR) - special_tokens)
+
+    def pack(
+        self, texts: list[str], prompt_tokens: int = 0, tokens: Sequence[int | None] | None = None
+    ) -> list[_PackedSequence]:
+        """
+        :param tokens: Длина каждого текста в токенах (со специальными), известная из нарезки;
+                       токенизатор вызывается только для текстов, длина которых не известна.
+        """
+        lengths = [
+            (self.count_tokens(text) if count is None else count) - self.special_tokens
+            for text, count in zip(texts, tokens or [None] * len(texts))
+        ]
+        capacity = self.max_tokens - prompt_tokens - self.special_tokens
+        sequences: list[_PackedSequence] = []
+        for i in sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True):
+            for sequence in sequences:
+                if sequence.tokens + self.separator_tokens + lengths[i] <= capacity:
+                    sequence.tokens += self.separator_tokens
+                    sequence.add(i, texts[i], lengths[i])
+                    break
+            else:
+                sequence = _PackedSequence(tokens=0)
+                sequence.add(i, texts[i], lengths[i])
+                sequences.append(sequence)
+        return sequences
+
+    def _bucket(self, tokens: int) -> int:
+        for i, bound in enumerate(self.buckets):
+            if tokens <= bound:
+                return i
+        return len(self.buckets)
+
+    def predict(
+        self,
+        texts: list[str],
+        labels: list[str],
+        threshold: float,
+        forward: PredictBatch,
+        tokens: Sequence[int | None] | None = None,
+    ) -> list[list[dict]]:
+        sequences = self.pack(texts, self.prompt_tokens(labels), tokens)
+        for sequence in sequences:
+            CHUNKS_PER_SEQUENCE.observe(len(sequence.members))
+
+        by_bucket: dict[int, list[_PackedSequence]] = {}
+        for sequence in sorted(sequences, key=lambda s: s.tokens):
+            by_bucket.setdefault(self._bucket(sequence.tokens + self.special_tokens), []).append(sequence)
+
+        results: list[list[dict]] = [[] for _ in texts]
+        for bucket in by_bucket.values():
+            predicted = forward([sequence.text for sequence in bucket], labels, threshold)
+            for sequence, entities in zip(bucket, predicted):
+                self._unpack(sequence, entities, results)
+        return results
+
+    @staticmethod
+    def _unpack(sequence: _PackedSequence, entities: list[dict], results: list[list[dict]]) -> None:
+        if len(sequence.members) == 1:
+            results[sequence.members[0][0]] = entities
+            return
+        entities = sorted(entities, key=lambda e: e["start"])
+        members = iter(sequence.members)
+        index, offset, length = next(members)
+        for ent in entities:
+            while ent["start"] >= offset + length:
+                member = next(members, None)
+                if member is None:
+                    return
+                index, offset, length = member
+            if ent["start"] < offset or ent["end"] > offset + length:
+                continue
+            results[index].append({**ent, "start": ent["start"] - offset, "end": ent["end"] - offset})
@@ -0,0 +1,88 @@
+"""
+Сверка ONNX-бэкенда с эталонным torch-бэкендом GLiNER.
+
+Прогоняет одинаковые чанки через обе модели и печатает согласие спанов (precision/recall/F1
+по (start, end, label) относительно torch) и ускорение.
+
+Пример:
+    python -m src.core.services.anonymizer.gliner.parity docs/*.txt --labels person phone address
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from ..gliner.gliner import DEFAULT_MODEL, GlinerAnonymizer
+from ..gliner.gliner_onnx import GlinerOnnxAnonymizer
+
+
+def _timed_predict(anonymizer: GlinerAnonymizer, chunks: list[str], labels: list[str], threshold: float, batch: int):
+    spans = []
+    started = time.perf_counter()
+    for i in range(0, len(chunks), batch):
+        spans.extend(anonymizer._predict_batch(chunks[i : i + batch], labels, threshold))
+    return spans, time.perf_counter() - started
+
+
+def compare(
+    reference: GlinerAnonymizer,
+    candidate: GlinerAnonymizer,
+    texts: list[str],
+    labels: list[str],
+    threshold: float,
+    batch_size: int = 8,
+) -> dict:
+    budget = reference.chunker.text_budget([labels])
+    chunks = [chunk for text in texts for chunk, _, _ in reference.chunker._chunk(text, budget)]
+
+    # Прогрев, чтобы не мерить первый (холодный) проход
+    _timed_predict(reference, chunks[:1], labels, threshold, batch_size)
+    _timed_predict(candidate, chunks[:1], labels, threshold, batch_size)
+
+    reference_spans, reference_time = _timed_predict(reference, chunks, labels, threshold, batch_size)
+    candidate_spans, candidate_time = _timed_predict(candidate, chunks, labels, threshold, batch_size)
+
+    matched = expected = predicted = 0
+    for ref, cand in zip(reference_spans, candidate_spans):
+        ref_keys = {(e["start"], e["end"], e["label"]) for e in ref}
+        cand_keys = {(e["start"], e["end"], e["label"]) for e in cand}
+        matched += len(ref_keys & cand_keys)
+        expected += len(ref_keys)
+        predicted += len(cand_keys)
+
+    precision = matched / predicted if predicted else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "chunks": len(chunks),
+        "reference_spans": expected,
+        "candidate_spans": predicted,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        "reference_seconds": round(reference_time, 3),
+        "candidate_seconds": round(candidate_time, 3),
+        "speedup": round(reference_time / candidate_time, 2) if candidate_time else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сверка ONNX-бэкенда GLiNER с torch-бэкендом")
+    parser.add_argument("files", nargs="+", type=Path, help="Текстовые файлы для сверки")
+    parser.add_argument("--labels", nargs="+", required=True)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--no-quantize", action="store_true", help="Сравнивать fp32 ONNX вместо int8")
+    args = parser.parse_args()
+
+    texts = [path.read_text(encoding="utf-8") for path in args.files]
+    reference = GlinerAnonymizer(args.model)
+    candidate = GlinerOnnxAnonymizer(args.model, quantize=not args.no_quantize)
+    report = compare(reference, candidate, texts, args.labels, args.threshold, args.batch_size)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Лемматизация сущностей для фильтра exclude_lemmas.
+
+Текст сущности разбивается на слова, уникальные слова всех сущностей запроса лемматизируются одним пакетом,
+а сущность исключается, если исключена её фраза целиком или (в режиме "any") любое из её слов.
+
+Леммы хранятся в ограниченном по размеру LRU-кэше форма → лемма. Кэш можно сохранить на диск и загрузить
+при старте: так переносится прогретый словарь между перезапусками или подключается индекс, заранее посчитанный
+по словарю предметной области (`python -m src.core.services.anonymizer.lemmas vocabulary.txt index.tsv`).
+"""
+
+import argparse
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from src.core.metrics import register_cache
+from src.settings import LemmaMatch, settings
+
+if TYPE_CHECKING:
+    import pymorphy3
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+(?:-\w+)*")
+
+
+@lru_cache(maxsize=1)
+def _get_morph() -> "pymorphy3.MorphAnalyzer":
+    """Морфоанализатор создаётся при первом обращении: загрузка словарей дорогая и не нужна при импорте."""
+    import pymorphy3
+
+    return pymorphy3.MorphAnalyzer(lang="ru")
+
+
+def words(text: str) -> list[str]:
+    """Слова текста в нижнем регистре."""
+    return _WORD.findall(text.lower())
+
+
+class Lemmatizer:
+    """
+    Лемматизатор с LRU-кэшем форма → лемма. Формы приводятся к нижнему регистру.
+
+    Потокобезопасен: фильтр вызывается и из event loop, и из потоков (пакетная обработка).
+    """
+
+    def __init__(self, maxsize: int = 200_000) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lemmas: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lemmas)
+
+    def lemmatize_many(self, forms: Iterable[str]) -> dict[str, str]:
+        """Леммы уникальных форм; промахи кэша разбираются морфоанализатором и сохраняются в кэш."""
+        result: dict[str, str] = {}
+        missing: list[str] = []
+        with self._lock:
+            for form in forms:
+                if form in result:
+                    continue
+                lemma = self._lemmas.get(form)
+                if lemma is None:
+                    missing.append(form)
+                    result[form] = form
+                    continue
+                self._lemmas.move_to_end(form)
+                result[form] = lemma
+            self.hits += len(result) - len(missing)
+            self.misses += len(missing)
+        if not missing:
+            return result
+
+        # Морфоанализ — вне блокировки: он медленный, а повторный разбор той же формы безвреден
+        morph = _get_morph()
+        parsed = {}
+        for form in missing:
+            variants = morph.parse(form)
+            parsed[form] = variants[0].normal_form.lower() if variants else form
+        result.update(parsed)
+        with self._lock:
+            self._lemmas.update(parsed)
+            self._evict()
+        return result
+
+    def lemmatize(self, form: str) -> str:
+        form = form.lower()
+        return self.lemmatize_many([form])[form]
+
+    def _evict(self) -> None:
+        while self.maxsize and len(self._lemmas) > self.maxsize:
+            self._lemmas.popitem(last=False)
+
+    def load(self, path: str | Path) -> int:
+        """Загружает формы из TSV (форма<TAB>лемма). Загруженные формы считаются давно использованными."""
+        loaded: OrderedDict[str, str] = OrderedDict()
+        with open(path, encoding="utf-8") as index:
+            for line in index:
+                form, _, lemma = line.rstrip("\n").partition("\t")
+                if form and lemma:
+                    loaded[form.lower()] = lemma
+        with self._lock:
+            # Уже кэшированные формы остаются недавними
+            loaded.update(self._lemmas)
+            self._lemmas = loaded
+            self._evict()
+            return len(self._lemmas)
+
+    def save(self, path: str | Path) -> int:
+        """Сохраняет кэш в TSV атомарно, от давно использованных форм к недавним."""
+        path = Path(path)
+        with self._lock:
+            entries = list(self._lemmas.items())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as index:
+            index.writelines(f"{form}\t{lemma}\n" for form, lemma in entries)
+        os.replace(tmp, path)
+        return len(entries)
+
+
+class LemmaMatcher:
+    """
+    Фильтр сущностей по исключённым леммам.
+
+    Исключения тоже лемматизируются, поэтому их можно задавать в любой форме и фразами ("сторона договора").
+    Исходное написание исключения сохраняется как есть — на случай, если лемматизатор изменит уже переданную лемму.
+    """
+
+    def __init__(self, lemmatizer: Lemmatizer, exclude_lemmas: Iterable[str], match: LemmaMatch) -> None:
+        self.lemmatizer = lemmatizer
+        self.match = match
+        exclude_words = [words(entry) for entry in exclude_lemmas]
+        lemmas = lemmatizer.lemmatize_many(word for entry_words in exclude_words for word in entry_words)
+        self.phrases: set[str] = set()
+        for entry_words in exclude_words:
+            self.phrases.add(" ".join(entry_words))
+            self.phrases.add(" ".join(lemmas[word] for word in entry_words))
+        self.phrases.discard("")
+
+    def filter(self, chunk_entities: list[list[dict]]) -> list[list[dict]]:
+        """
+        Сущности чанков без исключённых.
+
+        Решение принимается один раз на уникальный текст сущности, а слова всех сущностей лемматизируются
+        одним пакетом.
+        """
+        if not self.phrases:
+            return chunk_entities
+        texts = {ent["text"] for entities in chunk_entities for ent in entities}
+        entity_words = {text: words(text) for text in texts}
+        lemmas = self.lemmatizer.lemmatize_many(word for ent_words in entity_words.values() for word in ent_words)
+        excluded = {
+            text for text, ent_words in entity_words.items() if self._excluded([lemmas[word] for word in ent_words])
+        }
+        if not excluded:
+            return chunk_entities
+        return [[ent for ent in entities if ent["text"] not in excluded] for entities in chunk_entities]
+
+    def _excluded(self, ent_lemmas: list[str]) -> bool:
+        if " ".join(ent_lemmas) in self.phrases:
+            return True
+        return self.match == LemmaMatch.any and not self.phrases.isdisjoint(ent_lemmas)
+
+
+@lru_cache(maxsize=1)
+def get_lemmatizer() -> Lemmatizer:
+    lemmatizer = Lemmatizer(settings.LEMMA_CACHE_SIZE)
+    if settings.LEMMA_INDEX_PATH and os.path.exists(settings.LEMMA_INDEX_PATH):
+        loaded = lemmatizer.load(settings.LEMMA_INDEX_PATH)
+        logger.info("Loaded %d lemma forms from %s", loaded, settings.LEMMA_INDEX_PATH)
+    register_cache("lemma", lambda: (lemmatizer.hits, lemmatizer.misses))
+    return lemmatizer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Индекс форма → лемма по словарю предметной области")
+    parser.add_argument("vocabulary", type=Path, help="Текстовый файл: слова берутся из всего текста")
+    parser.add_argument("output", type=Path, help="Файл индекса (TSV) для LEMMA_INDEX_PATH")
+    args = parser.parse_args()
+
+    lemmatizer = Lemmatizer(maxsize=0)
+    with open(args.vocabulary, encoding="utf-8") as vocabulary:
+        for line in vocabulary:
+            lemmatizer.lemmatize_many(words(line))
+    print(f"{lemmatizer.save(args.output)} forms written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
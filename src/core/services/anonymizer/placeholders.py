@@ -0,0 +1,48 @@
+import re
+
+_PLACEHOLDER = re.compile(r"\[(.+)_(\d+)\]")
+
+
+class PlaceholderMap:
+    """
+    Назначает плейсхолдеры вида [LABEL_n] в порядке появления сущностей в документе.
+
+    Одна и та же пара (label, исходный текст) всегда получает один и тот же плейсхолдер,
+    поэтому карта может отдаваться частями по мере обработки документа.
+    """
+
+    def __init__(self) -> None:
+        self._placeholders: dict[tuple[str, str], str] = {}
+        self._counters: dict[str, int] = {}
+
+    def get(self, label: str, original_text: str) -> tuple[str, bool]:
+        """Возвращает плейсхолдер и признак того, что он был создан этим вызовом."""
+        key = (label, original_text)
+        placeholder = self._placeholders.get(key)
+        if placeholder is not None:
+            return placeholder, False
+
+        counter = self._counters.get(label, 1)
+        placeholder = f"[{label}_{counter}]"
+        self._placeholders[key] = placeholder
+        self._counters[label] = counter + 1
+        return placeholder, True
+
+    def nested(self) -> dict[str, dict[str, str]]:
+        """Карта вида dict[label, dict[original_text, placeholder]]."""
+        nested_map: dict[str, dict[str, str]] = {}
+        for (label, original_text), placeholder in self._placeholders.items():
+            nested_map.setdefault(label, {})[original_text] = placeholder
+        return nested_map
+
+    def restore(self, nested_map: dict[str, dict[str, str]]) -> None:
+        """Восстанавливает назначения из карты nested() — например, чтобы продолжить прерванную обработку документа."""
+        for label, entries in nested_map.items():
+            for original_text, placeholder in entries.items():
+                self._remember(label, original_text, placeholder)
+
+    def _remember(self, label: str, original_text: str, placeholder: str) -> None:
+        self._placeholders[(label, original_text)] = placeholder
+        match = _PLACEHOLDER.fullmatch(placeholder)
+        if match is not None and match[1] == label:
+            self._counters[label] = max(self._counters.get(label, 1), int(match[2]) + 1)
@@ -0,0 +1,96 @@
+"""
+Постобработка сущностей модели и сборка анонимизированного текста за линейное время.
+
+Сущности чанка переводятся в координаты документа, дубликаты и пересечения разрешаются одним проходом после
+одной сортировки. Чанки не пересекаются и идут по порядку, поэтому отсортированные массивы чанков сливаются
+простой конкатенацией. Текст собирается одним join по срезам исходного текста; карта плейсхолдеров заполняется
+в том же проходе.
+"""
+
+from collections.abc import Iterable
+
+from src.core.services.anonymizer.placeholders import PlaceholderMap
+
+
+def to_document_offsets(text: str, chunk_start: int, entities: list[dict]) -> list[dict]:
+    """Переводит сущности чанка в координаты документа (на месте)."""
+    for ent in entities:
+        ent["start"] += chunk_start
+        ent["end"] += chunk_start
+        ent["text"] = text[ent["start"] : ent["end"]]
+    return entities
+
+
+def _span_order(ent: dict) -> tuple[int, int, float]:
+    # Раньше начало, затем длиннее, затем выше score
+    return ent["start"], -ent["end"], -ent.get("score", 0.0)
+
+
+def _is_resolved(entities: list[dict]) -> bool:
+    """Сущности уже отсортированы и не пересекаются — обычный случай для выхода модели по одному чанку."""
+    last_end = -1
+    for ent in entities:
+        if ent["start"] < last_end or ent["start"] >= ent["end"]:
+            return False
+        last_end = ent["end"]
+    return True
+
+
+def resolve_spans(entities: list[dict]) -> list[dict]:
+    """
+    Убирает дубликаты и пересечения; результат отсортирован по start.
+
+    Из сущностей с одинаковым диапазоном остаётся сущность с наибольшим score (при равенстве — первая),
+    из пересекающихся — начинающаяся раньше, а при равном начале — более длинная.
+    """
+    if len(entities) < 2 or _is_resolved(entities):
+        return entities
+    resolved = []
+    last_start = last_end = -1
+    # Сортировка устойчива: при равном score остаётся сущность, пришедшая первой
+    for ent in sorted(entities, key=_span_order):
+        start, end = ent["start"], ent["end"]
+        # Точный повтор проверяется отдельно только ради сущностей нулевой длины
+        if start >= last_end and (start != last_start or end != last_end):
+            resolved.append(ent)
+            last_start, last_end = start, end
+    return resolved
+
+
+def merge_chunk_spans(chunk_entities: Iterable[list[dict]]) -> list[dict]:
+    """Сущности всех чанков в порядке документа, без дубликатов и пересечений."""
+    merged: list[dict] = []
+    for entities in chunk_entities:
+        merged.extend(resolve_spans(entities))
+    return merged
+
+
+def render(
+    text: str,
+    start: int,
+    end: int,
+    entities: list[dict],
+    placeholders: PlaceholderMap,
+    new_entries: dict[str, dict[str, str]],
+) -> str:
+    """
+    Собирает анонимизированный фрагмент text[start:end] одним join по срезам.
+
+    entities — отсортированные и непересекающиеся сущности внутри фрагмента. Плейсхолдеры, впервые назначенные
+    в этом фрагменте, добавляются в `new_entries`.
+    """
+    pieces: list[str] = []
+    append = pieces.append
+    get_placeholder = placeholders.get
+    cursor = start
+    for ent in entities:
+        label = ent["label"]
+        original_text = ent["text"]
+        placeholder, is_new = get_placeholder(label, original_text)
+        if is_new:
+            new_entries.setdefault(label, {})[original_text] = placeholder
+        append(text[cursor : ent["start"]])
+        append(placeholder)
+        cursor = ent["end"]
+    append(text[cursor:end])
+    return "".join(pieces)
@@ -0,0 +1,220 @@
+"""
+Реестр загруженных моделей с бюджетом памяти и маршрутизация запросов между моделями.
+
+Реестр держит несколько анонимизаторов (модель + бэкенд) и при превышении бюджета выгружает
+давно не использовавшиеся. Маршрутизатор выбирает модель для запроса: явно указанную клиентом
+или по политике (короткие тексты без чувствительных меток — на малую модель, остальное — на основную).
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from src.core.metrics import LOADED_MODEL_BYTES, MODEL_EVICTIONS, MODEL_ROUTED
+from src.core.services.anonymizer.base import Anonymizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALIAS = "default"
+
+ModelKey = tuple[str, str]  # (бэкенд, имя модели)
+
+
+class UnknownModelError(LookupError):
+    """Клиент запросил модель, которой нет в списке разрешённых."""
+
+
+def _resident_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _model_bytes(anonymizer: Any) -> int | None:
+    """Размер весов torch-модели; None, если модель не torch (например, ONNX Runtime)."""
+    model = getattr(anonymizer, "model", None)
+    parameters = getattr(model, "parameters", None)
+    buffers = getattr(model, "buffers", None)
+    if parameters is None or buffers is None:
+        return None
+    try:
+        return sum(t.numel() * t.element_size() for t in (*parameters(), *buffers()))
+    except (TypeError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """
+    LRU-реестр анонимизаторов с бюджетом памяти.
+
+    Размер модели — объём весов torch, а для остальных бэкендов — прирост RSS процесса при загрузке.
+    Модель, загруженная последней, не выгружается, даже если одна не помещается в бюджет.
+    """
+
+    def __init__(self, loader: Callable[[str, str], Anonymizer], budget_bytes: int = 0) -> None:
+        """
+        :param loader: Создаёт анонимизатор по (бэкенд, имя модели).
+        :param budget_bytes: Бюджет памяти на все модели; 0 — без ограничения.
+        """
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self._models: OrderedDict[ModelKey, tuple[Anonymizer, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> dict[ModelKey, int]:
+        """Загруженные модели и их размер в байтах, от давно использованной к недавней."""
+        return {key: size for key, (_, size) in self._models.items()}
+
+    def get_loaded(self, backend: str, model: str) -> Anonymizer | None:
+        """Уже загруженный анонимизатор без ожидания блокировки (для event loop); None — модель не загружена."""
+        key = (backend, model)
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        # Блокировку держит поток, загружающий модель (и, возможно, перебирающий реестр при выгрузке), — тогда
+        # отметка об использовании пропускается: event loop не ждёт загрузку, а порядок LRU лишь чуть неточен
+        if self._lock.acquire(blocking=False):
+            try:
+                self._models.move_to_end(key)
+            except KeyError:
+                # Модель выгрузили параллельно — запрос дорабатывает на полученном экземпляре
+                pass
+            finally:
+                self._lock.release()
+        return entry[0]
+
+    def get(self, backend: str, model: str) -> Anonymizer:
+        key = (backend, model)
+        # Загрузка под общей блокировкой: параллельный запрос должен дождаться модели, а не грузить вторую копию
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry[0]
+
+            rss_before = _resident_bytes()
+            anonymizer = self.loader(backend, model)
+            size = _model_bytes(anonymizer)
+            if size is None:
+                size = max(0, _resident_bytes() - rss_before)
+            self._models[key] = (anonymizer, size)
+            LOADED_MODEL_BYTES.labels(backend, model).set(size)
+            logger.info("Loaded model %s (%s), %.0f MB", model, backend, size / 2**20)
+            self._evict()
+            return anonymizer
+
+    def _evict(self) -> None:
+        if not self.budget_bytes:
+            return
+        evicted = False
+        while len(self._models) > 1 and sum(size for _, size in self._models.values()) > self.budget_bytes:
+            (backend, model), (anonymizer, size) = self._models.popitem(last=False)
+            self._release(anonymizer)
+            LOADED_MODEL_BYTES.remove(backend, model)
+            MODEL_EVICTIONS.labels(backend, model).inc()
+            logger.info("Evicted model %s (%s), %.0f MB", model, backend, size / 2**20)
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    @staticmethod
+    def _release(anonymizer: Anonymizer) -> None:
+        # Фоновые ресурсы освобождаются, когда батчер разберёт уже принятые чанки: запросы, успевшие поставить
+        # чанки в очередь, дорабатывают
+        batcher = getattr(anonymizer, "batcher", None)
+        if batcher is not None:
+            executor = batcher.executor
+            batcher.close_threadsafe(executor.shutdown)
+
+    def clear(self) -> None:
+        with self._lock:
+            for (backend, model), (anonymizer, _) in self._models.items():
+                self._release(anonymizer)
+                LOADED_MODEL_BYTES.remove(backend, model)
+            self._models.clear()
+
+
+class AnonymizerResolver(Protocol):
+    async def resolve(self, model: str | None, text_length: int, labels: list[str]) -> Anonymizer: ...
+
+
+class ModelRouter:
+    """
+    Выбор модели для запроса.
+
+    - Клиент указал модель (псевдоним из `models`) — используется она.
+    - Иначе, если задана малая модель: тексты не длиннее `short_text_chars` без меток из `sensitive_labels`
+      идут на неё.
+    - Остальное — на модель по умолчанию.
+
+    Каждое решение учитывается в метрике maskara_model_routed_total с причиной выбора.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        backend: str,
+        models: dict[str, str],
+        short_model: str | None = None,
+        short_text_chars: int = 0,
+        sensitive_labels: list[str] | None = None,
+    ) -> None:
+        """
+        :param models: Псевдоним → имя модели; обязателен псевдоним DEFAULT_ALIAS.
+        """
+        if DEFAULT_ALIAS not in models:
+            raise ValueError(f"Model alias {DEFAULT_ALIAS!r} is required")
+        if short_model is not None and short_model not in models:
+            raise ValueError(f"Unknown short model alias: {short_model}")
+        self.registry = registry
+        self.backend = backend
+        self.models = models
+        self.short_model = short_model
+        self.short_text_chars = short_text_chars
+        self.sensitive_labels = {label.strip().lower() for label in sensitive_labels or []}
+
+    def route(self, model: str | None, text_length: int, labels: list[str]) -> tuple[str, str]:
+        """Возвращает (псевдоним модели, причина выбора)."""
+        if model is not None:
+            if model not in self.models:
+                raise UnknownModelError(f"Unknown model {model!r}, available: {', '.join(sorted(self.models))}")
+            return model, "requested"
+        if self.short_model is not None and text_length <= self.short_text_chars:
+            if self.sensitive_labels.isdisjoint(label.strip().lower() for label in labels):
+                return self.short_model, "short_text"
+            return DEFAULT_ALIAS, "sensitive_labels"
+        return DEFAULT_ALIAS, "default"
+
+    def get(self, alias: str = DEFAULT_ALIAS) -> Anonymizer:
+        return self.registry.get(self.backend, self.models[alias])
+
+    async def resolve(self, model: str | None, text_length: int, labels: list[str]) -> Anonymizer:
+        alias, reason = self.route(model, text_length, labels)
+        MODEL_ROUTED.labels(alias, reason).inc()
+        logger.debug("Routed request (%d chars) to model %r: %s", text_length, alias, reason)
+        anonymizer = self.registry.get_loaded(self.backend, self.models[alias])
+        if anonymizer is not None:
+            return anonymizer
+        return await asyncio.to_thread(self.get, alias)
+
+    def preload_aliases(self) -> list[str]:
+        """Модели, которые стоит загрузить и прогреть при старте."""
+        return [DEFAULT_ALIAS] + ([self.short_model] if self.short_model not in (None, DEFAULT_ALIAS) else [])
+
+
+class SingleAnonymizerResolver:
+    """Все запросы — на один заранее созданный анонимизатор (бенчмарки, встраивание как библиотеки)."""
+
+    def __init__(self, anonymizer: Anonymizer) -> None:
+        self.anonymizer = anonymizer
+
+    async def resolve(self, model: str | None, text_length: int, labels: list[str]) -> Anonymizer:
+        return self.anonymizer
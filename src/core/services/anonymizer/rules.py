@@ -0,0 +1,174 @@
+"""
+Быстрые детекторы структурированных ПДн (телефон, email, ИНН, СНИЛС, паспорт, банковская карта, IBAN).
+
+Все активные правила собраны в одно регулярное выражение, поэтому текст сканируется один раз.
+Кандидаты с контрольной суммой (ИНН, СНИЛС, карта, IBAN) дополнительно проверяются,
+что точнее, чем предсказание нейросети для таких меток, поэтому модель эти метки не ищет.
+Шаблоны телефона, email и паспорта покрывают не все форматы записи — такие метки ищет и модель,
+а находки правил добавляются к её результатам.
+"""
+
+import re
+from collections.abc import Callable
+from functools import lru_cache
+
+from src.core.metrics import RULE_HITS
+
+RULE_SCORE = 1.0
+
+_PATTERNS: dict[str, str] = {
+    "email": r"(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-zА-Яа-я]{2,}(?![\w-])",
+    "iban": r"(?<![A-Z0-9])[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,4})?(?![A-Z0-9])",
+    "bank_card": r"(?<![\d-])\d{4}(?:[ -]?\d{4}){2}[ -]?\d{4}(?:[ -]?\d{1,3})?(?![\d-])",
+    "snils": r"(?<![\d-])(?:\d{3}-\d{3}-\d{3}[ -]\d{2}|\d{11})(?![\d-])",
+    "phone": r"(?<![\w+])(?:\+7|8)[ -]?\(?\d{3}\)?[ -]?\d{3}[ -]?\d{2}[ -]?\d{2}(?!\d)",
+    "passport": r"(?<!\d)\d{2} ?\d{2} №? ?\d{6}(?!\d)",
+    "inn": r"(?<!\d)(?:\d{12}|\d{10})(?!\d)",
+}
+
+DEFAULT_ALIASES: dict[str, list[str]] = {
+    "phone": ["phone", "phone number", "telephone", "mobile phone number", "телефон", "номер телефона"],
+    "email": ["email", "e-mail", "email address", "электронная почта"],
+    "inn": ["inn", "инн", "taxpayer identification number"],
+    "snils": ["snils", "снилс"],
+    "passport": ["passport", "passport number", "паспорт", "номер паспорта", "паспортные данные"],
+    "bank_card": ["bank card", "credit card", "credit card number", "card number", "банковская карта", "номер карты"],
+    "iban": ["iban"],
+}
+
+
+def _digits(value: str) -> list[int]:
+    return [int(c) for c in value if c.isdigit()]
+
+
+def _valid_inn(value: str) -> bool:
+    digits = _digits(value)
+
+    def check(weights: tuple[int, ...]) -> int:
+        return sum(w * d for w, d in zip(weights, digits)) % 11 % 10
+
+    if len(digits) == 10:
+        return check((2, 4, 10, 3, 5, 9, 4, 6, 8)) == digits[9]
+    if len(digits) == 12:
+        return (
+            check((7, 2, 4, 10, 3, 5, 9, 4, 6, 8)) == digits[10]
+            and check((3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)) == digits[11]
+        )
+    return False
+
+
+def _valid_snils(value: str) -> bool:
+    digits = _digits(value)
+    if len(digits) != 11:
+        return False
+    total = sum(d * (9 - i) for i, d in enumerate(digits[:9]))
+    control = total % 101 % 100
+    return control == digits[9] * 10 + digits[10]
+
+
+def _valid_luhn(value: str) -> bool:
+    digits = _digits(value)
+    if not 13 <= len(digits) <= 19:
+        return False
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def _valid_iban(value: str) -> bool:
+    compact = value.replace(" ", "")
+    if not 15 <= len(compact) <= 34:
+        return False
+    rearranged = compact[4:] + compact[:4]
+    return int("".join(str(int(c, 36)) for c in rearranged)) % 97 == 1
+
+
+_VALIDATORS: dict[str, Callable[[str], bool]] = {
+    "inn": _valid_inn,
+    "snils": _valid_snils,
+    "bank_card": _valid_luhn,
+    "iban": _valid_iban,
+}
+
+
+@lru_cache(maxsize=128)
+def _compile(rules: frozenset[str]) -> re.Pattern:
+    # Порядок альтернатив важен: более специфичные правила идут первыми
+    return re.compile("|".join(f"(?P<{rule}>{pattern})" for rule, pattern in _PATTERNS.items() if rule in rules))
+
+
+@lru_cache(maxsize=128)
+def _compile_single(rule: str) -> re.Pattern:
+    return re.compile(_PATTERNS[rule])
+
+
+class RuleDetector:
+    """Находит структурированные ПДн для меток, покрытых правилами, за один проход по тексту."""
+
+    def __init__(self, aliases: dict[str, list[str]] | None = None) -> None:
+        self._label_to_rule: dict[str, str] = {}
+        for rule, names in {**DEFAULT_ALIASES, **(aliases or {})}.items():
+            if rule not in _PATTERNS:
+                raise ValueError(f"Unknown rule detector: {rule}")
+            for name in names:
+                self._label_to_rule[name.strip().lower()] = rule
+
+    def split_labels(self, labels: list[str]) -> tuple[dict[str, str], list[str]]:
+        """
+        Делит метки запроса на покрытые правилами и метки для модели.
+
+        Из промпта модели убираются только метки правил с контрольной суммой: для остальных шаблон
+        может пропустить формат записи, и модель ищет их наравне с правилом.
+
+        :return: {правило: метка запроса} и список меток для модели.
+        """
+        rule_labels: dict[str, str] = {}
+        model_labels = []
+        for label in labels:
+            rule = self._label_to_rule.get(label.strip().lower())
+            if rule is not None:
+                rule_labels.setdefault(rule, label)
+            if rule not in _VALIDATORS:
+                model_labels.append(label)
+        return rule_labels, model_labels
+
+    @staticmethod
+    def detect(text: str, rule_labels: dict[str, str]) -> list[dict]:
+        """Сущности в формате GLiNER (start, end, text, label, score) для активных правил."""
+        if not rule_labels:
+            return []
+        entities = []
+        for match in _compile(frozenset(rule_labels)).finditer(text):
+            rule = match.lastgroup
+            value = match.group()
+            validator = _VALIDATORS.get(rule)
+            if validator is not None and not validator(value):
+                # Кандидат не прошёл проверку — он может подходить под другое правило той же длины
+                rule = next(
+                    (
+                        other
+                        for other in rule_labels
+                        if other != rule
+                        and _compile_single(other).fullmatch(value)
+                        and (other not in _VALIDATORS or _VALIDATORS[other](value))
+                    ),
+                    None,
+                )
+                if rule is None:
+                    continue
+            RULE_HITS.labels(rule).inc()
+            entities.append(
+                {
+                    "start": match.start(),
+                    "end": match.end(),
+                    "text": value,
+                    "label": rule_labels[rule],
+                    "score": RULE_SCORE,
+                }
+            )
+        return entities
@@ -4,3 +4,10 @@ from pydantic import BaseModel
 class AnonymizationResult(BaseModel):
     text: str
     map: dict[str, dict[str, str]]
+
+
+class AnonymizationSegment(BaseModel):
+    """Очередной фрагмент потоковой анонимизации и новые записи карты, появившиеся в нём."""
+
+    text: str
+    map: dict[str, dict[str, str]]
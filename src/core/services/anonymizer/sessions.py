@@ -0,0 +1,186 @@
+"""
+Сессии инкрементальной анонимизации потокового текста (чат, ответ LLM, приходящий токенами).
+
+Сессия хранит состояние между сообщениями: ещё не финализированный хвост текста, небольшой левый контекст
+из уже финализированного текста и карту плейсхолдеров. Модель каждый раз видит только контекст и хвост,
+поэтому работа на сообщение не растёт с длиной разговора, а плейсхолдеры остаются согласованными во всей сессии.
+
+Хранилище держит сессии в памяти процесса (LRU) с бюджетом памяти и сроком простоя: сессии без подключённого
+клиента, простаивающие дольше срока или не помещающиеся в бюджет, удаляются.
+"""
+
+import asyncio
+import re
+import sys
+import time
+import uuid
+from collections import OrderedDict
+
+from src.core.metrics import SESSION_BYTES, SESSION_EVICTIONS, SESSIONS
+from src.core.services.anonymizer.fakes import FakeValueMap, get_fake_pools
+from src.core.services.anonymizer.placeholders import PlaceholderMap
+
+# Предпочтительная граница финализации — конец предложения или строки, иначе — пробел
+_SENTENCE_END = re.compile(r"[.!?…;:]\s+|\n")
+_WHITESPACE = re.compile(r"\s+")
+# Накладные расходы словарей карты на одну запись и объекта сессии (оценка)
+_MAP_ENTRY_OVERHEAD = 200
+_SESSION_OVERHEAD = 2000
+
+
+def commit_boundary(text: str, limit: int, entities: list[dict]) -> int:
+    """
+    Позиция в text (не дальше limit), до которой текст можно финализировать.
+
+    Граница не разрезает сущность: если она попадает внутрь сущности, то сдвигается к её началу.
+    Текст без пробелов длиной больше limit режется по limit, чтобы хвост сессии не рос неограниченно.
+    """
+    boundary = limit
+    for pattern in (_SENTENCE_END, _WHITESPACE):
+        ends = [match.end() for match in pattern.finditer(text, 0, limit)]
+        if ends:
+            boundary = ends[-1]
+            break
+    for ent in entities:
+        if ent["start"] < boundary < ent["end"]:
+            boundary = ent["start"]
+    return boundary
+
+
+class IncrementalSession:
+    """
+    Состояние одной сессии. Сообщения сессии обрабатываются по очереди (lock).
+
+    pending — хвост, который ещё может измениться с приходом следующего текста (сущность может продолжиться);
+    context — конец финализированного текста, подаётся модели слева от хвоста, но повторно не выдаётся.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str],
+        use_fake: bool = False,
+        model: str | None = None,
+    ) -> None:
+        self.id = session_id
+        self.labels = labels
+        self.threshold = threshold
+        self.exclude_lemmas = exclude_lemmas
+        self.model = model
+        self.placeholders = FakeValueMap(get_fake_pools()) if use_fake else PlaceholderMap()
+        self.pending = ""
+        self.context = ""
+        self.committed_chars = 0
+        self.map_bytes = 0
+        self.connections = 0
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def commit(self, length: int, new_entries: dict[str, dict[str, str]], context_chars: int) -> None:
+        """Финализирует первые length символов хвоста; new_entries — записи карты, впервые выданные в них."""
+        committed = self.pending[:length]
+        self.pending = self.pending[length:]
+        self.context = (self.context + committed)[-context_chars:] if context_chars else ""
+        self.committed_chars += length
+        for entries in new_entries.values():
+            for original_text, placeholder in entries.items():
+                self.map_bytes += sys.getsizeof(original_text) + sys.getsizeof(placeholder) + _MAP_ENTRY_OVERHEAD
+
+    @property
+    def size(self) -> int:
+        """Приблизительный объём памяти сессии в байтах."""
+        return sys.getsizeof(self.pending) + sys.getsizeof(self.context) + self.map_bytes + _SESSION_OVERHEAD
+
+
+class SessionNotFoundError(LookupError):
+    """Сессии нет: не создавалась, удалена по сроку простоя или вытеснена из-за бюджета памяти."""
+
+
+class SessionStore:
+    """
+    Сессии процесса в порядке последнего использования.
+
+    Вытесняются только сессии без подключённого клиента: сначала простаивающие дольше idle_seconds,
+    затем давно не использованные, пока суммарный объём больше бюджета.
+    """
+
+    def __init__(self, budget_bytes: int = 0, idle_seconds: float = 0.0) -> None:
+        """
+        :param budget_bytes: Бюджет памяти на все сессии; 0 — без ограничения.
+        :param idle_seconds: Срок простоя сессии без клиента; 0 — без ограничения.
+        """
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions: OrderedDict[str, IncrementalSession] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._total = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(
+        self,
+        labels: list[str],
+        threshold: float,
+        exclude_lemmas: set[str],
+        use_fake: bool = False,
+        model: str | None = None,
+    ) -> IncrementalSession:
+        session = IncrementalSession(uuid.uuid4().hex, labels, threshold, exclude_lemmas, use_fake, model)
+        self._sessions[session.id] = session
+        self.touch(session)
+        return session
+
+    def get(self, session_id: str) -> IncrementalSession:
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Session {session_id} not found or expired")
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def touch(self, session: IncrementalSession) -> None:
+        """Отмечает использование сессии и пересчитывает её объём после очередного сообщения."""
+        if session.id not in self._sessions:
+            # Сессия удалена, пока обрабатывалось сообщение, — обратно не добавляется
+            return
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session.id)
+        size = session.size
+        self._total += size - self._sizes.get(session.id, 0)
+        self._sizes[session.id] = size
+        self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._total -= self._sizes.pop(session_id, 0)
+        self._publish()
+        return True
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        total = self._total
+        victims: list[tuple[str, str]] = []
+        for session_id, session in self._sessions.items():
+            over_budget = self.budget_bytes and total > self.budget_bytes
+            idle = self.idle_seconds and now - session.last_used > self.idle_seconds
+            if not over_budget and not idle:
+                # Дальше — сессии, использованные ещё позже
+                break
+            if session.connections:
+                continue
+            victims.append((session_id, "budget" if over_budget else "idle"))
+            total -= self._sizes.get(session_id, 0)
+        for session_id, reason in victims:
+            self.delete(session_id)
+            SESSION_EVICTIONS.labels(reason).inc()
+        self._publish()
+
+    def _publish(self) -> None:
+        SESSIONS.set(len(self._sessions))
+        SESSION_BYTES.set(self._total)
@@ -0,0 +1,147 @@
+"""
+Извлечение текста из загруженных документов (TXT, DOCX, PDF) по разделам.
+
+Файл читается с диска последовательно: PDF — по страницам, DOCX — по абзацам, TXT — по строкам, и текст отдаётся
+разделами примерно по `section_chars` символов, не разрывая абзацы. Документ целиком в памяти не держится —
+каждый раздел можно отправлять на анонимизацию сразу, пока извлекается следующий.
+"""
+
+import asyncio
+import io
+import zipfile
+from collections.abc import AsyncIterator, Iterator
+from enum import StrEnum
+from typing import BinaryIO
+from xml.etree.ElementTree import iterparse
+
+PDF_PAGE_BREAK = "\f"
+
+_DOCX_BODY = "word/document.xml"
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_SNIFF_BYTES = 4096
+
+
+class DocumentError(ValueError):
+    """Документ не удалось прочитать: повреждён, зашифрован или не соответствует формату."""
+
+
+class UnsupportedDocumentError(DocumentError):
+    """Формат документа не поддерживается."""
+
+
+class DocumentFormat(StrEnum):
+    txt = "txt"
+    docx = "docx"
+    pdf = "pdf"
+
+    @classmethod
+    def detect(cls, file: BinaryIO, filename: str | None = None) -> "DocumentFormat":
+        """Определяет формат по сигнатуре файла; расширение имени используется только в сообщении об ошибке."""
+        head = file.read(_SNIFF_BYTES)
+        file.seek(0)
+        if head.startswith(b"%PDF-"):
+            return cls.pdf
+        if head.startswith(b"PK\x03\x04"):
+            try:
+                with zipfile.ZipFile(file) as archive:
+                    is_docx = _DOCX_BODY in archive.namelist()
+            except zipfile.BadZipFile:
+                is_docx = False
+            finally:
+                file.seek(0)
+            if is_docx:
+                return cls.docx
+        elif b"\x00" not in head:
+            return cls.txt
+        raise UnsupportedDocumentError(f"Unsupported document {filename or ''!r}: expected TXT (UTF-8), DOCX or PDF")
+
+
+def _group(parts: Iterator[str], section_chars: int) -> Iterator[str]:
+    """Склеивает абзацы в разделы не короче section_chars (кроме последнего)."""
+    buffer: list[str] = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= section_chars:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _txt_lines(file: BinaryIO, section_chars: int) -> Iterator[str]:
+    reader = io.TextIOWrapper(file, encoding="utf-8", errors="replace", newline="")
+    carry = ""
+    try:
+        while line := reader.readline(section_chars):
+            line = carry + line
+            carry = ""
+            if not line.endswith(("\n", "\r")):
+                # Строка длиннее раздела — режем по последнему пробелу, чтобы не разорвать слово
+                cut = max(line.rfind(" "), line.rfind("\t")) + 1
+                if cut:
+                    line, carry = line[:cut], line[cut:]
+            yield line
+        if carry:
+            yield carry
+    finally:
+        # Файл принадлежит вызывающей стороне — обёртка не должна его закрывать
+        reader.detach()
+
+
+def _docx_paragraphs(file: BinaryIO) -> Iterator[str]:
+    with zipfile.ZipFile(file) as archive, archive.open(_DOCX_BODY) as body:
+        pieces: list[str] = []
+        for event, element in iterparse(body, events=("end",)):
+            tag = element.tag
+            if tag == f"{_W}t":
+                pieces.append(element.text or "")
+            elif tag == f"{_W}tab":
+                pieces.append("\t")
+            elif tag in (f"{_W}br", f"{_W}cr"):
+                pieces.append("\n")
+            elif tag == f"{_W}p":
+                pieces.append("\n")
+                yield "".join(pieces)
+                pieces = []
+                element.clear()
+
+
+def _pdf_pages(file: BinaryIO) -> Iterator[str]:
+    try:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+    except ImportError:
+        raise UnsupportedDocumentError("PDF support requires pdfminer.six") from None
+
+    for page in extract_pages(file):
+        yield "".join(element.get_text() for element in page if isinstance(element, LTTextContainer)) + PDF_PAGE_BREAK
+
+
+def iter_sections(file: BinaryIO, document_format: DocumentFormat, section_chars: int) -> Iterator[str]:
+    """
+    Разделы текста документа по порядку. Склейка разделов — полный текст документа.
+
+    Страница PDF — отдельный раздел (страницы разделяются символом \\f).
+    """
+    if document_format == DocumentFormat.pdf:
+        return _pdf_pages(file)
+    if document_format == DocumentFormat.docx:
+        return _group(_docx_paragraphs(file), section_chars)
+    return _group(_txt_lines(file, section_chars), section_chars)
+
+
+async def extract_sections(file: BinaryIO, document_format: DocumentFormat, section_chars: int) -> AsyncIterator[str]:
+    """Асинхронный вариант iter_sections: разбор файла идёт в потоке, event loop не блокируется."""
+    sections = iter_sections(file, document_format, section_chars)
+    while True:
+        try:
+            section = await asyncio.to_thread(next, sections, None)
+        except DocumentError:
+            raise
+        except Exception as exc:
+            raise DocumentError(f"Failed to read {document_format} document: {exc}") from exc
+        if section is None:
+            return
+        yield section
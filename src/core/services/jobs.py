@@ -0,0 +1,238 @@
+"""
+Локальная персистентная очередь заданий на анонимизацию больших документов.
+
+Задания, их прогресс и результаты хранятся в sqlite (режим WAL) рядом с исходными файлами, без внешнего брокера.
+Воркер забирает задание с арендой (lease) и по мере обработки сохраняет результат каждого раздела документа;
+если процесс упал, после истечения аренды задание забирает другой воркер и продолжает с первого
+несохранённого раздела. Завершённые задания хранятся `result_ttl` секунд.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import BinaryIO
+
+
+class JobStatus(StrEnum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+@dataclass(frozen=True, slots=True)
+class JobRecord:
+    id: str
+    status: JobStatus
+    filename: str | None
+    options: str  # JSON параметров анонимизации
+    size: int
+    attempts: int
+    sections_done: int
+    error: str | None
+    created: float
+    updated: float
+    expires: float | None
+
+
+class JobStore:
+    """
+    Хранилище заданий. Методы синхронные — из event loop их вызывают через asyncio.to_thread.
+
+    Несколько процессов (pre-fork) могут работать с одним каталогом: задание забирается атомарным UPDATE,
+    а аренда продлевается при сохранении каждого раздела.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "jobs.sqlite3"
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Соединение sqlite нельзя наследовать через fork — каждый процесс открывает своё
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, options TEXT NOT NULL, size INTEGER NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, sections_done INTEGER NOT NULL DEFAULT 0, error TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL, lease_until REAL, expires REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_segments ("
+            "job_id TEXT NOT NULL, seq INTEGER NOT NULL, text TEXT NOT NULL, map TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, seq))"
+        )
+        conn.commit()
+        return conn
+
+    def input_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.input"
+
+    def create(self, source: BinaryIO, filename: str | None, options: str) -> str:
+        """Копирует документ в каталог заданий и ставит задание в очередь."""
+        job_id = uuid.uuid4().hex
+        path = self.input_path(job_id)
+        with open(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, filename, options, size, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JobStatus.queued, filename, options, path.stat().st_size, now, now),
+            )
+            self.conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> JobRecord | None:
+        """Задание по id; None — нет такого или срок хранения результата истёк."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, status, filename, options, size, attempts, sections_done, error, created, updated, expires "
+                "FROM jobs WHERE id = ? AND (expires IS NULL OR expires > ?)",
+                (job_id, time.time()),
+            ).fetchone()
+        return self._record(row) if row else None
+
+    @staticmethod
+    def _record(row: tuple) -> JobRecord:
+        return JobRecord(row[0], JobStatus(row[1]), *row[2:])
+
+    def claim(self, lease_seconds: float) -> JobRecord | None:
+        """
+        Забирает самое старое задание из очереди или задание, аренда которого истекла (воркер упал).
+
+        Счётчик попыток увеличивается при каждом взятии.
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY created LIMIT 1) "
+                "RETURNING id, status, filename, options, size, attempts, sections_done, error, created, updated, "
+                "expires",
+                (JobStatus.running, now + lease_seconds, now, JobStatus.queued, JobStatus.running, now),
+            ).fetchone()
+            self.conn.commit()
+        return self._record(row) if row else None
+
+    def progress(self, job_id: str) -> tuple[int, dict[str, dict[str, str]]]:
+        """Количество сохранённых разделов и общая карта по ним — для продолжения обработки."""
+        with self._lock:
+            rows = self.conn.execute("SELECT map FROM job_segments WHERE job_id = ? ORDER BY seq", (job_id,)).fetchall()
+        anonymization_map: dict[str, dict[str, str]] = {}
+        for (entries,) in rows:
+            for label, values in json.loads(entries).items():
+                anonymization_map.setdefault(label, {}).update(values)
+        return len(rows), anonymization_map
+
+    def append_segment(
+        self,
+        job: JobRecord,
+        seq: int,
+        text: str,
+        anonymization_map: dict[str, dict[str, str]],
+        lease_seconds: float,
+    ) -> bool:
+        """
+        Сохраняет результат раздела и продлевает аренду.
+
+        Номер попытки служит меткой владельца: воркер, у которого задание перехватили после истечения аренды,
+        записать результат уже не сможет.
+
+        :return: False, если задание удалено или перехвачено другим воркером — обработку нужно прекратить.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            updated = conn.execute(
+                "UPDATE jobs SET sections_done = ?, lease_until = ?, updated = ? "
+                "WHERE id = ? AND status = ? AND attempts = ? AND sections_done = ?",
+                (seq + 1, now + lease_seconds, now, job.id, JobStatus.running, job.attempts, seq),
+            ).rowcount
+            if updated:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_segments (job_id, seq, text, map) VALUES (?, ?, ?, ?)",
+                    (job.id, seq, text, json.dumps(anonymization_map, ensure_ascii=False)),
+                )
+            conn.commit()
+        return bool(updated)
+
+    def segments(self, job_id: str, start: int = 0, limit: int = -1) -> list[tuple[str, dict[str, dict[str, str]]]]:
+        """Результаты разделов по порядку: (анонимизированный текст, новые записи карты)."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT text, map FROM job_segments WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, start, limit),
+            ).fetchall()
+        return [(text, json.loads(entries)) for text, entries in rows]
+
+    def release(self, job: JobRecord) -> None:
+        """Возвращает задание в очередь (например, при перегрузке), не засчитывая попытку."""
+        self._finish(job, JobStatus.queued, None, None, "attempts = attempts - 1, ")
+
+    def complete(self, job: JobRecord, result_ttl: float) -> None:
+        self._finish(job, JobStatus.done, None, time.time() + result_ttl)
+        self.input_path(job.id).unlink(missing_ok=True)
+
+    def fail(self, job: JobRecord, error: str, result_ttl: float) -> None:
+        self._finish(job, JobStatus.failed, error, time.time() + result_ttl)
+        self.input_path(job.id).unlink(missing_ok=True)
+
+    def _finish(
+        self, job: JobRecord, status: JobStatus, error: str | None, expires: float | None, extra: str = ""
+    ) -> None:
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE jobs SET {extra}status = ?, error = ?, expires = ?, lease_until = NULL, updated = ? "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (status, error, expires, time.time(), job.id, JobStatus.running, job.attempts),
+            )
+            self.conn.commit()
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            self.conn.execute("DELETE FROM job_segments WHERE job_id = ?", (job_id,))
+            self.conn.commit()
+        self.input_path(job_id).unlink(missing_ok=True)
+        return bool(deleted)
+
+    def purge_expired(self) -> int:
+        """Удаляет задания с истёкшим сроком хранения результата."""
+        with self._lock:
+            expired = [
+                job_id
+                for (job_id,) in self.conn.execute(
+                    "SELECT id FROM jobs WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)
+                )
+            ]
+        for job_id in expired:
+            self.delete(job_id)
+        return len(expired)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
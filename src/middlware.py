@@ -5,6 +5,8 @@
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
+from .core.middlware.admission import AdmissionMiddleware
+from .core.middlware.server_timing import ServerTimingMiddleware
 from .settings import settings
 
 
@@ -19,4 +21,7 @@ def apply_middleware(app: FastAPI) -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(AdmissionMiddleware, default_timeout=settings.REQUEST_TIMEOUT_SECONDS)  # type: ignore
+    if settings.SERVER_TIMING:
+        app.add_middleware(ServerTimingMiddleware)  # type: ignore
     return app
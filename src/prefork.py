@@ -0,0 +1,259 @@
+"""
+Pre-fork режим сервера.
+
+Модель загружается один раз в мастер-процессе, после чего воркеры создаются через fork
+и разделяют веса по copy-on-write. Объекты мастера замораживаются через gc.freeze(), чтобы сборщик мусора
+в воркерах не трогал их заголовки и страницы оставались общими.
+
+Упавший воркер перезапускается; если воркеры текущего поколения падают вскоре после старта, перезапуск
+откладывается с экспоненциальной задержкой, а после _MAX_FAST_FAILURES таких падений подряд мастер останавливается.
+
+Сигналы мастеру:
+- SIGHUP — плавная перезагрузка: модель загружается заново, стартуют новые воркеры, старые дорабатывают запросы;
+- SIGTERM / SIGINT — плавная остановка.
+
+Запуск:
+    python -m src.prefork --workers 4
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from src.core.services.anonymizer.depends import clear_anonymizers, get_model_router
+from src.core.services.anonymizer.lemmas import get_lemmatizer
+from src.main import app
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Воркер, проживший меньше этого времени, считается упавшим при старте
+_FAST_FAILURE_SECONDS = 30.0
+_MAX_FAST_FAILURES = 10
+_RESPAWN_BACKOFF_SECONDS = 1.0
+_RESPAWN_BACKOFF_MAX_SECONDS = 60.0
+
+
+class PreforkServer:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        torch_threads: int = 0,
+        interop_threads: int = 1,
+        graceful_timeout: float = 30.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.interop_threads = interop_threads
+        self.graceful_timeout = graceful_timeout
+        self._sock: socket.socket | None = None
+        self._children: dict[int, int] = {}  # pid → поколение
+        self._started: dict[int, float] = {}  # pid → время запуска (monotonic)
+        self._respawns: list[float] = []  # отложенные перезапуски воркеров текущего поколения
+        self._fast_failures = 0
+        self._generation = 0
+        self._exit_code = 0
+        self._running = True
+        self._reload_requested = False
+
+    def run(self) -> int:
+        """Работает до сигнала остановки; возвращает код выхода мастера."""
+        self._sock = self._bind()
+        self._load_model()
+        self._spawn_workers()
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        while self._running:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload()
+            self._reap_children()
+            self._respawn_due()
+            time.sleep(0.5)
+
+        self._stop_workers(list(self._children))
+        self._sock.close()
+        return self._exit_code
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _load_model(self) -> None:
+        """Загружает модель в мастере и готовит её к разделению между воркерами."""
+        gc.unfreeze()
+        clear_anonymizers()
+        gc.collect()
+
+        router = get_model_router()
+        for alias in router.preload_aliases():
+            router.get(alias)
+        # Индекс лемм тоже загружается до fork и разделяется воркерами
+        get_lemmatizer()
+        logger.info("Models loaded in master process %d", os.getpid())
+
+        # Всё, что создано до fork, уходит в постоянное поколение GC
+        gc.freeze()
+
+    def _spawn_workers(self) -> None:
+        for _ in range(self.workers - sum(gen == self._generation for gen in self._children.values())):
+            self._spawn_worker()
+
+    def _spawn_worker(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._worker_main()
+        self._children[pid] = self._generation
+        self._started[pid] = time.monotonic()
+        logger.info("Started worker %d (generation %d)", pid, self._generation)
+
+    def _worker_main(self) -> None:
+        exit_code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, signal.SIG_DFL)
+            self._configure_torch()
+
+            config = uvicorn.Config(
+                app, host=self.host, port=self.port, timeout_graceful_shutdown=self.graceful_timeout
+            )
+            uvicorn.Server(config).run(sockets=[self._sock])
+        except Exception:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _configure_torch(self) -> None:
+        import torch
+
+        torch.set_num_threads(self.torch_threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError:
+            # Пул межоперационных потоков уже запущен в мастере — настройка наследуется
+            logger.warning("Cannot set torch interop threads in worker %d", os.getpid())
+
+    def _reload(self) -> None:
+        logger.info("Reloading: loading model and starting generation %d", self._generation + 1)
+        old_workers = list(self._children)
+        self._load_model()
+        self._generation += 1
+        # Отложенные перезапуски и счётчик падений относятся к прежнему поколению
+        self._respawns = []
+        self._fast_failures = 0
+        self._spawn_workers()
+        self._stop_workers(old_workers)
+
+    def _stop_workers(self, pids: list[int]) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.graceful_timeout
+        pending = set(pids)
+        while pending and time.monotonic() < deadline:
+            for pid in list(pending):
+                try:
+                    finished, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    finished = pid
+                if finished:
+                    pending.discard(pid)
+                    self._children.pop(pid, None)
+                    self._started.pop(pid, None)
+            time.sleep(0.1)
+
+        for pid in pending:
+            logger.warning("Worker %d did not stop in time, killing", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self._children.pop(pid, None)
+            self._started.pop(pid, None)
+
+    def _reap_children(self) -> None:
+        """
+        Подбирает упавшие воркеры текущего поколения и планирует им замену.
+
+        Воркер, упавший вскоре после старта (конфигурация, занятый порт, нехватка памяти), скорее всего упадёт
+        и при повторном запуске: задержка перезапуска удваивается с каждым таким падением подряд, а после
+        _MAX_FAST_FAILURES падений мастер останавливается с ошибкой вместо бесконечного цикла fork.
+        """
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            generation = self._children.pop(pid, None)
+            started = self._started.pop(pid, None)
+            if generation != self._generation or not self._running:
+                continue
+            if started is not None and time.monotonic() - started < _FAST_FAILURE_SECONDS:
+                self._fast_failures += 1
+            else:
+                self._fast_failures = 0
+            if self._fast_failures >= _MAX_FAST_FAILURES:
+                logger.error("Workers failed %d times in a row right after start, stopping", self._fast_failures)
+                self._running = False
+                self._exit_code = 1
+                return
+            delay = 0.0
+            if self._fast_failures:
+                delay = min(_RESPAWN_BACKOFF_SECONDS * 2 ** (self._fast_failures - 1), _RESPAWN_BACKOFF_MAX_SECONDS)
+            logger.warning("Worker %d exited with status %d, restarting in %.1f s", pid, status, delay)
+            self._respawns.append(time.monotonic() + delay)
+
+    def _respawn_due(self) -> None:
+        """Запускает воркеры, чья задержка перезапуска истекла."""
+        if not self._respawns or not self._running:
+            return
+        now = time.monotonic()
+        due = [at for at in self._respawns if at <= now]
+        self._respawns = [at for at in self._respawns if at > now]
+        for _ in due:
+            self._spawn_worker()
+
+    def _on_stop(self, signum, frame) -> None:
+        self._running = False
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maskara в pre-fork режиме")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS)
+    parser.add_argument("--torch-threads", type=int, default=settings.WORKER_TORCH_THREADS)
+    parser.add_argument("--interop-threads", type=int, default=settings.WORKER_TORCH_INTEROP_THREADS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(PreforkServer(args.host, args.port, args.workers, args.torch_threads, args.interop_threads).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@
 from fastapi import FastAPI
 
 from src.apps.anonymization.router import router as assistants_router
+from src.apps.health.router import router as health_router
+from src.apps.jobs.router import router as jobs_router
+from src.apps.metrics.router import router as metrics_router
 
 
 def apply_routes(app: FastAPI) -> FastAPI:
@@ -13,4 +16,7 @@ def apply_routes(app: FastAPI) -> FastAPI:
     """
 
     app.include_router(assistants_router)
+    app.include_router(jobs_router)
+    app.include_router(metrics_router)
+    app.include_router(health_router)
     return app
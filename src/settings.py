@@ -1,15 +1,133 @@
+from enum import StrEnum
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class LemmaMatch(StrEnum):
+    """Режим фильтра exclude_lemmas."""
+
+    phrase = "phrase"  # исключается сущность, фраза которой целиком совпадает с исключением
+    any = "any"  # исключается сущность, фраза или любое слово которой совпадает с исключением
+
+
 class Settings(BaseSettings):
     """
     Настройки проекта.
     """
 
     GLINER_MODEL: str = "knowledgator/gliner-pii-large-v1.0"
+    # Бэкенд инференса: gliner (torch) или gliner_onnx (ONNX Runtime)
+    ANONYMIZER: str = "gliner"
+    ONNX_QUANTIZE: bool = True
     CORS_ORIGINS: list[str]
     API_KEY: str
 
+    # Загрузка и прогрев модели при старте; /health/ready отвечает 200 только после прогрева
+    PRELOAD_MODEL: bool = True
+    WARMUP_LABELS: list[str] = ["person", "phone number", "address"]
+    WARMUP_TOKEN_LENGTHS: list[int] = [32, 128, 512]
+
+    # Кэш эмбеддингов меток для bi-encoder моделей и наборы меток, кодируемые при старте
+    LABEL_EMBEDDING_CACHE_SIZE: int = 128
+    LABEL_EMBEDDING_PREWARM: list[list[str]] = []
+
+    # Исполнитель инференса: полосы (одновременные батчи), потоки torch на полосу (0 — поровну),
+    # привязка полос к физическим ядрам и автоподбор числа полос при старте
+    INFERENCE_LANES: int = 1
+    INFERENCE_THREADS_PER_LANE: int = 0
+    INFERENCE_INTEROP_THREADS: int = 1
+    INFERENCE_PIN_CPUS: bool = False
+    INFERENCE_AUTOTUNE: bool = False
+    INFERENCE_AUTOTUNE_LANES: list[int] = [1, 2, 4, 8]
+
+    # Упаковка коротких чанков в общие последовательности модели и группировка по длине (границы корзин в токенах)
+    INFERENCE_PACKING: bool = True
+    INFERENCE_LENGTH_BUCKETS: list[int] = [64, 128, 256, 512]
+
+    # Промпт меток GLiNER занимает часть последовательности — бюджет чанка считается по его токенам.
+    # Большие наборы меток делятся на группы (до LABEL_GROUPS_MAX прогонов по тем же чанкам), если это дешевле
+    # по стоимости прохода, измеренной при прогреве; LABEL_MIN_CHUNK_TOKENS — наименьший бюджет текста чанка
+    LABEL_GROUPS_MAX: int = 4
+    LABEL_MIN_CHUNK_TOKENS: int = 128
+
+    # Детекторы на правилах для структурированных ПДн (телефон, email, ИНН, СНИЛС, паспорт, карта, IBAN).
+    # Модель не ищет только метки правил с контрольной суммой (ИНН, СНИЛС, карта, IBAN).
+    # RULE_LABEL_ALIASES дополняет/переопределяет имена меток для правил: {"phone": ["тел."]}
+    RULE_DETECTORS: bool = True
+    RULE_LABEL_ALIASES: dict[str, list[str]] = {}
+
+    # Режим фейковых значений (use_fake): пулы заранее сгенерированных значений по видам данных.
+    # FAKE_LABEL_ALIASES дополняет/переопределяет соответствие метод Faker → метки: {"name": ["арендатор"]}
+    FAKE_LOCALE: str = "ru_RU"
+    FAKE_POOL_SIZE: int = 2000
+    FAKE_SEED: int = 0
+    FAKE_LABEL_ALIASES: dict[str, list[str]] = {}
+
+    # Заголовок Server-Timing с длительностью стадий в каждом ответе
+    SERVER_TIMING: bool = False
+
+    # Дополнительные модели: псевдоним → имя модели (псевдоним "default" — GLINER_MODEL), поле "model" запроса.
+    # Бюджет памяти на все загруженные модели (0 — без ограничения): сверх него выгружаются давно не использованные.
+    # Политика: тексты до MODEL_ROUTING_SHORT_TEXT_CHARS символов без чувствительных меток — на малую модель
+    MODELS: dict[str, str] = {}
+    MODEL_MEMORY_BUDGET_MB: int = 0
+    MODEL_ROUTING_SHORT_MODEL: str | None = None
+    MODEL_ROUTING_SHORT_TEXT_CHARS: int = 2000
+    MODEL_ROUTING_SENSITIVE_LABELS: list[str] = []
+
+    # Загрузка документов (TXT/DOCX/PDF): лимит размера файла, размер раздела текста (страница PDF — всегда
+    # отдельный раздел) и число разделов документа, одновременно находящихся в инференсе
+    DOCUMENT_MAX_UPLOAD_MB: int = 200
+    DOCUMENT_SECTION_CHARS: int = 20000
+    DOCUMENT_SECTIONS_IN_FLIGHT: int = 4
+
+    # Асинхронные задания (/api/v1/jobs): каталог очереди (sqlite) и исходных файлов, число заданий, одновременно
+    # обрабатываемых процессом (0 — процесс задания не обрабатывает), аренда задания воркером (продлевается
+    # после каждого раздела), срок хранения результата и лимит попыток для заданий, прерванных падением процесса
+    JOB_STORE_DIR: str = "./models/jobs"
+    JOB_WORKERS: int = 1
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_LEASE_SECONDS: float = 300.0
+    JOB_RESULT_TTL_SECONDS: float = 86400.0
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # Инкрементальные сессии (WebSocket /api/v1/anonymization/session): хвост, который не финализируется до прихода
+    # следующего текста, левый контекст из финализированного текста для модели, бюджет памяти на все сессии процесса
+    # и срок хранения сессии без подключённого клиента (0 — без ограничения)
+    SESSION_HOLDBACK_CHARS: int = 300
+    SESSION_CONTEXT_CHARS: int = 300
+    SESSION_MEMORY_BUDGET_MB: int = 64
+    SESSION_IDLE_SECONDS: float = 900.0
+
+    # Pre-fork режим (python -m src.prefork): воркеры делят веса модели через copy-on-write
+    WORKERS: int = 1
+    WORKER_TORCH_THREADS: int = 0  # 0 — поровну делить ядра между воркерами
+    WORKER_TORCH_INTEROP_THREADS: int = 1
+
+    # Динамический микро-батчинг инференса
+    INFERENCE_MAX_BATCH_SIZE: int = 8
+    INFERENCE_MAX_WAIT_MS: float = 10.0
+
+    # Контроль допуска: максимум ожидающих чанков (0 — без ограничения), доли очереди по приоритетам
+    # (заголовок X-Priority: high/normal/low) и дедлайн запроса по умолчанию (заголовок X-Request-Timeout, секунды)
+    ADMISSION_MAX_QUEUE_DEPTH: int = 512
+    ADMISSION_PRIORITY_SHARES: dict[str, float] = {"high": 1.0, "normal": 0.8, "low": 0.5}
+    REQUEST_TIMEOUT_SECONDS: float | None = None
+
+    # Фильтр exclude_lemmas: размер кэша форма → лемма, файл индекса (TSV, загружается при старте; при LEMMA_INDEX_SAVE
+    # прогретый кэш сохраняется в него при остановке) и режим: phrase — исключение совпадает с фразой сущности целиком,
+    # any — с фразой или любым её словом
+    LEMMA_CACHE_SIZE: int = 200_000
+    LEMMA_INDEX_PATH: str | None = None
+    LEMMA_INDEX_SAVE: bool = False
+    LEMMA_MATCH: LemmaMatch = LemmaMatch.phrase
+
+    # Кэш результатов инференса по чанкам (0 — отключён)
+    CHUNK_CACHE_SIZE: int = 10000
+    CHUNK_CACHE_FLOOR_THRESHOLD: float = 0.3
+    CHUNK_CACHE_PATH: str | None = None
+    CHUNK_CACHE_DISK_MAX_ENTRIES: int = 1_000_000
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",